@@ -0,0 +1,49 @@
+"""added Task.hierarchy_path
+
+Revision ID: 1e8a6c3f2b7d
+Revises: 9b8bd88a16f3
+Create Date: 2026-10-18 16:41:05.218114
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '1e8a6c3f2b7d'
+down_revision = '9b8bd88a16f3'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column(
+        'Tasks',
+        sa.Column('hierarchy_path', sa.String(), nullable=True)
+    )
+    op.create_index(
+        'ix_Tasks_hierarchy_path', 'Tasks', ['hierarchy_path']
+    )
+
+    # fill the hierarchy paths level by level starting from the root tasks
+    op.execute(
+        'UPDATE "Tasks" SET hierarchy_path = \'\' WHERE parent_id IS NULL'
+    )
+    connection = op.get_bind()
+    while True:
+        result = connection.execute(
+            'UPDATE "Tasks" SET hierarchy_path = ('
+            '    SELECT "Parents".hierarchy_path || '
+            '        CAST("Parents".id AS VARCHAR) || \'|\''
+            '    FROM "Tasks" AS "Parents"'
+            '    WHERE "Parents".id = "Tasks".parent_id'
+            ') '
+            'WHERE hierarchy_path IS NULL AND parent_id IN ('
+            '    SELECT id FROM "Tasks" WHERE hierarchy_path IS NOT NULL'
+            ')'
+        )
+        if not result.rowcount:
+            break
+
+
+def downgrade():
+    op.drop_index('ix_Tasks_hierarchy_path', 'Tasks')
+    op.drop_column('Tasks', 'hierarchy_path')
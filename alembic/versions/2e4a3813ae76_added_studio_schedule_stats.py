@@ -0,0 +1,25 @@
+"""added Studio.schedule_stats
+
+Revision ID: 2e4a3813ae76
+Revises: 433d9caaafab
+Create Date: 2026-10-18 10:12:41.218374
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2e4a3813ae76'
+down_revision = '433d9caaafab'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column(
+        'Studios',
+        sa.Column('schedule_stats', sa.PickleType(), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column('Studios', 'schedule_stats')
@@ -0,0 +1,34 @@
+"""added Task.child_count
+
+Revision ID: 5f3c2a9d8e41
+Revises: 1e8a6c3f2b7d
+Create Date: 2026-10-18 18:12:37.504211
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '5f3c2a9d8e41'
+down_revision = '1e8a6c3f2b7d'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column(
+        'Tasks',
+        sa.Column('child_count', sa.Integer(), nullable=False,
+                  server_default='0')
+    )
+
+    # count the children of the existing tasks
+    op.execute(
+        'UPDATE "Tasks" SET child_count = ('
+        '    SELECT COUNT(*) FROM "Tasks" AS "Children"'
+        '    WHERE "Children".parent_id = "Tasks".id'
+        ')'
+    )
+
+
+def downgrade():
+    op.drop_column('Tasks', 'child_count')
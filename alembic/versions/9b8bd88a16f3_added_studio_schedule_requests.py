@@ -0,0 +1,30 @@
+"""added Studio.schedule_requests and Studio.schedule_requests_served
+
+Revision ID: 9b8bd88a16f3
+Revises: 2e4a3813ae76
+Create Date: 2026-10-18 14:02:17.532961
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '9b8bd88a16f3'
+down_revision = '2e4a3813ae76'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column(
+        'Studios',
+        sa.Column('schedule_requests', sa.Integer(), nullable=True)
+    )
+    op.add_column(
+        'Studios',
+        sa.Column('schedule_requests_served', sa.Integer(), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column('Studios', 'schedule_requests_served')
+    op.drop_column('Studios', 'schedule_requests')
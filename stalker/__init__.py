@@ -45,7 +45,12 @@ from stalker.models.project import Project
 from stalker.models.review import Review
 from stalker.models.repository import Repository
 from stalker.models.scene import Scene
-from stalker.models.schedulers import SchedulerBase, TaskJugglerScheduler
+from stalker.models.schedulers import (SchedulerBase, TaskJugglerScheduler,
+                                      TaskJugglerDaemonScheduler,
+                                      NativeScheduler,
+                                      TJPFragmentCache, TJPResultCache,
+                                      ScheduleStats, ScheduleResult,
+                                      ScheduleJob)
 from stalker.models.sequence import Sequence
 from stalker.models.shot import Shot
 from stalker.models.status import Status, StatusList
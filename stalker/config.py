@@ -270,7 +270,7 @@ project {{ studio.tjp_id }} "{{ studio.name }}" {{ studio.start.date() }} - {{ s
         tjp_project_template="""
 task {{project.tjp_id}} "{{project.name}}" {
     {% for task in project.root_tasks %}
-        {{task.to_tjp}}
+        {%+ for fragment in task.generate_tjp(compact_bookings) %}{{fragment}}{% endfor %}
     {%- endfor %}
 }
 """,
@@ -291,7 +291,7 @@ task {{task.tjp_id}} "{{task.name}}" {
 
     {%- if task.is_container -%}
         {% for child_task in task.children -%}
-            {{ child_task.to_tjp }}
+            {% for fragment in child_task.generate_tjp(compact_bookings) %}{{ fragment }}{% endfor %}
         {%- endfor %}
     {%- else %}
         {% if task.resources|length %}
@@ -324,7 +324,7 @@ task {{task.tjp_id}} "{{task.name}}" {
                 {%- endif %}
             {%- endfor %}
         {%- endif %}
-        {% for time_log in task.time_logs %}
+        {% for time_log in (task.compacted_time_logs() if compact_bookings else task.time_logs) %}
             booking {{time_log.resource.tjp_id}} {{time_log.start.strftime('%Y-%m-%d-%H:%M:%S')}} +{{'%i'|format(time_log.duration.days*24 + time_log.duration.seconds/3600)}}h { overtime 2 }
         {%- endfor %}
     {% endif %}
@@ -362,10 +362,17 @@ resource {{department.tjp_id}} "{{department.name}}" {
             {{user.to_tjp}}
         {%- endfor %}
         }
+        {%- for user, intervals in frozen_load %}
+        supplement resource {{user.tjp_id}} {
+            {%- for start, end in intervals %}
+            vacation {{start.strftime('%Y-%m-%d-%H:%M:%S')}} - {{end.strftime('%Y-%m-%d-%H:%M:%S')}}
+            {%- endfor %}
+        }
+        {%- endfor %}
 
         # tasks
-        {% for project in studio.active_projects %}
-            {{project.to_tjp}}
+        {% for project in projects %}
+            {% for fragment in generate_project_tjp(project) %}{{fragment}}{% endfor %}
         {% endfor %}
 
         # reports
@@ -377,6 +384,19 @@ resource {{department.tjp_id}} "{{department.name}}" {
         """,
 
         tj_command='/usr/local/bin/tj3',
+        tj_daemon_command='/usr/local/bin/tj3d',
+        tj_client_command='/usr/local/bin/tj3client',
+
+        # the number of scheduling runs to keep in Studio.schedule_stats
+        schedule_stats_count=20,
+
+        # the Task status propagation mode, "immediate" or "deferred", see
+        # stalker.models.status.StatusPropagator
+        status_propagation='immediate',
+
+        # the time in seconds between the checks of a queued schedule request
+        # in Studio.request_schedule()
+        schedule_request_poll_interval=0.5,
 
         path_template='{{project.code}}/{%- for parent_task in parent_tasks -%}{{parent_task.nice_name}}/{%- endfor -%}',
         filename_template='{{task.entity_type}}_{{task.id}}_{{version.take_name}}_v{{"%03d"|format(version.version_number)}}',
@@ -92,3 +92,15 @@ class StatusError(Exception):
 
     def __str__(self):
         return repr(self.value)
+
+
+class ScheduleCancelledError(Exception):
+    """Raised when a scheduling run is cancelled
+    """
+
+    def __init__(self, value=""):
+        super(ScheduleCancelledError, self).__init__(value)
+        self.value = value
+
+    def __str__(self):
+        return repr(self.value)
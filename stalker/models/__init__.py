@@ -17,9 +17,22 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+import weakref
+from collections import deque
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
 from stalker.exceptions import CircularDependencyError
 
 
+# the compiled templates, keyed by the config key and the environment options
+_template_registry = {}
+
+# the shared jinja2 environments, keyed by the environment options
+_template_environments = {}
+
+
 def make_plural(name):
     """Returns the plural version of the given name argument.
     """
@@ -54,16 +67,15 @@ def walk_hierarchy(entity, attr, method=0):
       once. Default value is True
     :return:
     """
-    entity_to_visit = [entity]
+    entity_to_visit = deque([entity])
     if not method:  # DFS
         while len(entity_to_visit):
-            current_entity = entity_to_visit.pop(0)
-            for child in reversed(getattr(current_entity, attr)):
-                entity_to_visit.insert(0, child)
+            current_entity = entity_to_visit.pop()
+            entity_to_visit.extend(reversed(getattr(current_entity, attr)))
             yield current_entity
     else:  # BFS
         while len(entity_to_visit):
-            current_entity = entity_to_visit.pop(0)
+            current_entity = entity_to_visit.popleft()
             entity_to_visit.extend(getattr(current_entity, attr))
             yield current_entity
 
@@ -86,3 +98,368 @@ def check_circular_dependency(entity, other_entity, attr_name):
                     'attr_name': attr_name
                 }
             )
+
+
+class DependencyGraph(object):
+    """An in memory index of a directed acyclic graph of entities, which
+    answers the circular dependency checks without walking the whole graph.
+
+    :func:`.check_circular_dependency` walks all the entities that can be
+    reached from an entity for every new relation, so adding a few hundred
+    relations to a large dependency web takes minutes. A DependencyGraph
+    keeps a topological order of the entities instead, where every entity
+    comes before the entities that it is related to. A new relation which
+    follows the order is added in constant time, otherwise only the entities
+    between the two related entities in the order are visited and reordered
+    (the incremental topological ordering of Pearce and Kelly). A relation
+    which creates a cycle is rejected.
+
+    The relations are read from the entities themselves, the subclasses
+    define them in :meth:`.successors` and :meth:`.predecessors`. An entity
+    is added to the graph along with all the entities that it is connected
+    to, the first time it is used, so the graph always holds all of the
+    relations of the entities in it. The changes after that are applied with
+    :meth:`.add_edge` and :meth:`.remove_edge` by the validators and the
+    event listeners of the related attributes.
+
+    There is one graph of each kind for each session, :meth:`.get_graph`
+    returns the graph of the current :class:`.DBSession` by default. The
+    graphs are discarded when the transaction ends, as the entities are
+    expired and their relations are read again.
+
+    :param session: The session of this graph.
+    """
+
+    #: the name of the attribute that holds the relations, used in messages
+    attr_name = None
+
+    _graphs = weakref.WeakKeyDictionary()
+
+    def __init__(self, session):
+        self.session = session
+        self.clear()
+
+    @classmethod
+    def get_graph(cls, session=None):
+        """returns the graph of the given session
+
+        :param session: A session instance. The default is None which uses the
+          current :class:`.DBSession`.
+        """
+        if session is None:
+            from stalker.db.session import DBSession
+            session = DBSession()
+
+        graphs = DependencyGraph._graphs.get(session)
+        if graphs is None:
+            graphs = {}
+            DependencyGraph._graphs[session] = graphs
+
+        graph = graphs.get(cls)
+        if graph is None:
+            graph = cls(session)
+            graphs[cls] = graph
+        return graph
+
+    @classmethod
+    def find_graph(cls, session=None):
+        """returns the graph of the given session if it is created before,
+        otherwise returns None
+
+        :param session: A session instance. The default is None which uses the
+          current :class:`.DBSession`.
+        """
+        if session is None:
+            from stalker.db.session import DBSession
+            session = DBSession()
+        return DependencyGraph._graphs.get(session, {}).get(cls)
+
+    def successors(self, entity):
+        """returns the entities that the given entity is related to, should be
+        implemented in the subclasses
+        """
+        raise NotImplementedError
+
+    def predecessors(self, entity):
+        """returns the entities that are related to the given entity, should
+        be implemented in the subclasses
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """removes all the entities from the graph, they are added again when
+        they are used
+        """
+        # the entities are keyed by their ids, they are stored in _entities
+        # so the ids are not reused while they are in the graph
+        self._entities = {}
+        self._order = {}
+        self._successors = {}
+        self._predecessors = {}
+        self._lowest = 0
+        self._highest = 0
+
+    def __contains__(self, entity):
+        return id(entity) in self._entities
+
+    def add(self, entity):
+        """adds the given entity to the graph along with all the entities that
+        it is connected to
+
+        :param entity: The entity to add.
+        """
+        if id(entity) in self._entities:
+            return
+
+        new_entities = [entity]
+        self._add_entity(entity)
+        edges = []
+        i = 0
+        while i < len(new_entities):
+            current_entity = new_entities[i]
+            i += 1
+            for other in self.successors(current_entity):
+                edges.append((current_entity, other))
+                if id(other) not in self._entities:
+                    self._add_entity(other)
+                    new_entities.append(other)
+            for other in self.predecessors(current_entity):
+                edges.append((other, current_entity))
+                if id(other) not in self._entities:
+                    self._add_entity(other)
+                    new_entities.append(other)
+
+        # order the new entities after the current ones, the relations to the
+        # current entities are added one by one (possible only if a relation
+        # is changed without updating the graph)
+        new_ids = set(id(e) for e in new_entities)
+        in_degrees = dict((entity_id, 0) for entity_id in new_ids)
+        old_edges = []
+        for source, target in edges:
+            source_id, target_id = id(source), id(target)
+            if source_id not in new_ids or target_id not in new_ids:
+                old_edges.append((source, target))
+            elif target_id not in self._successors[source_id]:
+                self._successors[source_id].add(target_id)
+                self._predecessors[target_id].add(source_id)
+                in_degrees[target_id] += 1
+
+        ready = deque(
+            id(e) for e in new_entities if not in_degrees[id(e)]
+        )
+        ordered = 0
+        while ready:
+            entity_id = ready.popleft()
+            self._highest += 1
+            self._order[entity_id] = self._highest
+            ordered += 1
+            for target_id in self._successors[entity_id]:
+                in_degrees[target_id] -= 1
+                if not in_degrees[target_id]:
+                    ready.append(target_id)
+
+        if ordered != len(new_entities):
+            # there is already a cycle in the given relations
+            cycle = [e for e in new_entities if id(e) not in self._order]
+            for e in new_entities:
+                self._remove_entity(e)
+            raise self._circular_dependency_error(cycle[0], cycle[-1])
+
+        for source, target in old_edges:
+            self.add_edge(source, target)
+
+    def _add_entity(self, entity):
+        """adds the given entity to the graph without its relations
+        """
+        entity_id = id(entity)
+        self._entities[entity_id] = entity
+        self._successors[entity_id] = set()
+        self._predecessors[entity_id] = set()
+
+    def _remove_entity(self, entity):
+        """removes the given entity from the graph without updating the
+        relations of the other entities
+        """
+        entity_id = id(entity)
+        self._entities.pop(entity_id, None)
+        self._order.pop(entity_id, None)
+        self._successors.pop(entity_id, None)
+        self._predecessors.pop(entity_id, None)
+
+    def _circular_dependency_error(self, entity, other_entity):
+        """returns a CircularDependencyError for the given entities
+        """
+        return CircularDependencyError(
+            '%(entity_name)s (%(entity_class)s) and '
+            '%(other_entity_name)s (%(other_entity_class)s) creates a '
+            'circular dependency in their %(attr_name)s attribute' %
+            {
+                'entity_name': entity,
+                'entity_class': entity.__class__.__name__,
+                'other_entity_name': other_entity,
+                'other_entity_class': other_entity.__class__.__name__,
+                'attr_name': self.attr_name
+            }
+        )
+
+    def _visit(self, start_id, edges, accept):
+        """returns the ids of the entities that can be reached from the entity
+        with the given id over the given edges by visiting only the entities
+        that are accepted by the given function
+        """
+        visited = set([start_id])
+        to_visit = [start_id]
+        while to_visit:
+            entity_id = to_visit.pop()
+            for other_id in edges[entity_id]:
+                if other_id not in visited and accept(other_id):
+                    visited.add(other_id)
+                    to_visit.append(other_id)
+        return visited
+
+    def has_path(self, entity, other_entity):
+        """returns True if the other_entity can be reached from the given
+        entity
+
+        :param entity: The starting entity.
+        :param other_entity: The entity to search for.
+        """
+        if entity is other_entity:
+            return True
+
+        self.add(entity)
+        if not self._successors[id(entity)]:
+            return False
+
+        self.add(other_entity)
+        upper_bound = self._order[id(other_entity)]
+        if self._order[id(entity)] > upper_bound:
+            return False
+
+        order = self._order
+        visited = self._visit(
+            id(entity), self._successors,
+            lambda entity_id: order[entity_id] <= upper_bound
+        )
+        return id(other_entity) in visited
+
+    def add_edge(self, entity, other_entity):
+        """adds a relation from the given entity to the other_entity, raises a
+        CircularDependencyError if the other_entity is already related to the
+        given entity
+
+        :param entity: The source entity.
+        :param other_entity: The target entity.
+        """
+        if entity is other_entity:
+            raise self._circular_dependency_error(entity, other_entity)
+
+        self.add(entity)
+        self.add(other_entity)
+        entity_id = id(entity)
+        other_id = id(other_entity)
+        if other_id in self._successors[entity_id]:
+            return
+
+        # an entity without any relations can be moved to the start or to the
+        # end of the order, so appending relations to new entities, like in a
+        # chain, doesn't reorder the others
+        order = self._order
+        if not self._successors[entity_id] \
+                and not self._predecessors[entity_id]:
+            self._lowest -= 1
+            order[entity_id] = self._lowest
+        elif not self._successors[other_id] \
+                and not self._predecessors[other_id]:
+            self._highest += 1
+            order[other_id] = self._highest
+
+        lower_bound = order[other_id]
+        upper_bound = order[entity_id]
+        if lower_bound < upper_bound:
+            # the new relation does not fit into the current order, the
+            # entities in between are reordered
+            forward = self._visit(
+                other_id, self._successors,
+                lambda e_id: order[e_id] <= upper_bound
+            )
+            if entity_id in forward:
+                raise self._circular_dependency_error(other_entity, entity)
+            backward = self._visit(
+                entity_id, self._predecessors,
+                lambda e_id: order[e_id] >= lower_bound
+            )
+            affected = sorted(backward, key=order.get) + \
+                sorted(forward, key=order.get)
+            for e_id, index in zip(affected, sorted(order[e_id]
+                                                    for e_id in affected)):
+                order[e_id] = index
+
+        self._successors[entity_id].add(other_id)
+        self._predecessors[other_id].add(entity_id)
+
+    def remove_edge(self, entity, other_entity):
+        """removes the relation from the given entity to the other_entity, the
+        order of the entities is still valid without it
+
+        :param entity: The source entity.
+        :param other_entity: The target entity.
+        """
+        entity_id = id(entity)
+        other_id = id(other_entity)
+        if entity_id in self._entities and other_id in self._entities:
+            self._successors[entity_id].discard(other_id)
+            self._predecessors[other_id].discard(entity_id)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def discard_dependency_graphs_on_transaction_end(session, transaction):
+    """discards the DependencyGraphs of the session when the transaction ends
+    """
+    if transaction.parent is None:
+        DependencyGraph._graphs.pop(session, None)
+
+
+def get_template(key, trim_blocks=False, lstrip_blocks=False):
+    """Returns the compiled jinja2.Template of the template source that is
+    stored in :class:`stalker.config.Config` under the given key.
+
+    The templates are compiled only once with a shared jinja2.Environment and
+    stored in a registry. The registry stores the template source along with
+    the compiled template and if the value in ``defaults`` is changed the
+    template is compiled again, so there is no need to clear the registry
+    when the defaults are changed. Use :func:`.clear_template_cache` to clear
+    the registry manually.
+
+    :param str key: The config key of the template, ex: 'tjp_task_template'
+    :param bool trim_blocks: The trim_blocks option of the jinja2 environment
+    :param bool lstrip_blocks: The lstrip_blocks option of the jinja2
+      environment
+    :return: jinja2.Template
+    """
+    from stalker import defaults
+
+    source = defaults[key]
+    options = (bool(trim_blocks), bool(lstrip_blocks))
+    cached = _template_registry.get((key, options))
+    if cached is not None and cached[0] == source:
+        return cached[1]
+
+    environment = _template_environments.get(options)
+    if environment is None:
+        from jinja2 import Environment
+        environment = Environment(
+            trim_blocks=options[0],
+            lstrip_blocks=options[1]
+        )
+        _template_environments[options] = environment
+
+    template = environment.from_string(source)
+    _template_registry[(key, options)] = (source, template)
+    return template
+
+
+def clear_template_cache():
+    """Clears the compiled template registry used by :func:`.get_template`
+    """
+    _template_registry.clear()
@@ -844,9 +844,9 @@ class User(Entity, ACLMixin):
     def to_tjp(self):
         """outputs a TaskJuggler formatted string
         """
-        from jinja2 import Template
+        from stalker.models import get_template
 
-        temp = Template(defaults.tjp_user_template, trim_blocks=True)
+        temp = get_template('tjp_user_template', trim_blocks=True)
         return temp.render({'user': self})
 
 
@@ -21,7 +21,6 @@
 from sqlalchemy import Column, Integer, ForeignKey
 from sqlalchemy.orm import relationship, validates, synonym
 
-from stalker import defaults
 from stalker.models.auth import User
 from stalker.models.entity import Entity
 
@@ -135,6 +134,6 @@ class Department(Entity):
     def to_tjp(self):
         """outputs a TaskJuggler compatible string
         """
-        from jinja2 import Template
-        temp = Template(defaults.tjp_department_template, trim_blocks=True)
+        from stalker.models import get_template
+        temp = get_template('tjp_department_template', trim_blocks=True)
         return temp.render({'department': self})
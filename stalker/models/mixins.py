@@ -1286,22 +1286,21 @@ class ScheduleMixin(object):
         if not unit:
             return None
 
-        lut = {
-            'min': 60,
-            'h': 3600,
-            'd': 86400,
-            'w': 604800,
-            'm': 2419200,
-            'y': 31536000
-        }
+        return timing * cls.unit_seconds(model)[unit]
 
+    @classmethod
+    def unit_seconds(cls, model):
+        """returns a dictionary of the time units and their length in seconds
+        for the given schedule_model. The units are in work time for 'effort'
+        and 'length' and in calendar time for 'duration'.
+        """
         if model in ['effort', 'length']:
             day_wt = defaults.daily_working_hours * 3600
             week_wt = defaults.weekly_working_days * day_wt
             month_wt = 4 * week_wt
             year_wt = int(defaults.yearly_working_days) * day_wt
 
-            lut = {
+            return {
                 'min': 60,
                 'h': 3600,
                 'd': day_wt,
@@ -1310,7 +1309,14 @@ class ScheduleMixin(object):
                 'y': year_wt
             }
 
-        return timing * lut[unit]
+        return {
+            'min': 60,
+            'h': 3600,
+            'd': 86400,
+            'w': 604800,
+            'm': 2419200,
+            'y': 31536000
+        }
 
     @property
     def schedule_seconds(self):
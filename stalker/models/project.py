@@ -25,7 +25,6 @@ from sqlalchemy import (Column, Integer, ForeignKey, Float, Boolean, Table)
 from sqlalchemy.orm import relationship, validates
 
 from stalker import User
-from stalker import defaults
 from stalker.db import session
 from stalker.db.declarative import Base
 from stalker.models.entity import Entity
@@ -388,11 +387,27 @@ class Project(Entity, ReferenceMixin, StatusMixin, DateRangeMixin, CodeMixin):
     def to_tjp(self):
         """returns a TaskJuggler compatible string representing this project
         """
-        from jinja2 import Template
-        temp = Template(defaults.tjp_project_template, trim_blocks=True,
-                        lstrip_blocks=True)
+        from stalker.models import get_template
+        temp = get_template('tjp_project_template', trim_blocks=True,
+                            lstrip_blocks=True)
         return temp.render({'project': self})
 
+    def generate_tjp(self, compact_bookings=False):
+        """Generates the TaskJuggler representation of this project fragment
+        by fragment. Joining the generated fragments gives the same result
+        with :attr:`.to_tjp`, but the whole string is never kept in memory.
+
+        :param bool compact_bookings: If True the time logs of the tasks that
+          are following each other are rendered as one booking (see
+          :meth:`.Task.compacted_time_logs`). The default is False.
+        """
+        from stalker.models import get_template
+        temp = get_template('tjp_project_template', trim_blocks=True,
+                            lstrip_blocks=True)
+        return temp.generate(
+            {'project': self, 'compact_bookings': compact_bookings}
+        )
+
     @property
     def is_active(self):
         """predicate for Project.active attribute
@@ -441,6 +456,311 @@ class Project(Entity, ReferenceMixin, StatusMixin, DateRangeMixin, CodeMixin):
         else:
             return 0
 
+    def update_task_statuses(self):
+        """Updates the statuses of all the tasks of this project by looking at
+        the statuses of their dependencies and children.
+
+        The rules are the same with
+        :meth:`.Task.update_status_with_dependent_statuses` and
+        :meth:`.Task.update_status_with_children_statuses` but all the tasks
+        are updated at once, so it can be used to repair the task statuses or
+        to update the statuses of many imported tasks.
+
+        The statuses of the tasks and their dependencies are read with two
+        queries. Then the combined binary statuses (see
+        :data:`stalker.models.task.BINARY_STATUS_CODES`) of the dependencies
+        of the leaf tasks and of the children of the container tasks are
+        calculated, every task is visited after the tasks that it depends to
+        and after its children, so the changes are propagated in one pass.
+        Finally only the tasks whose status is changed are updated with one
+        UPDATE statement per status.
+
+        The pending changes of the session are flushed first and the status
+        of the updated Task instances in the session are expired.
+
+        :returns: A list of the ids of the updated tasks.
+        """
+        from sqlalchemy import inspect, select
+        from stalker.db.session import DBSession
+        from stalker.models.status import Status, StatusRegistry
+        from stalker.models.task import (Task, TaskDependency,
+                                         BINARY_STATUS_CODES,
+                                         PARENT_STATUS_CODES,
+                                         CHILDREN_TO_PARENT_STATUSES_LUT)
+
+        DBSession.flush()
+        connection = DBSession.connection()
+
+        tasks_table = Task.__table__
+        statuses_table = Status.__table__
+        dependencies_table = TaskDependency.__table__
+        dependent_tasks_table = tasks_table.alias('Dependent_Tasks')
+
+        # the status codes of the tasks and the children of the containers
+        status_codes = {}
+        children = {}
+        result = connection.execute(
+            select([tasks_table.c.id, tasks_table.c.parent_id,
+                    statuses_table.c.code])
+            .select_from(
+                tasks_table.join(
+                    statuses_table,
+                    tasks_table.c.status_id == statuses_table.c.id
+                )
+            )
+            .where(tasks_table.c.project_id == self.id)
+        )
+        for task_id, parent_id, code in result:
+            status_codes[task_id] = code
+            if parent_id is not None:
+                children.setdefault(parent_id, []).append(task_id)
+        project_task_ids = list(status_codes.keys())
+
+        # the dependencies, the tasks of the other projects are also included
+        depends = {}
+        result = connection.execute(
+            select([dependencies_table.c.task_id,
+                    dependencies_table.c.depends_to_id,
+                    statuses_table.c.code])
+            .select_from(
+                dependencies_table.join(
+                    tasks_table,
+                    dependencies_table.c.task_id == tasks_table.c.id
+                ).join(
+                    dependent_tasks_table,
+                    dependencies_table.c.depends_to_id ==
+                    dependent_tasks_table.c.id
+                ).join(
+                    statuses_table,
+                    dependent_tasks_table.c.status_id == statuses_table.c.id
+                )
+            )
+            .where(tasks_table.c.project_id == self.id)
+        )
+        for task_id, depends_to_id, code in result:
+            depends.setdefault(task_id, []).append(depends_to_id)
+            status_codes.setdefault(depends_to_id, code)
+
+        # the status of a container is decided by its children and the status
+        # of a leaf task by its dependencies
+        inputs = {}
+        for task_id in project_task_ids:
+            if task_id in children:
+                inputs[task_id] = children[task_id]
+            else:
+                inputs[task_id] = depends.get(task_id, [])
+
+        # sort the tasks so they are placed after their inputs
+        sorted_task_ids = []
+        visited = set()
+        for task_id in project_task_ids:
+            if task_id in visited:
+                continue
+            visited.add(task_id)
+            stack = [(task_id, iter(inputs[task_id]))]
+            while stack:
+                current, input_ids = stack[-1]
+                for input_id in input_ids:
+                    if input_id in inputs and input_id not in visited:
+                        visited.add(input_id)
+                        stack.append((input_id, iter(inputs[input_id])))
+                        break
+                else:
+                    stack.pop()
+                    sorted_task_ids.append(current)
+
+        def binary_status(task_ids):
+            """returns the combined binary status of the given tasks
+            """
+            return sum(
+                BINARY_STATUS_CODES[code]
+                for code in set(status_codes[i] for i in task_ids)
+            )
+
+        changed_status_codes = {}
+        for task_id in sorted_task_ids:
+            code = status_codes[task_id]
+            if task_id in children:
+                new_code = PARENT_STATUS_CODES[
+                    CHILDREN_TO_PARENT_STATUSES_LUT[
+                        binary_status(children[task_id])
+                    ]
+                ]
+            elif task_id in depends:
+                new_code = Task._dependency_status_code(
+                    code, binary_status(depends[task_id])
+                )
+            elif code == 'WFD':
+                # doesn't have any dependency
+                new_code = 'RTS'
+            else:
+                continue
+
+            if new_code != code:
+                status_codes[task_id] = new_code
+                changed_status_codes[task_id] = new_code
+
+        # update the changed rows
+        statuses = StatusRegistry.get_registry()
+        task_ids_by_code = {}
+        for task_id, code in changed_status_codes.items():
+            task_ids_by_code.setdefault(code, []).append(task_id)
+
+        for code, task_ids in task_ids_by_code.items():
+            status_id = statuses.get(code).id
+            # stay below the bound parameter limit of SQLite
+            for i in range(0, len(task_ids), 500):
+                connection.execute(
+                    tasks_table.update()
+                    .where(tasks_table.c.id.in_(task_ids[i:i + 500]))
+                    .values(status_id=status_id)
+                )
+
+        # use the identity of the instances not to load the expired ones
+        for instance in list(DBSession.identity_map.values()):
+            if isinstance(instance, Task) and \
+                    inspect(instance).identity[0] in changed_status_codes:
+                DBSession.expire(instance, ['status_id', 'status'])
+
+        return sorted(changed_status_codes.keys())
+
+    def update_schedule_info(self):
+        """Updates the cached schedule_seconds and total_logged_seconds values
+        of all the tasks of this project in the database.
+
+        It is the set based version of :meth:`.Task.update_schedule_info`,
+        instead of loading the whole task hierarchy the values are calculated
+        with one query. The schedule seconds of the leaf tasks and the total
+        seconds of their :class:`.TimeLog`\ s are calculated and summed up for
+        every task by joining them to a recursive CTE holding all the
+        ancestors of every task. Only the tasks whose values are changed are
+        updated with one ``executemany`` UPDATE statement.
+
+        The pending changes of the session are flushed first and the cached
+        values of the updated Task instances in the session are expired.
+
+        :returns: A list of the ids of the updated tasks.
+        """
+        from sqlalchemy import (inspect, select, and_, case, cast, extract,
+                                func, bindparam, Integer)
+        from stalker.db.session import DBSession
+        from stalker.models.task import Task, TimeLog
+
+        DBSession.flush()
+        connection = DBSession.connection()
+
+        tasks_table = Task.__table__
+        time_logs_table = TimeLog.__table__
+        children_table = tasks_table.alias('Child_Tasks')
+
+        # the ancestors of every task including itself
+        ancestors = select([
+            tasks_table.c.id.label('ancestor_id'),
+            tasks_table.c.id.label('task_id')
+        ]).where(tasks_table.c.project_id == self.id)\
+            .cte('Task_Ancestors', recursive=True)
+        ancestors = ancestors.union_all(
+            select([ancestors.c.ancestor_id, tasks_table.c.id])
+            .where(tasks_table.c.parent_id == ancestors.c.task_id)
+        )
+
+        # schedule seconds of the leaf tasks, same with to_seconds()
+        whens = []
+        for unit, seconds in Task.unit_seconds('effort').items():
+            whens.append((
+                and_(tasks_table.c.schedule_model.in_(['effort', 'length']),
+                     tasks_table.c.schedule_unit == unit),
+                tasks_table.c.schedule_timing * seconds
+            ))
+        for unit, seconds in Task.unit_seconds('duration').items():
+            whens.append((
+                tasks_table.c.schedule_unit == unit,
+                tasks_table.c.schedule_timing * seconds
+            ))
+        leaf_schedule_seconds = select([
+            tasks_table.c.id.label('task_id'),
+            case(whens, else_=0).label('schedule_seconds')
+        ]).where(tasks_table.c.project_id == self.id)\
+            .where(
+                ~tasks_table.c.id.in_(
+                    select([children_table.c.parent_id])
+                    .where(children_table.c.parent_id != None)
+                )
+            ).alias('Leaf_Schedule_Seconds')
+
+        # total seconds of the time logs of every task
+        start = time_logs_table.c.start
+        end = time_logs_table.c.end
+        if connection.dialect.name == 'sqlite':
+            time_log_seconds = \
+                func.strftime('%s', end) - func.strftime('%s', start)
+        else:
+            time_log_seconds = func.floor(extract('epoch', end - start))
+        logged_seconds = select([
+            time_logs_table.c.task_id.label('task_id'),
+            func.sum(cast(time_log_seconds, Integer)).label('logged_seconds')
+        ]).group_by(time_logs_table.c.task_id).alias('Logged_Seconds')
+
+        leaves = leaf_schedule_seconds.outerjoin(
+            logged_seconds,
+            leaf_schedule_seconds.c.task_id == logged_seconds.c.task_id
+        )
+        rollup = select([
+            ancestors.c.ancestor_id,
+            func.sum(leaf_schedule_seconds.c.schedule_seconds),
+            func.coalesce(func.sum(logged_seconds.c.logged_seconds), 0)
+        ]).select_from(
+            ancestors.join(
+                leaves,
+                ancestors.c.task_id == leaf_schedule_seconds.c.task_id
+            ).join(
+                tasks_table, ancestors.c.ancestor_id == tasks_table.c.id
+            )
+        ).group_by(
+            ancestors.c.ancestor_id,
+            tasks_table.c.schedule_seconds,
+            tasks_table.c.total_logged_seconds
+        ).having(
+            (tasks_table.c.schedule_seconds == None) |
+            (tasks_table.c.total_logged_seconds == None) |
+            (tasks_table.c.schedule_seconds !=
+             func.sum(leaf_schedule_seconds.c.schedule_seconds)) |
+            (tasks_table.c.total_logged_seconds !=
+             func.coalesce(func.sum(logged_seconds.c.logged_seconds), 0))
+        )
+
+        changed_values = [
+            {'b_id': task_id, 'b_schedule_seconds': schedule_seconds,
+             'b_total_logged_seconds': total_logged_seconds}
+            for task_id, schedule_seconds, total_logged_seconds
+            in connection.execute(rollup)
+        ]
+
+        # update the changed rows
+        if changed_values:
+            connection.execute(
+                tasks_table.update()
+                .where(tasks_table.c.id == bindparam('b_id'))
+                .values(
+                    schedule_seconds=bindparam('b_schedule_seconds'),
+                    total_logged_seconds=bindparam(
+                        'b_total_logged_seconds'
+                    )
+                ),
+                changed_values
+            )
+
+        # use the identity of the instances not to load the expired ones
+        changed_ids = set(values['b_id'] for values in changed_values)
+        for instance in list(DBSession.identity_map.values()):
+            if isinstance(instance, Task) and \
+                    inspect(instance).identity[0] in changed_ids:
+                DBSession.expire(
+                    instance, ['_schedule_seconds', '_total_logged_seconds']
+                )
+
+        return sorted(changed_ids)
+
     @property
     def open_tickets(self):
         """The list of open :class:`.Ticket`\ s in this project.
@@ -22,7 +22,7 @@ from sqlalchemy import Column, Integer, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship, validates, synonym
 
 from stalker.db.session import DBSession
-from stalker.models.status import Status
+from stalker.models.status import StatusRegistry, StatusPropagator
 from stalker.models.entity import SimpleEntity
 from stalker.models.mixins import ScheduleMixin, StatusMixin
 
@@ -130,7 +130,7 @@ class Review(SimpleEntity, ScheduleMixin, StatusMixin):
 
         # set the status to NEW
         with DBSession.no_autoflush:
-            NEW = Status.query.filter_by(code='NEW').first()
+            NEW = StatusRegistry.get_registry().get('NEW')
         self.status = NEW
 
         # set the review_number
@@ -224,7 +224,7 @@ class Review(SimpleEntity, ScheduleMixin, StatusMixin):
 
         # set self status to RREV
         with DBSession.no_autoflush:
-            RREV = Status.query.filter_by(code='RREV').first()
+            RREV = StatusRegistry.get_registry().get('RREV')
 
             # set self status to RREV
             self.status = RREV
@@ -237,7 +237,7 @@ class Review(SimpleEntity, ScheduleMixin, StatusMixin):
         """
         # set self status to APP
         with DBSession.no_autoflush:
-            APP = Status.query.filter_by(code='APP').first()
+            APP = StatusRegistry.get_registry().get('APP')
             self.status = APP
 
         # call finalize review_set
@@ -247,8 +247,9 @@ class Review(SimpleEntity, ScheduleMixin, StatusMixin):
         """finalizes the current review set Review decisions
         """
         with DBSession.no_autoflush:
-            HREV = Status.query.filter_by(code='HREV').first()
-            CMPL = Status.query.filter_by(code='CMPL').first()
+            statuses = StatusRegistry.get_registry()
+            HREV = statuses.get('HREV')
+            CMPL = statuses.get('CMPL')
 
         # check if all the reviews are finalized
         if self.is_finalized():
@@ -282,17 +283,32 @@ class Review(SimpleEntity, ScheduleMixin, StatusMixin):
             self.task.update_parent_statuses()
 
             # update dependent task statuses
+            propagator = StatusPropagator.get_propagator()
             for tdep in self.task.task_dependent_of:
                 dep = tdep.task
                 dep.update_status_with_dependent_statuses()
-                if dep.status.code in ['HREV', 'PREV', 'DREV', 'OH', 'STOP']:
-                    # for tasks that are still be able to continue to work,
-                    # change the dependency_target to "onstart" to allow
-                    # the two of the tasks to work together and still let the
-                    # TJ to be able to schedule the tasks correctly
-                    tdep.dependency_target = 'onstart'
+                # the new status of the dependent task is known after the
+                # propagation in deferred mode
+                propagator.when_propagated(
+                    self._update_dependency_target, tdep
+                )
                 # also update the status of parents of dependencies
                 dep.update_parent_statuses()
 
         else:
             logger.debug('not all reviews are finilized yet!')
+
+    @classmethod
+    def _update_dependency_target(cls, task_dependency):
+        """changes the dependency_target of the given TaskDependency to
+        "onstart" if the dependent task is still be able to continue to work
+
+        :param task_dependency: A :class:`.TaskDependency` instance.
+        """
+        if task_dependency.task.status.code in \
+                ['HREV', 'PREV', 'DREV', 'OH', 'STOP']:
+            # for tasks that are still be able to continue to work,
+            # change the dependency_target to "onstart" to allow
+            # the two of the tasks to work together and still let the
+            # TJ to be able to schedule the tasks correctly
+            task_dependency.dependency_target = 'onstart'
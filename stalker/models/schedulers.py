@@ -24,6 +24,8 @@ import tempfile
 import datetime
 import time
 import csv
+import hashlib
+import shutil
 
 import stalker
 from stalker import defaults
@@ -35,16 +37,571 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
+def _run_tj3(args, process_started=None):
+    """Runs TaskJuggler for the given tjp file and returns the return code,
+    the stderr lines, the wall clock time and the cpu time of the process.
+
+    It is a module level function to let it be used with a
+    multiprocessing.Pool.
+
+    :param args: A tuple of (tj_command, tjp_file_full_path)
+    :param process_started: A callable which is called with the
+      subprocess.Popen instance right after the process is started, it is
+      used for killing the process when the scheduling is cancelled.
+    :returns: (int, list, float, float)
+    """
+    tj_command, tjp_file_full_path = args
+    start = time.time()
+    start_times = os.times()
+    process = subprocess.Popen(
+        [tj_command, tjp_file_full_path],
+        stderr=subprocess.PIPE
+    )
+    if process_started is not None:
+        process_started(process)
+    # wait it to complete
+    stderr = process.communicate()[1].splitlines(True)
+    end_times = os.times()
+    end = time.time()
+    # the user and system times of the terminated child processes
+    cpu_time = (end_times[2] + end_times[3]) - \
+        (start_times[2] + start_times[3])
+    return process.returncode, stderr, end - start, cpu_time
+
+
+# the ScheduleStats instances that are counting the sql statements
+_counting_stats = []
+_sql_statement_listener_installed = False
+
+
+def _count_sql_statement(conn, cursor, statement, parameters, context,
+                         executemany):
+    """counts the executed sql statements for the ScheduleStats instances that
+    are counting
+    """
+    for stats in _counting_stats:
+        stats.sql_statement_count += 1
+
+
+class ScheduleStats(object):
+    """Holds the timings and the counters of a scheduling run.
+
+    A new instance is created in every :meth:`.TaskJugglerScheduler.schedule`
+    call and stored in the :attr:`.SchedulerBase.stats` attribute.
+    :meth:`.Studio.schedule` also stores the last runs in the
+    :attr:`.Studio.schedule_stats` attribute by using the :meth:`.to_dict`
+    method.
+
+    The following values are stored:
+
+      +---------------------+------------------------------------------------+
+      | Attribute           | Description                                    |
+      +=====================+================================================+
+      | started_at          | The date the scheduling is started at          |
+      +---------------------+------------------------------------------------+
+      | render_seconds      | The time spent while rendering the tjp files   |
+      +---------------------+------------------------------------------------+
+      | bytes_written       | The size of the tjp files in bytes             |
+      +---------------------+------------------------------------------------+
+      | tj3_runs            | The number of TaskJuggler processes            |
+      +---------------------+------------------------------------------------+
+      | tj3_wall_seconds    | The wall clock time of TaskJuggler processes   |
+      +---------------------+------------------------------------------------+
+      | tj3_cpu_seconds     | The cpu time of TaskJuggler processes          |
+      +---------------------+------------------------------------------------+
+      | csv_rows            | The number of the parsed csv rows              |
+      +---------------------+------------------------------------------------+
+      | db_rows_updated     | The number of updated or inserted db rows      |
+      +---------------------+------------------------------------------------+
+      | sql_statement_count | The number of executed sql statements          |
+      +---------------------+------------------------------------------------+
+      | commit_seconds      | The time spent while committing the results    |
+      +---------------------+------------------------------------------------+
+      | total_seconds       | The total time of the scheduling               |
+      +---------------------+------------------------------------------------+
+    """
+
+    fields = [
+        'started_at', 'render_seconds', 'bytes_written', 'tj3_runs',
+        'tj3_wall_seconds', 'tj3_cpu_seconds', 'csv_rows', 'db_rows_updated',
+        'sql_statement_count', 'commit_seconds', 'total_seconds'
+    ]
+
+    def __init__(self):
+        self.started_at = datetime.datetime.now()
+        self.render_seconds = 0.0
+        self.bytes_written = 0
+        self.tj3_runs = 0
+        self.tj3_wall_seconds = 0.0
+        self.tj3_cpu_seconds = 0.0
+        self.csv_rows = 0
+        self.db_rows_updated = 0
+        self.sql_statement_count = 0
+        self.commit_seconds = 0.0
+        self.total_seconds = 0.0
+        self._start = None
+
+    def start(self):
+        """starts the total timer and counting the executed sql statements
+        """
+        global _sql_statement_listener_installed
+        if not _sql_statement_listener_installed:
+            from sqlalchemy import event
+            from sqlalchemy.engine import Engine
+            event.listen(Engine, 'before_cursor_execute', _count_sql_statement)
+            _sql_statement_listener_installed = True
+
+        self._start = time.time()
+        if self not in _counting_stats:
+            _counting_stats.append(self)
+
+    def stop(self):
+        """stops the total timer and counting the sql statements
+        """
+        if self in _counting_stats:
+            _counting_stats.remove(self)
+        if self._start is not None:
+            self.total_seconds = time.time() - self._start
+            self._start = None
+
+    def add_tj3_run(self, wall_seconds, cpu_seconds):
+        """adds the timings of a TaskJuggler run
+        """
+        self.tj3_runs += 1
+        self.tj3_wall_seconds += wall_seconds
+        self.tj3_cpu_seconds += cpu_seconds
+
+    def to_dict(self):
+        """returns a dictionary of the values
+        """
+        return dict([(field, getattr(self, field)) for field in self.fields])
+
+    def __repr__(self):
+        return '<ScheduleStats %s>' % ', '.join(
+            ['%s=%s' % (field, getattr(self, field))
+             for field in self.fields]
+        )
+
+
+class ScheduleResult(object):
+    """The in memory result of a dry run scheduling.
+
+    When the :attr:`.SchedulerBase.dry_run` attribute is True (or when
+    :meth:`.Studio.schedule` is called with ``dry_run=True``) the computed
+    values are not written to the database but they are collected in a
+    ScheduleResult instance which is stored in the
+    :attr:`.SchedulerBase.result` attribute. It maps the entity ids to
+    (computed_start, computed_end, resource_ids) tuples::
+
+      result = studio.schedule(dry_run=True)
+      start, end, resource_ids = result[task.id]
+
+      # see what will change
+      for entity_id, (old, new) in result.diff().items():
+          print(entity_id, old, new)
+
+      # write it in one bulk update, or just throw it away
+      result.apply()
+      DBSession.commit()
+
+    :param data: A list of tuples in (entity_id, computed_start,
+      computed_end, resource_ids) format
+    """
+
+    def __init__(self, data=None):
+        self.data = []
+        self._values = {}
+        self.extend(data or [])
+
+    def extend(self, data):
+        """adds the given data to the result
+
+        :param data: A list of tuples in (entity_id, computed_start,
+          computed_end, resource_ids) format
+        """
+        for entity_id, start, end, resource_ids in data:
+            self.data.append((entity_id, start, end, resource_ids))
+            self._values[entity_id] = (start, end, list(resource_ids))
+
+    def __getitem__(self, entity_id):
+        return self._values[entity_id]
+
+    def __contains__(self, entity_id):
+        return entity_id in self._values
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, entity_id, default=None):
+        """returns the (computed_start, computed_end, resource_ids) of the
+        given entity id or the default value
+        """
+        return self._values.get(entity_id, default)
+
+    def items(self):
+        """returns a list of (entity_id, (computed_start, computed_end,
+        resource_ids)) tuples
+        """
+        return list(self._values.items())
+
+    def current_values(self):
+        """Queries the computed values that are currently stored in the
+        database for the entities in this result.
+
+        :returns: A dictionary of entity ids to (computed_start, computed_end,
+          resource_ids) tuples, the resource_ids are sorted and they are
+          always empty for the projects
+        """
+        return self._query_current_values()[0]
+
+    def _query_current_values(self, chunk_size=500):
+        """queries the current computed values of the entities in this
+        result in chunks of the given size
+
+        :returns: (dict, set) The current values and the ids of the projects
+        """
+        from sqlalchemy import select
+        from stalker import Task, Project
+        from stalker.db.session import DBSession
+        from stalker.models.task import Task_Computed_Resources
+
+        connection = DBSession.connection()
+        ids = list(self._values)
+        values = {}
+        project_ids = set()
+        for table in [Task.__table__, Project.__table__]:
+            for i in range(0, len(ids), chunk_size):
+                for entity_id, start, end in connection.execute(
+                        select([table.c.id, table.c.computed_start,
+                                table.c.computed_end])
+                        .where(table.c.id.in_(ids[i:i + chunk_size]))):
+                    values[entity_id] = (start, end, [])
+                    if table is Project.__table__:
+                        project_ids.add(entity_id)
+
+        for i in range(0, len(ids), chunk_size):
+            for task_id, resource_id in connection.execute(
+                    select([Task_Computed_Resources.c.task_id,
+                            Task_Computed_Resources.c.resource_id])
+                    .where(Task_Computed_Resources.c.task_id.in_(
+                        ids[i:i + chunk_size]))):
+                values[task_id][2].append(resource_id)
+
+        for start, end, resource_ids in values.values():
+            resource_ids.sort()
+        return values, project_ids
+
+    def diff(self):
+        """Compares the result with the computed values that are currently
+        stored in the database.
+
+        :returns: A dictionary of the changed entity ids to (old, new) tuples
+          where both of them are (computed_start, computed_end, resource_ids)
+          tuples, the resource_ids are sorted. The computed resources of the
+          projects are not stored so they are not compared.
+        """
+        current_values, project_ids = self._query_current_values()
+        changes = {}
+        for entity_id, old in current_values.items():
+            start, end, resource_ids = self._values[entity_id]
+            if entity_id in project_ids:
+                resource_ids = []
+            new = (start, end, sorted(resource_ids))
+            if old != new:
+                changes[entity_id] = (old, new)
+        return changes
+
+    def apply(self, bulk_apply=True):
+        """Writes the result to the database, the session is not committed.
+
+        :param bool bulk_apply: Apply the result with set based statements.
+          The default is True.
+        :returns int: The number of updated and inserted rows
+        """
+        scheduler = SchedulerBase()
+        scheduler.bulk_apply = bulk_apply
+        if bulk_apply:
+            return scheduler._apply_csv_data_in_bulk(self.data)
+        return scheduler._apply_csv_data_per_row(self.data)
+
+    def discard(self):
+        """throws away the result
+        """
+        self.data = []
+        self._values = {}
+
+    def __repr__(self):
+        return '<ScheduleResult %s entities>' % len(self)
+
+
+class ScheduleJob(object):
+    """A handle of a scheduling run which is running in a background thread.
+
+    It is created and started by :meth:`.Studio.schedule_async`. The thread
+    has its own database session (:data:`.DBSession` is a thread local
+    scoped session), the :class:`.Studio`, the :class:`.User` who is doing
+    the scheduling and the :class:`.Project` instances to schedule are
+    queried again by their ids in that session and the scheduling is done by
+    calling :meth:`.Studio.schedule` in the background thread. So the
+    database should be reachable from the other threads too (an in memory
+    SQLite database is not).
+
+    The :attr:`.status` attribute is one of ``pending``, ``running``,
+    ``finished``, ``failed`` or ``cancelled``. The :attr:`.phase` shows the
+    current phase of the scheduler (``render``, ``solve`` or ``apply``, see
+    :attr:`.SchedulerBase.phases`) and :attr:`.progress` is a float between 0
+    and 1 calculated from the phase.
+
+    Use :meth:`.wait` or :meth:`.result` to wait the job to finish and
+    :meth:`.cancel` to cancel it, which also kills the running TaskJuggler
+    process.
+
+    :param int studio_id: The id of the :class:`.Studio` to schedule.
+
+    :param scheduler: The :class:`.SchedulerBase` instance to schedule the
+      studio with.
+
+    :param int scheduled_by_id: The id of the :class:`.User` who is doing
+      the scheduling. The default is None.
+
+    :param project_ids: A list of :class:`.Project` ids to schedule, None
+      means all the active projects. The default is None.
+    """
+
+    def __init__(self, studio_id, scheduler, scheduled_by_id=None,
+                 project_ids=None):
+        import threading
+
+        self.studio_id = studio_id
+        self.scheduler = scheduler
+        self.scheduled_by_id = scheduled_by_id
+        self.project_ids = project_ids
+
+        self.status = 'pending'
+        self.started_at = None
+        self.finished_at = None
+
+        self._result = None
+        self._exception = None
+        self._cancel_requested = False
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+
+    def start(self):
+        """starts the job in a background thread
+        """
+        self._thread.start()
+
+    def _run(self):
+        """runs the scheduling in the background thread
+        """
+        from stalker import Studio, User, Project
+        from stalker.db.session import DBSession
+        from stalker.exceptions import ScheduleCancelledError
+
+        try:
+            with self._lock:
+                if self._cancel_requested:
+                    raise ScheduleCancelledError(
+                        'the scheduling is cancelled before it is started'
+                    )
+                self.scheduler._cancelled = False
+                self.scheduler.phase = None
+                self.status = 'running'
+                self.started_at = datetime.datetime.now()
+
+            studio = Studio.query.get(self.studio_id)
+            scheduled_by = None
+            if self.scheduled_by_id is not None:
+                scheduled_by = User.query.get(self.scheduled_by_id)
+            projects = None
+            if self.project_ids is not None:
+                projects = Project.query\
+                    .filter(Project.id.in_(self.project_ids)).all()
+
+            studio.scheduler = self.scheduler
+            self._result = studio.schedule(
+                scheduled_by=scheduled_by,
+                projects=projects
+            )
+            self.status = 'finished'
+        except ScheduleCancelledError as e:
+            logger.debug('scheduling job is cancelled: %s' % e)
+            DBSession.rollback()
+            self._exception = e
+            self.status = 'cancelled'
+        except Exception as e:
+            logger.debug('scheduling job is failed: %s' % e)
+            DBSession.rollback()
+            self._exception = e
+            self.status = 'failed'
+        finally:
+            with self._lock:
+                self.scheduler._cancelled = False
+            self.finished_at = datetime.datetime.now()
+            DBSession.remove()
+            self._done.set()
+
+    @property
+    def phase(self):
+        """the current phase of the job, ``pending`` before the scheduler
+        enters its first phase and ``done`` after the job is finished
+        """
+        if self._done.is_set():
+            return 'done'
+        return self.scheduler.phase or 'pending'
+
+    @property
+    def progress(self):
+        """returns a float between 0 and 1 showing the progress of the job by
+        using the index of the current phase in the
+        :attr:`.SchedulerBase.phases`
+        """
+        phase = self.phase
+        if phase == 'done':
+            return 1.0
+        phases = self.scheduler.phases
+        if phase not in phases:
+            return 0.0
+        return float(phases.index(phase)) / len(phases)
+
+    def done(self):
+        """returns True if the job is finished, failed or cancelled
+        """
+        return self._done.is_set()
+
+    def cancel(self):
+        """Cancels the job. If the job is running the scheduler is cancelled
+        (see :meth:`.SchedulerBase.cancel`), the running TaskJuggler process
+        is killed and the job finishes with the ``cancelled`` status as soon
+        as possible.
+
+        :returns: False if the job is already finished, True otherwise
+        """
+        with self._lock:
+            if self._done.is_set():
+                return False
+            self._cancel_requested = True
+            if self.status == 'running':
+                self.scheduler.cancel()
+        return True
+
+    def wait(self, timeout=None):
+        """Waits the job to finish.
+
+        :param float timeout: The timeout in seconds, None means no timeout
+        :returns: True if the job is finished, False if the timeout is
+          reached
+        """
+        self._done.wait(timeout)
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """Waits the job to finish and returns the value returned by
+        :meth:`.Studio.schedule`. Raises the exception of the job if it is
+        failed or cancelled.
+
+        :param float timeout: The timeout in seconds, None means no timeout
+        :raises RuntimeError: If the job is not finished in the given timeout
+        """
+        if not self.wait(timeout):
+            raise RuntimeError(
+                'the scheduling job is not finished in %s seconds' % timeout
+            )
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self, timeout=None):
+        """Waits the job to finish and returns the exception raised by the
+        job or None if it is finished successfully.
+
+        :param float timeout: The timeout in seconds, None means no timeout
+        :raises RuntimeError: If the job is not finished in the given timeout
+        """
+        if not self.wait(timeout):
+            raise RuntimeError(
+                'the scheduling job is not finished in %s seconds' % timeout
+            )
+        return self._exception
+
+    def __repr__(self):
+        return '<ScheduleJob %s %s>' % (self.status, self.phase)
+
+
 class SchedulerBase(object):
     """This is the base class for schedulers.
 
     All the schedulers should be derived from this class.
+
+    If the :attr:`.dry_run` attribute is set to True the scheduling results
+    are not written to the database, they are stored in the :attr:`.result`
+    attribute as a :class:`.ScheduleResult` instance.
+
+    If the :attr:`.projects` attribute is set to a list of
+    :class:`.Project` instances, only those projects (and the active
+    projects that they are depending on) are scheduled and the load of the
+    resources coming from the other active projects is frozen (see
+    :meth:`._get_frozen_load`).
+
+    The :attr:`.phase` attribute shows the current phase of the scheduling,
+    which is one of the :attr:`.phases`, and :meth:`.cancel` can be called
+    from another thread to cancel the scheduling. The cancellation is checked
+    while passing from one phase to another and a
+    :class:`.ScheduleCancelledError` is raised.
     """
 
+    phases = ['render', 'solve', 'apply']
+
     def __init__(self, studio=None):
         self._studio = None
         self.studio = studio
 
+        # the projects to schedule, None means all the active projects
+        self.projects = None
+
+        self.stats = None
+        self.bulk_apply = True
+        self.bulk_chunk_size = 500
+        self.dry_run = False
+        self.result = None
+        self.preload = True
+        self._preloaded = []
+
+        self.phase = None
+        self._cancelled = False
+
+    def cancel(self):
+        """Cancels the running scheduling. It is safe to call it from another
+        thread, the scheduling is stopped with a
+        :class:`.ScheduleCancelledError` at the next phase.
+        """
+        self._cancelled = True
+
+    def _check_cancelled(self):
+        """raises a ScheduleCancelledError if the scheduling is cancelled
+        """
+        from stalker.exceptions import ScheduleCancelledError
+        if self._cancelled:
+            raise ScheduleCancelledError(
+                'the scheduling is cancelled in %s phase' % self.phase
+            )
+
+    def _set_phase(self, phase):
+        """sets the current phase of the scheduling after checking if the
+        scheduling is cancelled
+
+        :param str phase: One of the :attr:`.phases`
+        """
+        self._check_cancelled()
+        logger.debug('scheduling phase: %s' % phase)
+        self.phase = phase
+
     def _validate_studio(self, studio_in):
         """validates the given studio_in value
         """
@@ -70,220 +627,1384 @@ class SchedulerBase(object):
         """
         self._studio = self._validate_studio(studio_in)
 
-    def schedule(self):
-        """the main scheduling function should be implemented in the
-        derivatives
+    def _apply_csv_data(self, data):
+        """applies the given csv data with :meth:`._apply_csv_data_in_bulk` or
+        :meth:`._apply_csv_data_per_row` depending on the :attr:`.bulk_apply`
+        attribute, or collects it in the :attr:`.result` in dry run mode.
+
+        :param data: A list of tuples in (entity_id, computed_start,
+          computed_end, resource_ids) format, like the one returned by
+          :meth:`.TaskJugglerScheduler._read_csv_file`
         """
-        raise NotImplementedError
+        if self.dry_run:
+            if self.result is None:
+                self.result = ScheduleResult()
+            self.result.extend(data)
+            row_count = 0
+        elif self.bulk_apply:
+            row_count = self._apply_csv_data_in_bulk(data)
+        else:
+            row_count = self._apply_csv_data_per_row(data)
 
+        if self.stats is not None:
+            self.stats.csv_rows += len(data)
+            self.stats.db_rows_updated += row_count
 
-class TaskJugglerScheduler(SchedulerBase):
-    """This is the main scheduler for Stalker right now.
+    def _apply_csv_data_per_row(self, data):
+        """applies the given csv data by setting the computed_start,
+        computed_end and computed_resources attributes of each entity through
+        the ORM one by one.
 
-    This class prepares the data for TaskJuggler and let it solve the
-    scheduling problem, and then retrieves the solved date and resource data
-    back.
+        :param data: A list of tuples in (entity_id, computed_start,
+          computed_end, resource_ids) format, like the one returned by
+          :meth:`.TaskJugglerScheduler._read_csv_file`
+        :returns int: The number of updated entities
+        """
+        from stalker import User
 
-    TaskJugglerScheduler needs a :class:`.Studio` instance to work with, it
-    will create a .tjp file and then solve the tasks and restore the
-    computed_start and computed_end dates and the computed_resources
-    attributes for each task.
+        updated_count = 0
+        for entity_id, start_date, end_date, resource_ids in data:
+            entity = Entity.query.filter(Entity.id == entity_id).first()
+            if entity:
+                computed_resources = \
+                    User.query.filter(User.id.in_(resource_ids)).all()
 
-    Stalker will pass all its data to TaskJuggler by creating a tjp file that
-    TaskJuggler can parse. This tjp file has all the Projects, Tasks, Users,
-    Departments, TimeLogs, Vacations and everything that TJ need for solving
-    the tasks. With every new version of it, Stalker tries to cover more and
-    more TaskJuggler directives.
+                entity.computed_start = start_date
+                entity.computed_end = end_date
+                entity.computed_resources = computed_resources
+                updated_count += 1
+        return updated_count
 
-    .. note::
-       .. versionadded:: 0.2.5
-          Alternative Resources
+    def _apply_csv_data_in_bulk(self, data):
+        """applies the given csv data with set based UPDATE and INSERT
+        statements.
 
-       Stalker is now able to pass alternative resources to TaskJuggler.
-       Although, per resource alternatives are not yet possible, it will be
-       implemented in future versions of Stalker.
+        All the referenced Tasks, Projects and Users are queried with a couple
+        of queries, then the computed dates and the Task_Computed_Resources
+        rows are written with executemany statements. The instances that are
+        already in the session are expired, so they will be refreshed from the
+        database on next access.
 
-    .. note::
-       .. versionadded:: 0.2.5
-          Task Dependency Relation Attributes
+        :param data: A list of tuples in (entity_id, computed_start,
+          computed_end, resource_ids) format, like the one returned by
+          :meth:`.TaskJugglerScheduler._read_csv_file`
+        :returns int: The number of updated and inserted rows
+        """
+        from sqlalchemy import bindparam
+        from stalker import User, Task, Project
+        from stalker.db.session import DBSession
+        from stalker.models.task import Task_Computed_Resources
 
-       Stalker now can use 'gapduration', 'gaplength', 'onstart' and 'onend'
-       TaskJuggler directives for each dependent task of a task. Use the
-       TaskDependency instance in Task.task_dependency attribute to control how
-       a particular task is depending to another task.
+        if not data:
+            return 0
 
-    .. warning::
-       **Task.computed_resources Attribute Content**
+        # flush any pending change before touching the tables directly
+        DBSession.flush()
 
-       After the scheduling is finished, TaskJuggler will create a ``csv``
-       report that TaskJugglerScheduler will parse. This csv file contains the
-       ``id``, ``start date``, ``end date`` and ``resources`` data. The
-       resources reported back by TJ will be stored in
-       :attr:`.Task.computed_resources` attribute.
+        tasks_table = Task.__table__
+        projects_table = Project.__table__
+        users_table = User.__table__
 
-       TaskJuggler will put all the resources who may have entered a
-       :class:`.TimeLog` previously to the csv file. But the resources from the
-       csv file may not be in :attr:`.Task.resources` or
-       :attr:`.Task.alternative_resources` anymore. Because of that,
-       TaskJugglerScheduler will only store the resources those are both in csv
-       file and in :attr:`.Task.resources` or
-       :attr:`.Task.alternative_resources` attributes.
+        entity_ids = [row[0] for row in data]
+        resource_ids = set()
+        for row in data:
+            resource_ids.update(row[3])
 
-    Stalker will export each Project to tjp as the highest task in the
-    hierarchy and all the projects will be combined in to the same tjp file.
-    Combining all the Projects in one tjp file has a very nice side effect,
-    projects using the same resources will respect their allocations to the
-    resource. So that when a TaskJugglerScheduler instance is used to schedule
-    the project, all projects are scheduled together.
+        connection = DBSession.connection()
 
-    The following table shows which Stalker data type is converted to which
-    TaskJuggler type:
-    
-      +------------+-------------+
-      | Stalker    | TaskJuggler |
-      +============+=============+
-      | Studio     | Project     |
-      +------------+-------------+
-      | Project    | Task        |
-      +------------+-------------+
-      | Task       | Task        |
-      +------------+-------------+
-      | Asset      | Task        |
-      +------------+-------------+
-      | Shot       | Task        |
-      +------------+-------------+
-      | Sequence   | Task        |
-      +------------+-------------+
-      | Departmemt | Resource    |
-      +------------+-------------+
-      | User       | Resource    |
-      +------------+-------------+
-      | TimeLog    | Booking     |
-      +------------+-------------+
-      | Vacation   | Vacation    |
-      +------------+-------------+
-      
+        task_ids = self._query_ids(connection, tasks_table, entity_ids)
+        project_ids = self._query_ids(connection, projects_table, entity_ids)
+        user_ids = self._query_ids(connection, users_table, resource_ids)
 
-    """
+        timing_resolution = defaults.timing_resolution
+        task_values = []
+        project_values = []
+        computed_resources = []
+        for entity_id, start_date, end_date, res_ids in data:
+            if entity_id in task_ids:
+                # do the same thing that Task._validate_computed_start and
+                # Task._validate_computed_end are doing
+                start = Task.round_time(start_date)
+                end = Task.round_time(end_date)
+                if end - start < timing_resolution:
+                    end = start + timing_resolution
+                task_values.append({
+                    'b_id': entity_id,
+                    'b_computed_start': start_date,
+                    'b_computed_end': end_date,
+                    'b_start': start,
+                    'b_end': end,
+                    'b_duration': end - start
+                })
+                for resource_id in res_ids:
+                    if resource_id in user_ids:
+                        computed_resources.append({
+                            'task_id': entity_id,
+                            'resource_id': resource_id
+                        })
+            elif entity_id in project_ids:
+                project_values.append({
+                    'b_id': entity_id,
+                    'b_computed_start': start_date,
+                    'b_computed_end': end_date
+                })
 
-    def __init__(self, studio=None):
-        super(TaskJugglerScheduler, self).__init__(studio)
+        if task_values:
+            connection.execute(
+                tasks_table.update()
+                .where(tasks_table.c.id == bindparam('b_id'))
+                .values(
+                    computed_start=bindparam('b_computed_start'),
+                    computed_end=bindparam('b_computed_end'),
+                    start=bindparam('b_start'),
+                    end=bindparam('b_end'),
+                    duration=bindparam('b_duration')
+                ),
+                task_values
+            )
 
-        self.tjp_content = ''
+            # replace the computed resources
+            task_id_list = list(task_ids)
+            for i in range(0, len(task_id_list), self.bulk_chunk_size):
+                connection.execute(
+                    Task_Computed_Resources.delete().where(
+                        Task_Computed_Resources.c.task_id.in_(
+                            task_id_list[i:i + self.bulk_chunk_size]
+                        )
+                    )
+                )
 
-        self.temp_file_full_path = None
-        self.temp_file_path = None
-        self.temp_file_name = None
+            if computed_resources:
+                connection.execute(
+                    Task_Computed_Resources.insert(),
+                    computed_resources
+                )
 
-        self.tjp_file_full_path = None
-        self.tjp_file = None
+        if project_values:
+            connection.execute(
+                projects_table.update()
+                .where(projects_table.c.id == bindparam('b_id'))
+                .values(
+                    computed_start=bindparam('b_computed_start'),
+                    computed_end=bindparam('b_computed_end')
+                ),
+                project_values
+            )
 
-        self.csv_file_full_path = None
-        self.csv_file = None
+        # expire the instances that are already in the session
+        for instance in list(DBSession.identity_map.values()):
+            if isinstance(instance, Task) and instance.id in task_ids:
+                DBSession.expire(
+                    instance,
+                    ['computed_start', 'computed_end', '_start', '_end',
+                     '_duration', '_computed_resources']
+                )
+            elif isinstance(instance, Project) and \
+                    instance.id in project_ids:
+                DBSession.expire(instance, ['computed_start', 'computed_end'])
 
-    def _create_tjp_file(self):
-        """creates the tjp file
+        logger.debug(
+            'bulk updated %s tasks, %s projects and inserted %s computed '
+            'resources' %
+            (len(task_values), len(project_values), len(computed_resources))
+        )
+        return len(task_values) + len(project_values) + \
+            len(computed_resources)
+
+    def _query_ids(self, connection, table, ids):
+        """returns the set of ids those are present in the given table, the
+        query is split in to chunks of :attr:`.bulk_chunk_size` items to not
+        to hit the bound parameter limits of the database.
+
+        :param connection: The SQLAlchemy connection to use
+        :param table: The SQLAlchemy Table instance to query
+        :param ids: The ids to look for
         """
-        self.temp_file_full_path = tempfile.mktemp(prefix='Stalker_')
-        self.temp_file_name = os.path.basename(self.temp_file_full_path)
-        self.tjp_file_full_path = self.temp_file_full_path + ".tjp"
-        self.csv_file_full_path = self.temp_file_full_path + ".csv"
+        from sqlalchemy import select
 
-    def _create_tjp_file_content(self):
-        """creates the tjp file content
+        ids = list(ids)
+        found_ids = set()
+        for i in range(0, len(ids), self.bulk_chunk_size):
+            result = connection.execute(
+                select([table.c.id]).where(
+                    table.c.id.in_(ids[i:i + self.bulk_chunk_size])
+                )
+            )
+            found_ids.update([r[0] for r in result.fetchall()])
+        return found_ids
+
+    def _preload(self, projects):
+        """Loads the tasks of the given projects along with their children,
+        dependencies, resources, alternative resources and time logs, and all
+        the users along with their vacations, with a fixed number of queries
+        by using subquery loads. So walking the projects while rendering the
+        tjp file or while scheduling doesn't issue one query per relation.
+
+        The loaded instances are kept in the :attr:`._preloaded` attribute,
+        because the session keeps only weak references to them. Nothing is
+        loaded if the :attr:`.preload` attribute is False.
+
+        :param projects: A list of :class:`.Project` instances
         """
-        from jinja2 import Template
+        from sqlalchemy.orm import subqueryload, subqueryload_all
+        from stalker import User, Task, TimeLog
+        from stalker.models.task import TaskDependency
 
-        template = Template(defaults.tjp_main_template)
+        self._preloaded = []
+        project_ids = [project.id for project in projects]
+        if not self.preload or not project_ids:
+            return
 
         start = time.time()
-        self.tjp_content = template.render({
-            'stalker': stalker,
-            'studio': self.studio,
-            'csv_file_name': self.temp_file_name,
-            'csv_file_full_path': self.temp_file_full_path
-        })
-        end = time.time()
+        users = User.query.options(subqueryload(User.vacations)).all()
+        tasks = Task.query \
+            .filter(Task.project_id.in_(project_ids)) \
+            .options(
+                subqueryload(Task._project),
+                subqueryload(Task.parent),
+                subqueryload(Task.children),
+                subqueryload_all(Task.task_depends_to, TaskDependency.task),
+                subqueryload_all(Task.task_depends_to,
+                                 TaskDependency.depends_to),
+                subqueryload(Task.resources),
+                subqueryload(Task.alternative_resources),
+                subqueryload_all(Task.time_logs, TimeLog.resource)
+            ).all()
+        self._preloaded = users + tasks
         logger.debug(
-            'rendering the whole tjp file took : %s seconds' % (end - start)
+            'preloading %s users and %s tasks took : %s seconds' %
+            (len(users), len(tasks), time.time() - start)
         )
 
-    def _fill_tjp_file(self):
-        """fills the tjp file with content
-        """
-        with open(self.tjp_file_full_path, 'w+') as self.tjp_file:
-            self.tjp_file.write(self.tjp_content)
+    def _add_depended_projects(self, projects):
+        """Returns the given projects along with the active projects that
+        the tasks of the given projects are depending on (recursively). A
+        dependency to a task which is not scheduled can not be placed in to
+        the tjp file, so these projects are scheduled too.
 
-    def _delete_tjp_file(self):
-        """deletes the temp tjp file
+        :param projects: A list of :class:`.Project` instances
+        :returns: list of :class:`.Project` instances
         """
+        from sqlalchemy import select, and_
+        from stalker import Project, Task
+        from stalker.db.session import DBSession
+        from stalker.models.task import TaskDependency
+
+        tasks = Task.__table__
+        depends_to_tasks = tasks.alias()
+        dependencies = TaskDependency.__table__
+        projects_table = Project.__table__
+
+        projects = list(projects)
+        project_ids = set(project.id for project in projects)
+        new_ids = set(project_ids)
+        while new_ids:
+            query = select(
+                [depends_to_tasks.c.project_id],
+                from_obj=dependencies
+                .join(tasks, dependencies.c.task_id == tasks.c.id)
+                .join(depends_to_tasks,
+                      dependencies.c.depends_to_id == depends_to_tasks.c.id)
+                .join(projects_table,
+                      depends_to_tasks.c.project_id == projects_table.c.id)
+            ).where(
+                and_(tasks.c.project_id.in_(list(new_ids)),
+                     projects_table.c.active == True)
+            ).distinct()
+            new_ids = set(
+                row[0] for row in DBSession.connection().execute(query)
+            ) - project_ids
+            if new_ids:
+                project_ids.update(new_ids)
+                projects.extend(
+                    Project.query.filter(Project.id.in_(list(new_ids)))
+                    .order_by(Project.id).all()
+                )
+        return projects
+
+    def _get_frozen_load(self):
+        """Returns the load of the resources coming from the active projects
+        which are not in the :attr:`.projects`. The load of each resource is
+        taken from the stored ``computed_start``, ``computed_end`` and
+        ``computed_resources`` values (or the ``resources`` if the task has
+        no computed resources) of the leaf tasks of these projects which are
+        ending after the start of the schedule horizon. The overlapping
+        intervals of a resource are merged.
+
+        The schedulers are considering the resources as busy in these
+        intervals, so the projects are scheduled around the frozen load of
+        the shared resources without scheduling the other projects again.
+
+        It returns an empty list if the :attr:`.projects` attribute is None,
+        which means all the active projects are scheduled.
+
+        :returns: A list of (:class:`.User`, [(start, end), ...]) tuples
+          sorted by the user ids.
+        """
+        from sqlalchemy import select, and_
+        from stalker import User, Project, Task
+        from stalker.db.session import DBSession
+        from stalker.models.task import Task_Resources, Task_Computed_Resources
+
+        if self.projects is None:
+            return []
+
+        tasks = Task.__table__
+        projects = Project.__table__
+        tasks_of_projects = \
+            tasks.join(projects, tasks.c.project_id == projects.c.id)
+
+        conditions = [
+            projects.c.active == True,
+            tasks.c.computed_start != None,
+            tasks.c.computed_end > self._get_schedule_start()
+        ]
+        project_ids = [project.id for project in self.projects]
+        if project_ids:
+            conditions.append(~tasks.c.project_id.in_(project_ids))
+        condition = and_(*conditions)
+
+        connection = DBSession.connection()
+        intervals = {}
+        parent_ids = set()
+        for task_id, parent_id, start, end in connection.execute(
+                select([tasks.c.id, tasks.c.parent_id, tasks.c.computed_start,
+                        tasks.c.computed_end], from_obj=tasks_of_projects)
+                .where(condition)):
+            intervals[task_id] = (start, end)
+            parent_ids.add(parent_id)
+
+        # only the leaf tasks are booking the resources
+        for parent_id in parent_ids:
+            intervals.pop(parent_id, None)
+        if not intervals:
+            return []
+
+        resource_ids = {}
+        computed_resource_ids = {}
+        for table, ids in [(Task_Resources, resource_ids),
+                           (Task_Computed_Resources, computed_resource_ids)]:
+            for task_id, resource_id in connection.execute(
+                    select([table.c.task_id, table.c.resource_id],
+                           from_obj=table.join(
+                               tasks_of_projects,
+                               table.c.task_id == tasks.c.id))
+                    .where(condition)):
+                ids.setdefault(task_id, []).append(resource_id)
+
+        user_intervals = {}
+        for task_id, interval in intervals.items():
+            for resource_id in computed_resource_ids.get(
+                    task_id, resource_ids.get(task_id, [])):
+                user_intervals.setdefault(resource_id, []).append(interval)
+
+        frozen_load = []
+        for user_id in sorted(user_intervals):
+            merged = []
+            for start, end in sorted(user_intervals[user_id]):
+                if merged and start <= merged[-1][1]:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+                else:
+                    merged.append((start, end))
+            frozen_load.append((User.query.get(user_id), merged))
+
+        logger.debug(
+            'frozen load of %s resources from %s tasks' %
+            (len(frozen_load), len(intervals))
+        )
+        return frozen_load
+
+    def _get_schedule_start(self):
+        """Returns the start of the schedule horizon, which is the start of
+        the earliest :class:`.TimeLog` of the active projects or the start of
+        the day of :attr:`.Studio.now` whichever is earlier.
+
+        :returns: datetime.datetime
+        """
+        from sqlalchemy import select, func
+        from stalker import Project, Task, TimeLog
+        from stalker.db.session import DBSession
+
+        time_logs = TimeLog.__table__
+        tasks = Task.__table__
+        projects = Project.__table__
+
+        earliest_time_log = DBSession.connection().execute(
+            select(
+                [func.min(time_logs.c.start)],
+                from_obj=time_logs
+                .join(tasks, time_logs.c.task_id == tasks.c.id)
+                .join(projects, tasks.c.project_id == projects.c.id)
+            ).where(projects.c.active == True)
+        ).scalar()
+
+        start = self.studio.now.replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        if earliest_time_log is not None and earliest_time_log < start:
+            start = earliest_time_log
+        return start
+
+    def schedule(self):
+        """the main scheduling function should be implemented in the
+        derivatives
+        """
+        raise NotImplementedError
+
+
+class TJPFragmentCache(object):
+    """Caches the rendered TaskJuggler representation of the Projects.
+
+    Each cached fragment is stored along with a fingerprint of the rows that
+    the tjp representation of the project depends on (see
+    :meth:`.fingerprint`). While exporting, the fingerprint of the project is
+    queried from the database with a couple of aggregate queries and if it is
+    the same with the cached one the cached fragment is used instead of
+    walking the whole project hierarchy through the ORM again.
+
+    The fingerprint is built by using the row counts and the maximum
+    ``date_updated`` values, so the :attr:`.SimpleEntity.date_updated`
+    attribute of the changed Tasks and TimeLogs should be updated for the
+    cache to see the change. Use :meth:`.invalidate` to drop the cached
+    fragments manually.
+
+    The :attr:`.hits` and :attr:`.misses` attributes hold the number of
+    projects that are spliced in from the cache and rendered again
+    respectively.
+    """
+
+    def __init__(self):
+        self._fragments = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def fingerprint(cls, project):
+        """Returns a tuple that changes whenever the tjp representation of
+        the given project may change.
+
+        The tuple contains the project id, name and ``date_updated`` value,
+        the count and the maximum ``date_updated`` value of the tasks and the
+        time logs, the count of the task dependencies and the maximum
+        ``date_updated`` value of the depended tasks and the count of the
+        resources and alternative resources of the tasks.
+
+        :param project: A :class:`.Project` instance
+        :return: tuple
+        """
+        from sqlalchemy import select, func
+        from stalker import Task, TimeLog
+        from stalker.db.session import DBSession
+        from stalker.models.entity import SimpleEntity
+        from stalker.models.task import (TaskDependency, Task_Resources,
+                                         Task_Alternative_Resources)
+
+        tasks = Task.__table__
+        time_logs = TimeLog.__table__
+        dependencies = TaskDependency.__table__
+        entities = SimpleEntity.__table__
+
+        project_tasks = select([tasks.c.id])\
+            .where(tasks.c.project_id == project.id)
+
+        task_info = select(
+            [func.count(tasks.c.id), func.max(entities.c.date_updated)],
+            from_obj=tasks.join(entities, tasks.c.id == entities.c.id)
+        ).where(tasks.c.project_id == project.id)
+
+        time_log_info = select(
+            [func.count(time_logs.c.id), func.max(entities.c.date_updated)],
+            from_obj=time_logs.join(entities, time_logs.c.id == entities.c.id)
+        ).where(time_logs.c.task_id.in_(project_tasks))
+
+        dependency_info = select(
+            [func.count(dependencies.c.task_id),
+             func.max(entities.c.date_updated)],
+            from_obj=dependencies.join(
+                entities, dependencies.c.depends_to_id == entities.c.id
+            )
+        ).where(dependencies.c.task_id.in_(project_tasks))
+
+        resource_count = select([func.count(Task_Resources.c.task_id)])\
+            .where(Task_Resources.c.task_id.in_(project_tasks))
+
+        alternative_resource_count = \
+            select([func.count(Task_Alternative_Resources.c.task_id)])\
+            .where(Task_Alternative_Resources.c.task_id.in_(project_tasks))
+
+        connection = DBSession.connection()
+        result = [project.id, project.name, project.date_updated]
+        for query in [task_info, time_log_info, dependency_info,
+                      resource_count, alternative_resource_count]:
+            result.extend(connection.execute(query).fetchone())
+        return tuple(result)
+
+    def generate(self, project, compact_bookings=False):
+        """Generates the tjp representation of the given project. If the
+        project has not been changed since it is cached, the cached fragment
+        is yielded, otherwise the fragments generated by
+        :meth:`.Project.generate_tjp` are yielded and cached.
+
+        :param project: A :class:`.Project` instance
+
+        :param bool compact_bookings: Passed to :meth:`.Project.generate_tjp`.
+          The fragments rendered with and without compacted bookings are not
+          used in place of each other.
+        """
+        fingerprint = (self.fingerprint(project), bool(compact_bookings))
+        cached = self._fragments.get(project.id)
+        if cached is not None and cached[0] == fingerprint:
+            self.hits += 1
+            yield cached[1]
+            return
+
+        self.misses += 1
+        fragments = []
+        for fragment in project.generate_tjp(compact_bookings):
+            fragments.append(fragment)
+            yield fragment
+        self._fragments[project.id] = (fingerprint, ''.join(fragments))
+
+    def invalidate(self, project=None):
+        """Removes the cached fragment of the given project, or all the cached
+        fragments if project is None.
+
+        :param project: A :class:`.Project` instance or None
+        """
+        if project is None:
+            self._fragments = {}
+        else:
+            self._fragments.pop(project.id, None)
+
+    def __len__(self):
+        return len(self._fragments)
+
+
+class TJPResultCache(object):
+    """A content addressed cache for the TaskJuggler results.
+
+    The results (the csv files) of the TaskJuggler runs are stored on the
+    local disk with the hash of the tjp file that is scheduled. If a tjp file
+    with the same hash is scheduled again, the stored csv file is used and
+    TaskJuggler is not run at all.
+
+    The hash is created by skipping the temp file paths in the tjp file. The
+    ``now`` line is also skipped if there is no ``trackingscenario`` in the
+    tjp file, as TaskJuggler uses the ``now`` date only to separate the
+    bookings from the plan in the tracking scenario.
+
+    The cache is limited to ``max_size`` bytes and the least recently used
+    entries are removed first when the limit is exceeded. The :attr:`.hits`
+    and :attr:`.misses` attributes hold the number of cache hits and misses.
+
+    :param str path: The directory to store the cached csv files in. The
+      default is a folder called ``stalker_tjp_result_cache`` in the temp
+      directory.
+
+    :param int max_size: The maximum total size of the cached csv files in
+      bytes. The default is 100 MB.
+    """
+
+    def __init__(self, path=None, max_size=100 * 1024 * 1024):
+        if path is None:
+            path = os.path.join(
+                tempfile.gettempdir(), 'stalker_tjp_result_cache'
+            )
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def create_key(cls, tjp_file_full_path, temp_file_full_path):
+        """Returns the hash of the given tjp file.
+
+        :param str tjp_file_full_path: The path of the tjp file
+        :param str temp_file_full_path: The temp file path used in the tjp
+          file, which is removed from the content before hashing
+        :returns str: The hexadecimal sha1 digest
+        """
+        sha1 = hashlib.sha1()
+        temp_file_full_path = temp_file_full_path.encode('utf-8')
+        now_line = None
+        has_tracking_scenario = False
+        with open(tjp_file_full_path, 'rb') as f:
+            for line in f:
+                stripped_line = line.strip()
+                if stripped_line.startswith(b'now '):
+                    now_line = line
+                    continue
+                if stripped_line.startswith(b'trackingscenario '):
+                    has_tracking_scenario = True
+                sha1.update(line.replace(temp_file_full_path, b''))
+        if has_tracking_scenario and now_line is not None:
+            sha1.update(now_line)
+        return sha1.hexdigest()
+
+    def _entry_path(self, key):
+        """returns the path of the cached csv file for the given key
+        """
+        return os.path.join(self.path, '%s.csv' % key)
+
+    def get(self, key, csv_file_full_path):
+        """Copies the cached csv file of the given key to the given path.
+
+        :param str key: The key created with :meth:`.create_key`
+        :param str csv_file_full_path: The path to copy the csv file to
+        :returns bool: True if the key is found in the cache, False otherwise
+        """
+        entry_path = self._entry_path(key)
+        try:
+            shutil.copyfile(entry_path, csv_file_full_path)
+            # mark it as recently used
+            os.utime(entry_path, None)
+        except (IOError, OSError):
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def put(self, key, csv_file_full_path):
+        """Stores the given csv file in the cache with the given key and then
+        removes the least recently used entries if the cache is exceeding the
+        :attr:`.max_size`.
+
+        :param str key: The key created with :meth:`.create_key`
+        :param str csv_file_full_path: The path of the csv file to store
+        """
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        entry_path = self._entry_path(key)
+        temp_path = '%s.%s.tmp' % (entry_path, os.getpid())
+        shutil.copyfile(csv_file_full_path, temp_path)
+        os.rename(temp_path, entry_path)
+        self._evict()
+
+    def _entries(self):
+        """returns a list of (last_used, size, path) tuples of the cached csv
+        files
+        """
+        entries = []
+        if not os.path.exists(self.path):
+            return entries
+        for file_name in os.listdir(self.path):
+            if not file_name.endswith('.csv'):
+                continue
+            entry_path = os.path.join(self.path, file_name)
+            try:
+                stat = os.stat(entry_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+        return entries
+
+    def _evict(self):
+        """removes the least recently used entries until the total size is
+        not exceeding the :attr:`.max_size`
+        """
+        entries = sorted(self._entries())
+        total_size = sum([entry[1] for entry in entries])
+        while entries and total_size > self.max_size:
+            last_used, size, entry_path = entries.pop(0)
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+            total_size -= size
+
+    @property
+    def size(self):
+        """returns the total size of the cached csv files in bytes
+        """
+        return sum([entry[1] for entry in self._entries()])
+
+    def clear(self):
+        """removes all the cached csv files
+        """
+        for entry in self._entries():
+            try:
+                os.remove(entry[2])
+            except OSError:
+                pass
+
+    def __len__(self):
+        return len(self._entries())
+
+
+class TaskJugglerScheduler(SchedulerBase):
+    """This is the main scheduler for Stalker right now.
+
+    This class prepares the data for TaskJuggler and let it solve the
+    scheduling problem, and then retrieves the solved date and resource data
+    back.
+
+    TaskJugglerScheduler needs a :class:`.Studio` instance to work with, it
+    will create a .tjp file and then solve the tasks and restore the
+    computed_start and computed_end dates and the computed_resources
+    attributes for each task.
+
+    Stalker will pass all its data to TaskJuggler by creating a tjp file that
+    TaskJuggler can parse. This tjp file has all the Projects, Tasks, Users,
+    Departments, TimeLogs, Vacations and everything that TJ need for solving
+    the tasks. With every new version of it, Stalker tries to cover more and
+    more TaskJuggler directives.
+
+    .. note::
+       .. versionadded:: 0.2.5
+          Alternative Resources
+
+       Stalker is now able to pass alternative resources to TaskJuggler.
+       Although, per resource alternatives are not yet possible, it will be
+       implemented in future versions of Stalker.
+
+    .. note::
+       .. versionadded:: 0.2.5
+          Task Dependency Relation Attributes
+
+       Stalker now can use 'gapduration', 'gaplength', 'onstart' and 'onend'
+       TaskJuggler directives for each dependent task of a task. Use the
+       TaskDependency instance in Task.task_dependency attribute to control how
+       a particular task is depending to another task.
+
+    .. warning::
+       **Task.computed_resources Attribute Content**
+
+       After the scheduling is finished, TaskJuggler will create a ``csv``
+       report that TaskJugglerScheduler will parse. This csv file contains the
+       ``id``, ``start date``, ``end date`` and ``resources`` data. The
+       resources reported back by TJ will be stored in
+       :attr:`.Task.computed_resources` attribute.
+
+       TaskJuggler will put all the resources who may have entered a
+       :class:`.TimeLog` previously to the csv file. But the resources from the
+       csv file may not be in :attr:`.Task.resources` or
+       :attr:`.Task.alternative_resources` anymore. Because of that,
+       TaskJugglerScheduler will only store the resources those are both in csv
+       file and in :attr:`.Task.resources` or
+       :attr:`.Task.alternative_resources` attributes.
+
+    .. note::
+       .. versionadded:: 0.2.6
+          Bulk Result Application
+
+       By default the scheduling results are written back to the database
+       with a couple of set based UPDATE and INSERT statements instead of
+       setting the ``computed_start``, ``computed_end`` and
+       ``computed_resources`` attributes of each task one by one. Set the
+       ``bulk_apply`` argument to False to use the old per row path.
+
+    .. note::
+       .. versionadded:: 0.2.6
+          Streaming TJP Export
+
+       The tjp file is not rendered in to the :attr:`.tjp_content` attribute
+       anymore while scheduling, it is streamed directly to the tjp file. Use
+       :meth:`._create_tjp_file_content` to get the whole content as a string.
+
+    .. note::
+       .. versionadded:: 0.2.6
+          Parallel Scheduling
+
+       When the ``parallel`` argument is True, the active projects are
+       partitioned in to clusters that are not sharing any resource. The
+       projects and the users (through the task resources, alternative
+       resources and time logs) and the departments of the users are forming
+       a bipartite graph and each connected component of this graph, which
+       also considers the task dependencies between the projects, is
+       scheduled in its own tjp file by its own TaskJuggler process. The
+       results of all the processes are applied together. Studio wide
+       vacations are placed in every tjp file, so they are not connecting the
+       projects. The default is to schedule all the projects in one tjp file.
+
+    .. note::
+       .. versionadded:: 0.2.6
+          Schedule Result Cache
+
+       Pass a :class:`.TJPResultCache` instance with the ``result_cache``
+       argument to skip running TaskJuggler for the tjp files that have been
+       scheduled before, the cached csv results are used instead.
+
+    .. note::
+       .. versionadded:: 0.2.6
+          Incremental TJP Export
+
+       Pass a :class:`.TJPFragmentCache` instance with the ``fragment_cache``
+       argument to reuse the tjp representation of the projects that are not
+       changed since the last export.
+
+    .. note::
+       .. versionadded:: 0.2.6
+          Scoped Scheduling
+
+       Set the :attr:`.projects` attribute (or use the ``projects`` argument
+       of :meth:`.Studio.schedule`) to schedule only some of the active
+       projects. The load of the resources coming from the other active
+       projects is frozen and placed in to the tjp file as ``vacation``
+       intervals of the resources, so the scheduled projects are respecting
+       the shared resources without scheduling the other projects again. The
+       active projects that the tasks of the given projects are depending on
+       are also scheduled.
+
+    .. note::
+       .. versionadded:: 0.2.6
+          Booking Compaction
+
+       Every :class:`.TimeLog` is exported as a ``booking`` by default. Set
+       the ``compact_bookings`` argument to True to merge the time logs of
+       the same resource on the same task which are following each other
+       without a gap in to one booking. Only the touching time logs are
+       merged, so the scheduling result is the same with a smaller tjp file.
+
+    Stalker will export each Project to tjp as the highest task in the
+    hierarchy and all the projects will be combined in to the same tjp file.
+    Combining all the Projects in one tjp file has a very nice side effect,
+    projects using the same resources will respect their allocations to the
+    resource. So that when a TaskJugglerScheduler instance is used to schedule
+    the project, all projects are scheduled together.
+
+    The following table shows which Stalker data type is converted to which
+    TaskJuggler type:
+    
+      +------------+-------------+
+      | Stalker    | TaskJuggler |
+      +============+=============+
+      | Studio     | Project     |
+      +------------+-------------+
+      | Project    | Task        |
+      +------------+-------------+
+      | Task       | Task        |
+      +------------+-------------+
+      | Asset      | Task        |
+      +------------+-------------+
+      | Shot       | Task        |
+      +------------+-------------+
+      | Sequence   | Task        |
+      +------------+-------------+
+      | Departmemt | Resource    |
+      +------------+-------------+
+      | User       | Resource    |
+      +------------+-------------+
+      | TimeLog    | Booking     |
+      +------------+-------------+
+      | Vacation   | Vacation    |
+      +------------+-------------+
+      
+
+    :param studio: The :class:`.Studio` instance to schedule.
+
+    :param bool bulk_apply: If True (the default) the results coming from
+      TaskJuggler will be applied with set based SQL statements. If False the
+      results are applied through the ORM one task at a time.
+
+    :param fragment_cache: A :class:`.TJPFragmentCache` instance to cache the
+      tjp representation of the projects between the scheduling runs. The
+      default is None and every project is rendered on every run.
+
+    :param bool parallel: If True the independent project clusters are
+      scheduled in parallel with separate TaskJuggler processes. The default
+      is False.
+
+    :param int processes: The number of processes to use in parallel mode.
+      The default is None which uses the number of cpus.
+
+    :param result_cache: A :class:`.TJPResultCache` instance to reuse the
+      results of the previously scheduled tjp files. The default is None.
+
+    :param bool preload: Loads all the tasks of the projects with their
+      relations and all the users with their vacations with a fixed number of
+      queries before rendering the tjp file. The default is True.
+
+    :param bool compact_bookings: If True the time logs of the same resource
+      on the same task that are following each other without a gap are
+      exported as one booking (see :meth:`.Task.compacted_time_logs`). The
+      default is False.
+    """
+
+    def __init__(self, studio=None, bulk_apply=True, fragment_cache=None,
+                 parallel=False, processes=None, result_cache=None,
+                 preload=True, compact_bookings=False):
+        super(TaskJugglerScheduler, self).__init__(studio)
+
+        self.bulk_apply = bulk_apply
+        self.preload = preload
+        self.compact_bookings = compact_bookings
+        self.fragment_cache = fragment_cache
+        self.result_cache = result_cache
+        self.parallel = parallel
+        self.processes = processes
+
+        # the messages that TaskJuggler reports when the tasks don't fit in
+        # to the project time frame
+        self.horizon_error_messages = [
+            'has not been scheduled',
+            'not been fully scheduled',
+            'after the end of the project',
+            'before the start of the project',
+            'outside of the project time frame',
+            'does not fit',
+        ]
+        self.max_horizon_extensions = 10
+
+        self.tjp_content = ''
+        self._frozen_load = []
+        self._process = None
+
+        self.temp_file_full_path = None
+        self.temp_file_path = None
+        self.temp_file_name = None
+
+        self.tjp_file_full_path = None
+        self.tjp_file = None
+
+        self.csv_file_full_path = None
+        self.csv_file = None
+
+    def _create_tjp_file(self):
+        """creates the tjp file
+        """
+        self.temp_file_full_path = tempfile.mktemp(prefix='Stalker_')
+        self.temp_file_name = os.path.basename(self.temp_file_full_path)
+        self.tjp_file_full_path = self.temp_file_full_path + ".tjp"
+        self.csv_file_full_path = self.temp_file_full_path + ".csv"
+
+    def _tjp_template_variables(self):
+        """returns the variables used in rendering the main tjp template
+        """
+        return {
+            'stalker': stalker,
+            'studio': self.studio,
+            'csv_file_name': self.temp_file_name,
+            'csv_file_full_path': self.temp_file_full_path,
+            'projects': self.projects if self.projects is not None
+            else self.studio.active_projects,
+            'generate_project_tjp': self._generate_project_tjp,
+            'frozen_load': self._frozen_load
+        }
+
+    def _generate_project_tjp(self, project):
+        """Generates the tjp representation of the given project, by using
+        the :attr:`.fragment_cache` if there is one.
+
+        :param project: A :class:`.Project` instance
+        """
+        if self.fragment_cache is not None:
+            return self.fragment_cache.generate(
+                project, self.compact_bookings
+            )
+        return project.generate_tjp(self.compact_bookings)
+
+    def _create_tjp_file_content(self):
+        """creates the tjp file content
+        """
+        from stalker.models import get_template
+
+        template = get_template('tjp_main_template')
+
+        start = time.time()
+        self.tjp_content = template.render(self._tjp_template_variables())
+        end = time.time()
+        logger.debug(
+            'rendering the whole tjp file took : %s seconds' % (end - start)
+        )
+
+    def _generate_tjp_content(self):
+        """Generates the tjp file content fragment by fragment.
+
+        The main template is rendered with ``jinja2.Template.generate()`` and
+        the projects and tasks are generated with their ``generate_tjp()``
+        methods, so the fragments are yielded while walking the Studio,
+        Projects, Tasks, TaskDependencies and TimeLogs and the whole content
+        is never kept in memory.
+        """
+        from stalker.models import get_template
+
+        template = get_template('tjp_main_template')
+        return template.generate(self._tjp_template_variables())
+
+    def _fill_tjp_file(self):
+        """fills the tjp file with content
+        """
+        with open(self.tjp_file_full_path, 'w+') as self.tjp_file:
+            self.tjp_file.write(self.tjp_content)
+
+    def _write_tjp_file(self):
+        """streams the tjp file content straight to the tjp file, without
+        creating the whole content in memory first.
+
+        :returns int: The number of characters written
+        """
+        start = time.time()
+        written = 0
+        with open(self.tjp_file_full_path, 'w+') as self.tjp_file:
+            for fragment in self._generate_tjp_content():
+                self.tjp_file.write(fragment)
+                written += len(fragment)
+        end = time.time()
+        logger.debug(
+            'streaming the tjp file took : %s seconds' % (end - start)
+        )
+        if self.stats is not None:
+            self.stats.render_seconds += end - start
+            self.stats.bytes_written += \
+                os.path.getsize(self.tjp_file_full_path)
+        return written
+
+    def _delete_tjp_file(self):
+        """deletes the temp tjp file
+        """
+        try:
+            os.remove(self.tjp_file_full_path)
+        except OSError:
+            pass
+
+    def _delete_csv_file(self):
+        """deletes the temp csv file
+        """
+        try:
+            os.remove(self.csv_file_full_path)
+        except OSError:
+            pass
+
+    def _clean_up(self):
+        """removes the temp files
+        """
+        self._delete_tjp_file()
+        self._delete_csv_file()
+
+    def _read_csv_file(self):
+        """reads the whole csv file and returns a list of tuples in
+        (entity_id, computed_start, computed_end, resource_ids) format
+        """
+        logger.debug('csv_file_full_path : %s' % self.csv_file_full_path)
+
+        data = []
+        with open(self.csv_file_full_path, 'r') as self.csv_file:
+            csv_content = csv.reader(self.csv_file, delimiter=';')
+            lines = [line for line in csv_content]
+            lines.pop(0)
+            for line in lines:
+                id_line = line[0]
+                entity_id = int(id_line.split('.')[-1].split('_')[-1])
+                start_date = datetime.datetime.strptime(
+                    line[1], "%Y-%m-%d-%H:%M"
+                )
+                end_date = datetime.datetime.strptime(
+                    line[2], "%Y-%m-%d-%H:%M"
+                )
+
+                # computed_resources
+                resource_ids = []
+                for resource_data in line[3].split(','):
+                    resource_id = resource_data.split('_')[-1].split(')')[0]
+                    if resource_id.isdigit():
+                        resource_ids.append(int(resource_id))
+
+                data.append((entity_id, start_date, end_date, resource_ids))
+        return data
+
+    def _parse_csv_file(self):
+        """parses back the csv file and fills the tasks with computes_start and
+        computed end values
+        """
+        data = self._read_csv_file()
+        self._apply_csv_data(data)
+        logger.debug('completed parsing csv file')
+
+    def _get_cached_result(self):
+        """Looks up the current tjp file in the :attr:`.result_cache` and
+        copies the cached csv file to the current csv file path if it is
+        found.
+
+        :returns: (bool, str) A tuple of a bool showing if the result is
+          found in the cache and the key of the tjp file, the key is None if
+          there is no :attr:`.result_cache`
+        """
+        if self.result_cache is None:
+            return False, None
+        key = self.result_cache.create_key(
+            self.tjp_file_full_path, self.temp_file_full_path
+        )
+        return self.result_cache.get(key, self.csv_file_full_path), key
+
+    def _partition_projects(self, projects):
+        """Partitions the given projects in to clusters which are not sharing
+        any resources.
+
+        Projects are connected to the users who are a resource, an
+        alternative resource or have a time log in one of their tasks, the
+        users are connected to their departments, and the projects are
+        connected to each other through task dependencies. Each connected
+        component of this graph is returned as a list of projects.
+
+        :param projects: A list of :class:`.Project` instances
+        :returns: list of lists of :class:`.Project` instances
+        """
+        from sqlalchemy import select
+        from stalker import Task, TimeLog
+        from stalker.db.session import DBSession
+        from stalker.models.auth import User_Departments
+        from stalker.models.task import (TaskDependency, Task_Resources,
+                                         Task_Alternative_Resources)
+
+        parents = {}
+
+        def find(node):
+            root = node
+            while parents.setdefault(root, root) != root:
+                root = parents[root]
+            # compress the path
+            while parents[node] != root:
+                parents[node], node = root, parents[node]
+            return root
+
+        def union(node1, node2):
+            root1 = find(node1)
+            root2 = find(node2)
+            if root1 != root2:
+                parents[root2] = root1
+
+        project_ids = [project.id for project in projects]
+        for project_id in project_ids:
+            find(('project', project_id))
+
+        tasks = Task.__table__
+        depends_to_tasks = tasks.alias()
+        dependencies = TaskDependency.__table__
+        time_logs = TimeLog.__table__
+
+        queries = []
+        for table in [Task_Resources, Task_Alternative_Resources, time_logs]:
+            task_id_column = table.c.task_id
+            queries.append(
+                select(
+                    [tasks.c.project_id, table.c.resource_id],
+                    from_obj=table.join(tasks, task_id_column == tasks.c.id)
+                ).where(tasks.c.project_id.in_(project_ids))
+            )
+
+        connection = DBSession.connection()
+        user_ids = set()
+        for query in queries:
+            for project_id, user_id in connection.execute(query):
+                union(('project', project_id), ('user', user_id))
+                user_ids.add(user_id)
+
+        # departments
+        for user_id, department_id in connection.execute(
+                select([User_Departments.c.uid, User_Departments.c.did])):
+            if user_id in user_ids:
+                union(('user', user_id), ('department', department_id))
+
+        # dependencies between projects
+        dependency_query = select(
+            [tasks.c.project_id, depends_to_tasks.c.project_id],
+            from_obj=dependencies
+            .join(tasks, dependencies.c.task_id == tasks.c.id)
+            .join(depends_to_tasks,
+                  dependencies.c.depends_to_id == depends_to_tasks.c.id)
+        ).where(tasks.c.project_id != depends_to_tasks.c.project_id)
+        for project_id, depends_to_project_id in \
+                connection.execute(dependency_query):
+            union(('project', project_id), ('project', depends_to_project_id))
+
+        clusters = {}
+        for project in projects:
+            clusters.setdefault(find(('project', project.id)), [])\
+                .append(project)
+
+        # keep the order of the projects
+        return sorted(
+            clusters.values(),
+            key=lambda x: project_ids.index(x[0].id)
+        )
+
+    def _run_taskjuggler(self, tjp_file_full_path):
+        """Runs TaskJuggler for the given tjp file.
+
+        :param str tjp_file_full_path: The path of the tjp file
+        :returns: (int, list, float, float) The return code, the stderr lines,
+          the wall clock time and the cpu time of TaskJuggler
+        """
+        try:
+            return _run_tj3(
+                (defaults.tj_command, tjp_file_full_path),
+                self._process_started
+            )
+        finally:
+            self._process = None
+
+    def _process_started(self, process):
+        """stores the started TaskJuggler process to be able to kill it when
+        the scheduling is cancelled
+
+        :param process: A subprocess.Popen instance
+        """
+        self._process = process
+        if self._cancelled:
+            self._kill_process()
+
+    def _kill_process(self):
+        """kills the running TaskJuggler process if there is one
+        """
+        process = self._process
+        if process is not None and process.poll() is None:
+            logger.debug('killing TaskJuggler process %s' % process.pid)
+            try:
+                process.kill()
+            except OSError:
+                # already finished
+                pass
+
+    def cancel(self):
+        """Cancels the running scheduling and kills the running TaskJuggler
+        process. In parallel mode the TaskJuggler processes are not killed
+        and the scheduling is stopped after they are finished.
+        """
+        super(TaskJugglerScheduler, self).cancel()
+        self._kill_process()
+
+    def _run_taskjuggler_in_parallel(self, tjp_file_full_paths):
+        """Runs TaskJuggler for each of the given tjp files in parallel by
+        using a multiprocessing.Pool.
+
+        :param tjp_file_full_paths: A list of tjp file paths
+        :returns: A list of the values returned by :meth:`._run_taskjuggler`
+        """
+        import multiprocessing
+
+        if len(tjp_file_full_paths) < 2:
+            return [self._run_taskjuggler(path)
+                    for path in tjp_file_full_paths]
+
+        pool = multiprocessing.Pool(processes=self.processes)
         try:
-            os.remove(self.tjp_file_full_path)
-        except OSError:
-            pass
+            return pool.map(
+                _run_tj3,
+                [(defaults.tj_command, path) for path in tjp_file_full_paths]
+            )
+        finally:
+            pool.close()
+            pool.join()
 
-    def _delete_csv_file(self):
-        """deletes the temp csv file
+    def _schedule_in_parallel(self):
+        """Schedules the independent project clusters in parallel and applies
+        the results of all the TaskJuggler processes together.
+
+        :returns: The stderr lines of all the TaskJuggler processes
         """
+        scheduled_projects = self.projects
+        clusters = self._partition_projects(
+            scheduled_projects if scheduled_projects is not None
+            else self.studio.active_projects
+        )
+        logger.debug('scheduling %s project clusters' % len(clusters))
+
+        self._set_phase('render')
+        files = []
         try:
-            os.remove(self.csv_file_full_path)
-        except OSError:
-            pass
+            for projects in clusters:
+                self.projects = projects
+                self._create_tjp_file()
+                self._write_tjp_file()
+                is_cached, key = self._get_cached_result()
+                files.append(
+                    (self.tjp_file_full_path, self.csv_file_full_path,
+                     is_cached, key)
+                )
+        finally:
+            self.projects = scheduled_projects
 
-    def _clean_up(self):
-        """removes the temp files
+        self._set_phase('solve')
+        not_cached_files = [f for f in files if not f[2]]
+        results = self._run_taskjuggler_in_parallel(
+            [f[0] for f in not_cached_files]
+        )
+        self._check_cancelled()
+
+        stderr = []
+        for returncode, process_stderr, wall_time, cpu_time in results:
+            self.stats.add_tj3_run(wall_time, cpu_time)
+            stderr.extend(process_stderr)
+            if returncode:
+                # there is an error
+                raise RuntimeError(process_stderr)
+
+        if self.result_cache is not None:
+            for tjp_path, csv_path, is_cached, key in not_cached_files:
+                self.result_cache.put(key, csv_path)
+
+        # read back all the csv files and apply them together
+        self._set_phase('apply')
+        data = []
+        for tjp_path, csv_path, is_cached, key in files:
+            self.tjp_file_full_path = tjp_path
+            self.csv_file_full_path = csv_path
+            data.extend(self._read_csv_file())
+
+        self._apply_csv_data(data)
+
+        return stderr
+
+    def _update_schedule_horizon(self):
+        """Updates the :attr:`.Studio.start` and :attr:`.Studio.end` to the
+        schedule horizon. The start is calculated with
+        :meth:`._get_schedule_start`. If the studio is scheduled before, the
+        end recorded in the last run is kept, but in any case the end is at
+        least one month after the start.
         """
-        self._delete_tjp_file()
-        self._delete_csv_file()
+        start = self._get_schedule_start()
+        end = None
+        if self.studio.last_scheduled_at is not None:
+            end = self.studio.end
+        minimum_end = start + datetime.timedelta(days=30)
+        if end is None or end < minimum_end:
+            end = minimum_end
+        self._set_schedule_horizon(start, end)
 
-    def _parse_csv_file(self):
-        """parses back the csv file and fills the tasks with computes_start and
-        computed end values
+    def _extend_schedule_horizon(self, months):
+        """extends the end of the schedule horizon by the given months
+
+        :param int months: The number of months (30 days) to extend the
+          horizon with
         """
-        logger.debug('csv_file_full_path : %s' % self.csv_file_full_path)
-        from stalker import User  #, Task
-        # from stalker.db import DBSession
+        end = self.studio.end + datetime.timedelta(days=30 * months)
+        logger.debug(
+            'extending the schedule horizon by %s months to %s' %
+            (months, end)
+        )
+        self._set_schedule_horizon(self.studio.start, end)
 
-        with open(self.csv_file_full_path, 'r') as self.csv_file:
-            csv_content = csv.reader(self.csv_file, delimiter=';')
-            lines = [line for line in csv_content]
-            lines.pop(0)
-            for data in lines:
-                id_line = data[0]
-                entity_id = int(id_line.split('.')[-1].split('_')[-1])
-                entity = Entity.query.filter(Entity.id == entity_id).first()
-                # tasks = Task.__table__
-                if entity:
-                    start_date = datetime.datetime.strptime(
-                        data[1], "%Y-%m-%d-%H:%M"
-                    )
-                    end_date = datetime.datetime.strptime(
-                        data[2],
-                        "%Y-%m-%d-%H:%M"
-                    )
+    def _set_schedule_horizon(self, start, end):
+        """sets the studio start and end without altering them
+        """
+        self.studio._start = start
+        self.studio._end = end
+        self.studio._duration = end - start
 
-                    # computed_resources
-                    resources_data = map(
-                        lambda x: x.split('_')[-1].split(')')[0],
-                        data[3].split(',')
-                    )
-                    computed_resources = \
-                        User.query.filter(User.id.in_(resources_data)).all()
-
-                    entity.computed_start = start_date
-                    entity.computed_end = end_date
-                    entity.computed_resources = computed_resources
-                    # update_statement = tasks.update().values({
-                    #     tasks.c.start: start_date,
-                    #     tasks.c.end: end_date,
-                    #     tasks.c.computed_start: start_date,
-                    #     tasks.c.computed_end: end_date
-                    # }).where(tasks.c.id == entity_id)
-                    # DBSession.connection().execute(update_statement)
-        logger.debug('completed parsing csv file')
+    def _is_horizon_error(self, stderr):
+        """returns True if the given TaskJuggler output shows that some of
+        the tasks didn't fit in to the schedule horizon
+
+        :param stderr: The stderr lines of TaskJuggler
+        """
+        if not isinstance(stderr, (list, tuple)):
+            stderr = [stderr]
+        for line in stderr:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8', 'replace')
+            for message in self.horizon_error_messages:
+                if message in line:
+                    return True
+        return False
 
     def schedule(self):
         """Does the scheduling.
+
+        The schedule horizon (the :attr:`.Studio.start` and
+        :attr:`.Studio.end`) is updated before scheduling and it is extended
+        with the fibonacci series of months (2, 3, 5, 8 ...) when TaskJuggler
+        reports that some of the tasks don't fit in to it. In dry run mode
+        the original horizon is restored after scheduling.
         """
         # check the studio attribute
         from stalker import Studio
@@ -295,74 +2016,1005 @@ class TaskJugglerScheduler(SchedulerBase):
                 (self.__class__.__name__, self.studio.__class__.__name__)
             )
 
-        # ********************************************************************
-        # TODO: remove the hardcoded datetime
-        #
-        # Adjust Studio.start:
-        # 1- Looking at the earliest TimeLog entry for all of the active
-        #    Projects. If, there are no TimeLogs, use today 0:00.
-        # 2- Update the Studio.start if the project that have the earliest
-        #    TimeLog has been deactivated.
-        #
-        # Adjust Studio.end:
-        # 1- If the Studio.end is None, set it to Studio.start
-        # 2- Add 1 month to Studio.end
-        # 3- Schedule it.
-        # 4- If TaskJuggler complains about that some of the tasks doesn't fit
-        #    in to the time range, or some of the task marked as non scheduled,
-        #    increment the Studio.end by 2 months.
-        # 5- If TaskJuggler complains again then increment 3 months, and then
-        #    5, 8, 13, 21... that is the fibonacci series.
-        # 6- When TaskJuggler is successful on scheduling the projects, reset
-        #    the increment counter, and use this new date until TJ starts to
-        #    complain again.
-        #
-        self.studio._start = datetime.datetime(2013, 1, 1)
-        self.studio._end = datetime.datetime(2016, 1, 1)
-        #for project in self.studio.active_projects:
-        #    for root_task in project.root_tasks:
-        #        if root_task.start < self.studio.start:
-        #            self.studio.start = root_task.start
-        #        if root_task.end > self.studio.end:
-        #            self.studio.end = root_task.end
-
-        # now for safety multiply the duration by 2
-        #self.studio.end = (self.studio.end - self.studio.start) * 5 + \
-        #                  self.studio.start
+        self.result = ScheduleResult() if self.dry_run else None
+        horizon = (self.studio._start, self.studio._end,
+                   self.studio._duration)
+        scheduled_projects = self.projects
+
+        self.stats = ScheduleStats()
+        self.stats.start()
+        try:
+            if self.projects is not None:
+                self.projects = self._add_depended_projects(self.projects)
+            self._update_schedule_horizon()
+            self._preload(
+                self.projects if self.projects is not None
+                else self.studio.active_projects
+            )
+            self._frozen_load = self._get_frozen_load()
+
+            # extend the horizon with the fibonacci series of months as long
+            # as TaskJuggler complains about the tasks not fitting in to it
+            increment = 2
+            previous_increment = 1
+            extension_count = 0
+            while True:
+                can_extend = extension_count < self.max_horizon_extensions
+                try:
+                    stderr = self._run_scheduler()
+                except RuntimeError as e:
+                    stderr = e.args[0] if e.args else []
+                    if not can_extend or not self._is_horizon_error(stderr):
+                        raise
+                else:
+                    if not can_extend or not self._is_horizon_error(stderr):
+                        return stderr
+
+                self._extend_schedule_horizon(increment)
+                increment, previous_increment = \
+                    increment + previous_increment, increment
+                extension_count += 1
+        finally:
+            if self.dry_run:
+                self.studio._start, self.studio._end, \
+                    self.studio._duration = horizon
+            self.projects = scheduled_projects
+            self._preloaded = []
+            self._frozen_load = []
+            self.stats.stop()
+
+    def _run_scheduler(self):
+        """runs the scheduling for the current schedule horizon
+
+        :returns: The stderr lines of the TaskJuggler process(es)
+        """
+        if self.parallel:
+            return self._schedule_in_parallel()
+
+        self._set_phase('render')
 
         # create a tjp file
         self._create_tjp_file()
 
-        # create tjp file content
-        self._create_tjp_file_content()
-
-        # fill it with data
-        self._fill_tjp_file()
+        # stream the tjp file content directly to the file
+        self._write_tjp_file()
 
         logger.debug('tjp_file_full_path: %s' % self.tjp_file_full_path)
 
-        # pass it to tj3
-        process = subprocess.Popen(
-            [defaults.tj_command,
-             self.tjp_file_full_path],
-            stderr=subprocess.PIPE
-        )
-        # wait it to complete
-        process.wait()
+        is_cached, key = self._get_cached_result()
+        if is_cached:
+            logger.debug('using the cached result of %s' % key)
+            self._set_phase('apply')
+            self._parse_csv_file()
+            return []
 
-        stderr = process.stderr.readlines()
+        # pass it to tj3
+        self._set_phase('solve')
+        returncode, stderr, wall_time, cpu_time = \
+            self._run_taskjuggler(self.tjp_file_full_path)
+        self.stats.add_tj3_run(wall_time, cpu_time)
+        self._check_cancelled()
 
-        if process.returncode:
+        if returncode:
             # there is an error
             raise RuntimeError(stderr)
 
+        if self.result_cache is not None:
+            self.result_cache.put(key, self.csv_file_full_path)
+
         # read back the csv file
+        self._set_phase('apply')
         self._parse_csv_file()
 
-        logger.debug('tj3 return code: %s' % process.returncode)
+        logger.debug('tj3 return code: %s' % returncode)
         logger.debug('tj3 output: %s' % stderr)
 
         # remove the tjp file
         #self._clean_up()
 
         return stderr
+
+
+class TaskJugglerDaemonScheduler(TaskJugglerScheduler):
+    """A :class:`.TaskJugglerScheduler` which keeps a resident TaskJuggler
+    daemon (``tj3d``) running and submits the tjp files to it with
+    ``tj3client``, instead of starting a new ``tj3`` process for every
+    scheduling run. This saves the Ruby startup and the parser warm up time
+    of TaskJuggler which is especially noticeable when the projects are
+    scheduled over and over again.
+
+    Use it by setting the :attr:`.Studio.scheduler` attribute::
+
+      studio.scheduler = TaskJugglerDaemonScheduler()
+      studio.schedule()
+
+    The daemon is started with a private config file holding a random
+    authentication key in the first scheduling run (or with
+    :meth:`.start_daemon`) and it is kept running until :meth:`.stop_daemon`
+    is called or the Python interpreter exits. Before every run the daemon is
+    checked with ``tj3client status`` and it is restarted if it is not
+    responding. If the daemon can not be started or is not responding, the
+    tjp file is scheduled with the one shot ``tj3`` process as the
+    :class:`.TaskJugglerScheduler` does, and the :attr:`.fallback_count` is
+    incremented.
+
+    The daemon and the client commands are controlled with the
+    ``tj_daemon_command`` and ``tj_client_command`` settings.
+
+    It accepts all the arguments of the :class:`.TaskJugglerScheduler` and
+    the following:
+
+    :param float startup_timeout: The number of seconds to wait for the
+      daemon to respond after it is started. The default is 30 seconds.
+    """
+
+    def __init__(self, studio=None, startup_timeout=30, **kwargs):
+        super(TaskJugglerDaemonScheduler, self).__init__(studio, **kwargs)
+        self.startup_timeout = startup_timeout
+        self.daemon_process = None
+        self.config_file_full_path = None
+        self.fallback_count = 0
+        self._is_exit_handler_registered = False
+
+    def _run_client(self, args):
+        """runs tj3client with the given arguments
+
+        :param args: A list of arguments
+        :returns: (int, str, list) The return code, the stdout and the stderr
+          lines of tj3client
+        """
+        process = subprocess.Popen(
+            [defaults.tj_client_command, '-c', self.config_file_full_path] +
+            args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        stdout, stderr = process.communicate()
+        return process.returncode, stdout, stderr.splitlines(True)
+
+    def is_daemon_alive(self):
+        """returns True if the daemon is running and responding
+        """
+        if self.daemon_process is None or \
+                self.daemon_process.poll() is not None:
+            return False
+        try:
+            return self._run_client(['status'])[0] == 0
+        except OSError:
+            return False
+
+    def start_daemon(self):
+        """Starts the TaskJuggler daemon and waits until it responds.
+
+        :raises RuntimeError: If the daemon is not responding in
+          :attr:`.startup_timeout` seconds.
+        """
+        import atexit
+        import uuid
+
+        self.stop_daemon()
+
+        # create a config file with a random authentication key
+        self.config_file_full_path = tempfile.mktemp(
+            prefix='Stalker_tj3d_', suffix='.rc'
+        )
+        with open(self.config_file_full_path, 'w') as f:
+            f.write('_global:\n  authKey: %s\n' % uuid.uuid4().hex)
+
+        with open(os.devnull, 'w') as devnull:
+            self.daemon_process = subprocess.Popen(
+                [defaults.tj_daemon_command, '-c', self.config_file_full_path,
+                 '--dont-daemonize'],
+                stdout=devnull,
+                stderr=devnull
+            )
+
+        if not self._is_exit_handler_registered:
+            atexit.register(self.stop_daemon)
+            self._is_exit_handler_registered = True
+
+        timeout = time.time() + self.startup_timeout
+        while time.time() < timeout:
+            if self.is_daemon_alive():
+                logger.debug('tj3d is started')
+                return
+            if self.daemon_process.poll() is not None:
+                break
+            time.sleep(0.1)
+
+        self.stop_daemon()
+        raise RuntimeError(
+            'TaskJuggler daemon (%s) is not responding' %
+            defaults.tj_daemon_command
+        )
+
+    def stop_daemon(self):
+        """Stops the TaskJuggler daemon if it is running.
+        """
+        if self.daemon_process is not None:
+            if self.daemon_process.poll() is None:
+                try:
+                    self._run_client(['terminate'])
+                except OSError:
+                    pass
+
+                # give it some time to terminate gracefully
+                timeout = time.time() + 5
+                while self.daemon_process.poll() is None and \
+                        time.time() < timeout:
+                    time.sleep(0.1)
+
+                if self.daemon_process.poll() is None:
+                    self.daemon_process.kill()
+                    self.daemon_process.wait()
+            self.daemon_process = None
+
+        if self.config_file_full_path is not None:
+            try:
+                os.remove(self.config_file_full_path)
+            except OSError:
+                pass
+            self.config_file_full_path = None
+
+    def _run_taskjuggler(self, tjp_file_full_path):
+        """Schedules the given tjp file with the TaskJuggler daemon, or with
+        the one shot tj3 process if the daemon is not available.
+
+        :param str tjp_file_full_path: The path of the tjp file
+        :returns: (int, list, float, float) The return code, the stderr lines,
+          the wall clock time and the cpu time of TaskJuggler
+        """
+        start = time.time()
+        start_times = os.times()
+        try:
+            if not self.is_daemon_alive():
+                self.start_daemon()
+            returncode, stderr = self._submit_to_daemon(tjp_file_full_path)
+        except (OSError, RuntimeError) as e:
+            logger.warning(
+                'TaskJuggler daemon is not available, falling back to %s: %s'
+                % (defaults.tj_command, e)
+            )
+            self.fallback_count += 1
+            return super(TaskJugglerDaemonScheduler, self)\
+                ._run_taskjuggler(tjp_file_full_path)
+
+        end_times = os.times()
+        end = time.time()
+        # the cpu time of the daemon is not included, as it is not a child
+        # process that has terminated
+        cpu_time = (end_times[2] + end_times[3]) - \
+            (start_times[2] + start_times[3])
+        return returncode, stderr, end - start, cpu_time
+
+    def _submit_to_daemon(self, tjp_file_full_path):
+        """Submits the given tjp file to the daemon, writes the csv report and
+        removes the project from the daemon.
+
+        :param str tjp_file_full_path: The path of the tjp file
+        :returns: (int, list) The return code and the stderr lines
+        """
+        project_id = self.studio.tjp_id
+        returncode, stdout, stderr = \
+            self._run_client(['add', tjp_file_full_path])
+        if returncode:
+            return returncode, stderr
+
+        try:
+            returncode, stdout, report_stderr = \
+                self._run_client(['report', project_id, 'breakdown'])
+            stderr.extend(report_stderr)
+            if returncode:
+                return returncode, stderr
+
+            # the daemon may not write the report file itself
+            csv_file_full_path = \
+                os.path.splitext(tjp_file_full_path)[0] + '.csv'
+            if not os.path.exists(csv_file_full_path):
+                with open(csv_file_full_path, 'wb') as f:
+                    f.write(stdout)
+        finally:
+            self._run_client(['remove', project_id])
+
+        return returncode, stderr
+
+    def _run_taskjuggler_in_parallel(self, tjp_file_full_paths):
+        """Submits the given tjp files to the daemon one after another.
+
+        :param tjp_file_full_paths: A list of tjp file paths
+        :returns: A list of the values returned by :meth:`._run_taskjuggler`
+        """
+        return [self._run_taskjuggler(path) for path in tjp_file_full_paths]
+
+
+class _SlotCalendar(object):
+    """Splits the time in to slots of the studio timing resolution starting
+    from the given origin and keeps the working slots in a bytearray.
+
+    :param origin: The datetime.datetime of the first slot
+    :param resolution: The datetime.timedelta of one slot
+    :param working_hours: A :class:`.WorkingHours` instance
+    :param vacations: A list of studio wide :class:`.Vacation` instances
+    """
+
+    def __init__(self, origin, resolution, working_hours, vacations=None):
+        self.origin = origin
+        self.slot_seconds = resolution.days * 86400 + resolution.seconds
+        # the working hours of each week day in seconds after midnight
+        self.working_hours = [
+            [(start * 60, end * 60) for start, end in working_hours[i]]
+            for i in range(7)
+        ]
+        self.vacations = []
+        if vacations:
+            for vacation in vacations:
+                self.vacations.append(
+                    (self.slot_of(vacation.start),
+                     self.slot_of(vacation.end, round_up=True))
+                )
+        self.working = bytearray()
+
+    def __len__(self):
+        return len(self.working)
+
+    def slot_of(self, date, round_up=False):
+        """returns the index of the slot that the given date is in
+
+        :param date: A datetime.datetime instance
+        :param bool round_up: If True the index of the next slot is returned
+          for the dates that are not at the start of a slot
+        """
+        delta = date - self.origin
+        slot, remainder = divmod(
+            delta.days * 86400 + delta.seconds, self.slot_seconds
+        )
+        if round_up and remainder:
+            slot += 1
+        return slot
+
+    def date_of(self, slot):
+        """returns the start date of the given slot
+        """
+        return self.origin + \
+            datetime.timedelta(seconds=slot * self.slot_seconds)
+
+    def extend(self, slot_count):
+        """extends the working slots up to the given slot count
+        """
+        for slot in range(len(self.working), slot_count):
+            date = self.date_of(slot)
+            seconds = date.hour * 3600 + date.minute * 60 + date.second
+            is_working = 0
+            for start, end in self.working_hours[date.weekday()]:
+                if start <= seconds < end:
+                    is_working = 1
+                    break
+            if is_working:
+                for start, end in self.vacations:
+                    if start <= slot < end:
+                        is_working = 0
+                        break
+            self.working.append(is_working)
+
+
+class NativeScheduler(SchedulerBase):
+    """A pure Python scheduler which schedules the tasks in process without
+    using TaskJuggler.
+
+    It is a list scheduler working on time slots of
+    :attr:`.Studio.timing_resolution`. Every resource has a bytearray of busy
+    slots, which are filled with the user vacations and the :class:`.TimeLog`
+    bookings first. Then the leaf tasks are picked one by one as their
+    dependencies are scheduled, in the order of their priority and their
+    critical path length (the longest chain of work following them), and the
+    earliest free working slots of their resources are booked. So it is fast
+    enough to be used for interactive what-if scheduling and it doesn't
+    require TaskJuggler to be installed.
+
+    It supports the following features of the tjp files that Stalker
+    generates:
+
+      * **effort**, **length** and **duration** schedule models,
+      * ``onend`` and ``onstart`` dependencies with **length** and
+        **duration** gaps, including the dependencies of the parent tasks and
+        the dependencies to container tasks,
+      * start, end and both schedule constraints, the tasks constrained with
+        an end date are scheduled backwards (as late as possible),
+      * alternative resources with all the allocation strategies and
+        persistent allocations,
+      * studio working hours and studio and user vacations,
+      * time logs as bookings, which are deducted from the task effort,
+      * scheduling only the :attr:`.projects` with the frozen load of the
+        other active projects.
+
+    It is an approximation of TaskJuggler, the dates are the same for the
+    simple cases but the resources picked among the alternatives and the
+    order of the tasks competing for the same resources can be different. It
+    doesn't do any backtracking and it doesn't check the resource limits. The
+    allocation strategies are interpreted as follows:
+
+      * **minallocated**: the resource with the fewest tasks,
+      * **minloaded**: the resource with the fewest booked slots,
+      * **maxloaded**: the resource with the most booked slots,
+      * **order**: the first free resource,
+      * **random**: a random free resource picked with :attr:`.random_seed`.
+
+    Use it by setting the :attr:`.Studio.scheduler` attribute::
+
+      studio.scheduler = NativeScheduler()
+      studio.schedule()
+
+    The scheduled values are stored in the :attr:`.data` attribute in the
+    same (entity_id, computed_start, computed_end, resource_ids) format that
+    the :class:`.TaskJugglerScheduler` parses from the csv file, and they are
+    applied to the database in the same way.
+
+    .. note::
+       .. versionadded:: 0.2.6
+          NativeScheduler
+
+    :param bool bulk_apply: Applies the results with set based statements.
+      The default is True.
+
+    :param int random_seed: The seed of the **random** allocation strategy.
+      The default is 0.
+
+    :param int max_days: The maximum number of days after the schedule start
+      to look for free slots. A RuntimeError is raised if a task can not be
+      scheduled in that time. The default is 3650.
+
+    :param bool preload: Loads all the tasks of the projects with their
+      relations and all the users with their vacations with a fixed number of
+      queries before scheduling. The default is True.
+    """
+
+    def __init__(self, studio=None, bulk_apply=True, random_seed=0,
+                 max_days=3650, preload=True):
+        super(NativeScheduler, self).__init__(studio)
+        self.bulk_apply = bulk_apply
+        self.preload = preload
+        self.random_seed = random_seed
+        self.max_days = max_days
+
+        self.data = []
+
+        self._calendar = None
+        self._max_slots = 0
+        self._busy = {}
+        self._allocated_slots = {}
+        self._allocated_tasks = {}
+        self._random = None
+
+    def schedule(self):
+        """Does the scheduling and applies the results to the database, or
+        stores them in the :attr:`.result` attribute in dry run mode.
+
+        :returns: An empty list, because there is no external process output
+        """
+        from stalker import Studio
+
+        if not isinstance(self.studio, Studio):
+            raise TypeError(
+                '%s.studio should be an instance of '
+                'stalker.models.studio.Studio, not %s' %
+                (self.__class__.__name__, self.studio.__class__.__name__)
+            )
+
+        self.result = ScheduleResult() if self.dry_run else None
+        scheduled_projects = self.projects
+
+        self.stats = ScheduleStats()
+        self.stats.start()
+        try:
+            if self.projects is not None:
+                self.projects = self._add_depended_projects(self.projects)
+            self._set_phase('solve')
+            start = time.time()
+            self.data = self._compute_schedule()
+            logger.debug(
+                'computing the schedule took : %s seconds' %
+                (time.time() - start)
+            )
+            self._set_phase('apply')
+            self._apply_csv_data(self.data)
+        finally:
+            self.projects = scheduled_projects
+            self._preloaded = []
+            self.stats.stop()
+        return []
+
+    def _compute_schedule(self):
+        """Computes the schedule of the active projects (or the
+        :attr:`.projects`) without changing the database.
+
+        :returns: A list of tuples in (entity_id, computed_start,
+          computed_end, resource_ids) format
+        """
+        import heapq
+        import random
+        from stalker.models import walk_hierarchy
+
+        projects = self.projects if self.projects is not None \
+            else self.studio.active_projects
+        self._preload(projects)
+
+        # the timings in days and weeks are converted to seconds with the
+        # defaults, update them with the studio as TaskJuggler is using the
+        # dailyworkinghours of the studio
+        self.studio.update_defaults()
+
+        schedule_start = self._get_schedule_start()
+        calendar = self._calendar = _SlotCalendar(
+            schedule_start.replace(hour=0, minute=0, second=0, microsecond=0),
+            self.studio.timing_resolution,
+            self.studio.working_hours,
+            self.studio.vacations
+        )
+        self._max_slots = self.max_days * 86400 // calendar.slot_seconds
+        self._busy = {}
+        self._allocated_slots = {}
+        self._allocated_tasks = {}
+        self._random = random.Random(self.random_seed)
+        self._ensure_slot(30 * 86400 // calendar.slot_seconds)
+        earliest_slot = calendar.slot_of(schedule_start, round_up=True)
+
+        # the load of the resources coming from the projects which are not
+        # scheduled in this run
+        for user, intervals in self._get_frozen_load():
+            self._add_user(user)
+            for start, end in intervals:
+                self._mark_busy(
+                    user.id,
+                    max(calendar.slot_of(start), 0),
+                    calendar.slot_of(end, round_up=True)
+                )
+
+        # collect the tasks in the order they appear in the tjp file
+        project_root_tasks = []
+        tasks = []
+        for project in projects:
+            root_tasks = project.root_tasks
+            project_root_tasks.append((project, root_tasks))
+            for root_task in root_tasks:
+                tasks.extend(walk_hierarchy(root_task, 'children'))
+
+        # the leaf task ids of every task, children are after their parents
+        leaf_ids = {}
+        for task in reversed(tasks):
+            if task.is_leaf:
+                leaf_ids[task.id] = [task.id]
+            else:
+                leaf_ids[task.id] = []
+                for child in task.children:
+                    leaf_ids[task.id].extend(leaf_ids[child.id])
+
+        infos = {}
+        for index, task in enumerate(tasks):
+            if not task.is_leaf:
+                continue
+            infos[task.id] = self._create_task_info(task, index, leaf_ids)
+
+        # find the successors and a topological order of the leaf tasks
+        successors = dict([(task_id, set()) for task_id in infos])
+        in_degree = {}
+        for task_id, info in infos.items():
+            predecessors = set()
+            for depends_to_id, target, gap, gap_model in info['depends']:
+                predecessors.update(leaf_ids[depends_to_id])
+            in_degree[task_id] = len(predecessors)
+            for predecessor_id in predecessors:
+                successors[predecessor_id].add(task_id)
+
+        degrees = dict(in_degree)
+        topological_order = [task_id for task_id in infos
+                             if not degrees[task_id]]
+        for task_id in topological_order:
+            for successor_id in successors[task_id]:
+                degrees[successor_id] -= 1
+                if not degrees[successor_id]:
+                    topological_order.append(successor_id)
+
+        if len(topological_order) != len(infos):
+            raise RuntimeError(
+                'there is a circular dependency between the tasks'
+            )
+
+        # the critical path length of every task
+        path_lengths = {}
+        for task_id in reversed(topological_order):
+            info = infos[task_id]
+            length = max(info['remaining'], 0) if info['groups'] else 0
+            if info['model'] == 'effort' and info['groups']:
+                length = float(length) / len(info['groups'])
+            path_lengths[task_id] = length + max(
+                [path_lengths[s] for s in successors[task_id]] or [0]
+            )
+
+        def priority_key(task_id):
+            info = infos[task_id]
+            return (-info['priority'], -path_lengths[task_id],
+                    info['index'], task_id)
+
+        # schedule the ready tasks in the order of their priority
+        results = {}
+        ready = [priority_key(task_id) for task_id in infos
+                 if not in_degree[task_id]]
+        heapq.heapify(ready)
+        while ready:
+            task_id = heapq.heappop(ready)[-1]
+            info = infos[task_id]
+
+            start_slot = earliest_slot
+            for depends_to_id, target, gap, gap_model in info['depends']:
+                spans = [results[i] for i in leaf_ids[depends_to_id]]
+                if target == 'onstart':
+                    slot = min([span[0] for span in spans])
+                else:
+                    slot = max([span[1] for span in spans])
+                if gap:
+                    slot = self._gap_slot(slot, gap, gap_model)
+                start_slot = max(start_slot, slot)
+
+            if info['remaining'] <= 0 and info['bookings']:
+                # completely booked
+                start_slot, end_slot, user_ids = info['bookings']
+            else:
+                start_slot, end_slot, user_ids = \
+                    self._schedule_task(info, start_slot)
+                for user_id in user_ids:
+                    self._allocated_tasks[user_id] += 1
+                if info['bookings']:
+                    booked_start, booked_end, booked_user_ids = \
+                        info['bookings']
+                    start_slot = min(start_slot, booked_start)
+                    end_slot = max(end_slot, booked_end)
+                    user_ids = user_ids | booked_user_ids
+            results[task_id] = (start_slot, end_slot, user_ids)
+
+            for successor_id in successors[task_id]:
+                in_degree[successor_id] -= 1
+                if not in_degree[successor_id]:
+                    heapq.heappush(ready, priority_key(successor_id))
+
+        # containers span their children
+        for task in reversed(tasks):
+            if task.id in results:
+                continue
+            spans = [results[child.id] for child in task.children]
+            user_ids = set()
+            for span in spans:
+                user_ids.update(span[2])
+            results[task.id] = (min([span[0] for span in spans]),
+                                max([span[1] for span in spans]),
+                                user_ids)
+
+        data = []
+        for project, root_tasks in project_root_tasks:
+            if not root_tasks:
+                continue
+            spans = [results[task.id] for task in root_tasks]
+            data.append((
+                project.id,
+                calendar.date_of(min([span[0] for span in spans])),
+                calendar.date_of(max([span[1] for span in spans])),
+                []
+            ))
+        for task in tasks:
+            start_slot, end_slot, user_ids = results[task.id]
+            data.append((
+                task.id,
+                calendar.date_of(start_slot),
+                calendar.date_of(end_slot),
+                sorted(user_ids)
+            ))
+        return data
+
+    def _create_task_info(self, task, index, leaf_ids):
+        """Creates the dictionary holding the scheduling data of the given
+        leaf task, adds its resources and marks its time logs as busy.
+
+        :param task: A leaf :class:`.Task` instance
+        :param int index: The index of the task in the tjp file order
+        :param dict leaf_ids: The leaf task ids of all the scheduled tasks
+        """
+        calendar = self._calendar
+
+        groups = []
+        if task.resources:
+            alternative_ids = []
+            for user in task.alternative_resources:
+                self._add_user(user)
+                alternative_ids.append(user.id)
+            for user in task.resources:
+                self._add_user(user)
+                groups.append(
+                    [user.id] +
+                    [i for i in alternative_ids if i != user.id]
+                )
+
+        # the dependencies of the task and its parents
+        depends = []
+        current = task
+        while current is not None:
+            for task_dependency in current.task_depends_to:
+                depends_to_id = task_dependency.depends_to_id
+                if depends_to_id not in leaf_ids:
+                    # not scheduled
+                    continue
+                gap = 0
+                if task_dependency.gap_timing:
+                    gap = task_dependency.to_seconds(
+                        task_dependency.gap_timing,
+                        task_dependency.gap_unit,
+                        task_dependency.gap_model
+                    )
+                depends.append((depends_to_id,
+                                task_dependency.dependency_target,
+                                gap, task_dependency.gap_model))
+            current = current.parent
+
+        # the time logs are bookings
+        bookings = None
+        booked_seconds = 0
+        for time_log in task.time_logs:
+            self._add_user(time_log.resource)
+            start_slot = max(calendar.slot_of(time_log.start), 0)
+            end_slot = calendar.slot_of(time_log.end, round_up=True)
+            self._mark_busy(time_log.resource.id, start_slot, end_slot)
+            duration = time_log.end - time_log.start
+            booked_seconds += duration.days * 86400 + duration.seconds
+            if bookings is None:
+                bookings = (start_slot, end_slot, set())
+            bookings = (min(bookings[0], start_slot),
+                        max(bookings[1], end_slot),
+                        bookings[2] | set([time_log.resource.id]))
+
+        need = task.to_seconds(
+            task.schedule_timing, task.schedule_unit, task.schedule_model
+        ) or 0
+
+        return {
+            'task': task,
+            'index': index,
+            'priority': task.priority,
+            'model': task.schedule_model,
+            'constraint': task.schedule_constraint,
+            'strategy': task.allocation_strategy,
+            'persistent': task.persistent_allocation,
+            'groups': groups,
+            'depends': depends,
+            'bookings': bookings,
+            'remaining': need - booked_seconds
+        }
+
+    def _ensure_slot(self, slot):
+        """extends the calendar and the busy slots of the resources to have
+        the given slot
+        """
+        if slot < len(self._calendar):
+            return
+        if slot >= self._max_slots:
+            raise RuntimeError(
+                'can not find free slots in %s days after %s' %
+                (self.max_days, self._calendar.origin)
+            )
+        slot_count = min(max(slot + 1, len(self._calendar) * 2),
+                         self._max_slots)
+        self._calendar.extend(slot_count)
+        for busy in self._busy.values():
+            busy.extend(bytearray(slot_count - len(busy)))
+
+    def _add_user(self, user):
+        """adds the given user to the resources and marks the vacations of
+        the user as busy
+        """
+        if user.id in self._busy:
+            return
+        self._busy[user.id] = bytearray(len(self._calendar))
+        self._allocated_slots[user.id] = 0
+        self._allocated_tasks[user.id] = 0
+        for vacation in user.vacations:
+            self._mark_busy(
+                user.id,
+                max(self._calendar.slot_of(vacation.start), 0),
+                self._calendar.slot_of(vacation.end, round_up=True)
+            )
+
+    def _mark_busy(self, user_id, start_slot, end_slot):
+        """marks the slots of the given user between the given slots as busy
+        """
+        end_slot = min(end_slot, self._max_slots)
+        if end_slot <= start_slot:
+            return
+        self._ensure_slot(end_slot - 1)
+        busy = self._busy[user_id]
+        busy[start_slot:end_slot] = b'\x01' * (end_slot - start_slot)
+
+    def _is_free(self, user_id, slot):
+        """returns True if the given user is free to work in the given slot
+        """
+        return self._calendar.working[slot] and not self._busy[user_id][slot]
+
+    def _select_resource(self, candidates, strategy):
+        """selects one of the given free resources by using the given
+        allocation strategy
+        """
+        if strategy == 'order' or len(candidates) == 1:
+            return candidates[0]
+        elif strategy == 'random':
+            return self._random.choice(candidates)
+        elif strategy == 'maxloaded':
+            return min(candidates,
+                       key=lambda x: -self._allocated_slots[x])
+        elif strategy == 'minloaded':
+            return min(candidates, key=lambda x: self._allocated_slots[x])
+        # minallocated
+        return min(
+            candidates,
+            key=lambda x: (self._allocated_tasks[x], self._allocated_slots[x])
+        )
+
+    def _allocate_slot(self, task_info, slot, chosen, booked):
+        """allocates the resources of the given task for the given slot and
+        appends the (user_id, slot) pairs to the given booked list
+
+        :returns int: The number of the allocated resources
+        """
+        count = 0
+        persistent = task_info['persistent']
+        for i, group in enumerate(task_info['groups']):
+            if persistent and chosen[i] is not None:
+                candidates = [chosen[i]] \
+                    if self._is_free(chosen[i], slot) else []
+            else:
+                candidates = [user_id for user_id in group
+                              if self._is_free(user_id, slot)]
+            if not candidates:
+                continue
+            user_id = self._select_resource(
+                candidates, task_info['strategy']
+            )
+            self._busy[user_id][slot] = 1
+            self._allocated_slots[user_id] += 1
+            chosen[i] = user_id
+            booked.append((user_id, slot))
+            count += 1
+        return count
+
+    def _iter_slots(self, start_slot):
+        """yields the slots starting from the given slot up to the maximum
+        slot count
+        """
+        slot = start_slot
+        while slot < self._max_slots:
+            yield slot
+            slot += 1
+
+    def _book(self, task_info, slots, need, model):
+        """Books the resources of the given task in the given slots until the
+        needed seconds are reached.
+
+        :param task_info: The dictionary holding the task data
+        :param slots: An iterable of slot indices in the booking direction
+        :param int need: The needed seconds
+        :param str model: The schedule model, one of "effort", "length" and
+          "duration"
+        :returns: (int, int, set) The first slot, the slot after the last one
+          and the ids of the booked resources or None if the task doesn't fit
+          in to the given slots, in that case the booked slots are released
+        """
+        slot_seconds = self._calendar.slot_seconds
+        working = self._calendar.working
+        chosen = [None] * len(task_info['groups'])
+        booked = []
+        first_slot = last_slot = None
+        done = 0
+        for slot in slots:
+            if done >= need:
+                break
+            self._ensure_slot(slot)
+            if model == 'effort':
+                count = self._allocate_slot(task_info, slot, chosen, booked)
+                if not count:
+                    continue
+                done += count * slot_seconds
+            elif model == 'length':
+                if not working[slot]:
+                    continue
+                self._allocate_slot(task_info, slot, chosen, booked)
+                done += slot_seconds
+            else:
+                self._allocate_slot(task_info, slot, chosen, booked)
+                done += slot_seconds
+
+            if first_slot is None or slot < first_slot:
+                first_slot = slot
+            if last_slot is None or slot > last_slot:
+                last_slot = slot
+
+        if done < need:
+            for user_id, slot in booked:
+                self._busy[user_id][slot] = 0
+                self._allocated_slots[user_id] -= 1
+            return None
+        return first_slot, last_slot + 1, \
+            set([user_id for user_id, slot in booked])
+
+    def _gap_slot(self, slot, gap_seconds, gap_model):
+        """returns the slot after the given gap starting from the given slot
+        """
+        slot_seconds = self._calendar.slot_seconds
+        gap_slots = -(-int(gap_seconds) // slot_seconds)
+        if gap_model == 'duration':
+            return slot + gap_slots
+        while gap_slots > 0:
+            self._ensure_slot(slot)
+            if self._calendar.working[slot]:
+                gap_slots -= 1
+            slot += 1
+        return slot
+
+    def _schedule_task(self, task_info, earliest_slot):
+        """Schedules the given leaf task not before the given slot.
+
+        :returns: (int, int, set) The first slot, the slot after the last one
+          and the ids of the booked resources
+        """
+        from stalker.models.task import (CONSTRAIN_START, CONSTRAIN_END,
+                                         CONSTRAIN_BOTH)
+        calendar = self._calendar
+        task = task_info['task']
+        constraint = task_info['constraint']
+        need = task_info['remaining']
+        model = task_info['model']
+
+        if constraint in (CONSTRAIN_START, CONSTRAIN_BOTH):
+            earliest_slot = max(earliest_slot, calendar.slot_of(task.start))
+
+        if not task_info['groups']:
+            # no resources, it is a milestone
+            return earliest_slot, earliest_slot, set()
+
+        if constraint == CONSTRAIN_BOTH:
+            end_slot = max(calendar.slot_of(task.end, round_up=True),
+                           earliest_slot)
+            result = self._book(
+                task_info, range(earliest_slot, end_slot),
+                (end_slot - earliest_slot) * calendar.slot_seconds,
+                'duration'
+            )
+            return result or (earliest_slot, end_slot, set())
+
+        if need <= 0:
+            return earliest_slot, earliest_slot, set()
+
+        if model == 'duration':
+            # book continuous calendar time
+            need = -(-int(need) // calendar.slot_seconds) * \
+                calendar.slot_seconds
+
+        if constraint == CONSTRAIN_END:
+            # as late as possible
+            end_slot = calendar.slot_of(task.end, round_up=True)
+            if end_slot > earliest_slot:
+                self._ensure_slot(end_slot - 1)
+                result = self._book(
+                    task_info, range(end_slot - 1, earliest_slot - 1, -1),
+                    need, model
+                )
+                if result is not None:
+                    return result
+            logger.warning(
+                '%s does not fit before its end date %s, scheduling it as '
+                'soon as possible' % (task.name, task.end)
+            )
+
+        result = self._book(
+            task_info, self._iter_slots(earliest_slot), need, model
+        )
+        if result is None:
+            raise RuntimeError(
+                'Task %s can not be scheduled in %s days after %s' %
+                (task.name, self.max_days, calendar.origin)
+            )
+        return result
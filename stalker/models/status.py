@@ -19,9 +19,14 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 
 
-from sqlalchemy import Table, Column, Integer, ForeignKey
-from sqlalchemy.orm import relationship, validates
+import contextlib
+import heapq
+import weakref
 
+from sqlalchemy import Table, Column, Integer, ForeignKey, event
+from sqlalchemy.orm import relationship, validates, object_session, Session
+
+from stalker import defaults
 from stalker.db.session import DBSession
 from stalker.db.declarative import Base
 from stalker.models.entity import Entity
@@ -238,6 +243,327 @@ class StatusList(Entity, TargetEntityTypeMixin):
         return len(self.statuses)
 
 
+class StatusRegistry(object):
+    """Resolves Status codes to Status instances once per transaction.
+
+    The workflow methods of :class:`.Task`, :class:`.TimeLog` and
+    :class:`.Review` need a couple of Status instances each time they are
+    called. Instead of querying them one by one, a StatusRegistry loads all
+    the Statuses of a session with one query and keeps them until the end of
+    the current transaction::
+
+      >>> from stalker.models.status import StatusRegistry
+      >>> statuses = StatusRegistry.get_registry()
+      >>> WIP = statuses.get('WIP')
+
+    There is one registry for each session, :meth:`.get_registry` returns the
+    registry of the current :class:`.DBSession` by default. A registry is
+    invalidated when the transaction ends, when a Status is added to the
+    session, when the code of a Status is changed or when a Status row is
+    inserted, updated or deleted.
+
+    The pending Status instances of the session are also resolved, without
+    flushing the session.
+
+    :param session: The session of this registry.
+    """
+
+    _registries = weakref.WeakKeyDictionary()
+
+    def __init__(self, session):
+        self.session = session
+        self._statuses = None
+
+    @classmethod
+    def get_registry(cls, session=None):
+        """returns the registry of the given session
+
+        :param session: A session instance. The default is None which uses the
+          current :class:`.DBSession`.
+        """
+        if session is None:
+            session = DBSession()
+
+        registry = cls._registries.get(session)
+        if registry is None:
+            registry = cls(session)
+            cls._registries[session] = registry
+        return registry
+
+    @classmethod
+    def invalidate_session(cls, session):
+        """invalidates the registry of the given session if there is any
+
+        :param session: A session instance.
+        """
+        registry = cls._registries.get(session)
+        if registry is not None:
+            registry.invalidate()
+
+    def invalidate(self):
+        """clears the loaded Statuses, they are loaded again in the next call
+        to :meth:`.get`
+        """
+        self._statuses = None
+
+    def get(self, code):
+        """returns the Status with the given code or None if there is no such
+        Status
+
+        :param str code: The code of the Status.
+        """
+        if self._statuses is None:
+            self._load()
+        return self._statuses.get(code)
+
+    def _load(self):
+        """loads all the Statuses of the session
+        """
+        with self.session.no_autoflush:
+            statuses = self.session.query(Status).order_by(Status.id).all()
+        statuses.extend(
+            [instance for instance in self.session.new
+             if isinstance(instance, Status)]
+        )
+
+        self._statuses = {}
+        for status in statuses:
+            self._statuses.setdefault(status.code, status)
+
+
+class StatusPropagator(object):
+    """Propagates the Task statuses to the parent and to the dependent tasks.
+
+    Every status change of a Task updates the statuses of its parents up to
+    the root task and the statuses of its dependent tasks. By default this is
+    done immediately, so changing the statuses of 500 sibling tasks updates
+    the same parents 500 times.
+
+    In "deferred" mode the status changes are only collected and the
+    statuses are updated when the session is flushed (or committed, or when
+    :meth:`.propagate` is called). First the dependent tasks are updated in
+    the order of their dependencies and then the container tasks from the
+    deepest one to the root, each only once. The status rules are the same
+    with the "immediate" mode, but the statuses of the parents and the
+    dependent tasks are not updated until the session is flushed::
+
+      >>> from stalker.models.status import StatusPropagator
+      >>> propagator = StatusPropagator.get_propagator()
+      >>> propagator.mode = 'deferred'
+      >>> for task in tasks:
+      ...     task.resume()
+      >>> DBSession.flush()  # the parents are updated here
+
+    The autoflush of the session also propagates the collected statuses, so
+    wrap the bulk status changes with ``DBSession.no_autoflush`` to propagate
+    them at once, or use :meth:`.deferred` which does both::
+
+      >>> with propagator.deferred():
+      ...     for task in tasks:
+      ...         task.resume()
+
+    There is one propagator for each session, :meth:`.get_propagator` returns
+    the propagator of the current :class:`.DBSession` by default. The
+    collected tasks are discarded when the transaction ends.
+
+    :param session: The session of this propagator.
+    """
+
+    modes = ['immediate', 'deferred']
+
+    _propagators = weakref.WeakKeyDictionary()
+
+    def __init__(self, session):
+        self.session = session
+        self._mode = None
+        self._dependents = []
+        self._containers = []
+        self._callbacks = []
+        self._task_ids = set()
+
+    @classmethod
+    def get_propagator(cls, session=None):
+        """returns the propagator of the given session
+
+        :param session: A session instance. The default is None which uses the
+          current :class:`.DBSession`.
+        """
+        if session is None:
+            session = DBSession()
+
+        propagator = cls._propagators.get(session)
+        if propagator is None:
+            propagator = cls(session)
+            cls._propagators[session] = propagator
+        return propagator
+
+    def _mode_getter(self):
+        """returns the mode of this propagator
+        """
+        return self._mode or defaults.status_propagation
+
+    def _mode_setter(self, mode):
+        """sets the mode of this propagator
+        """
+        if mode is not None and mode not in self.modes:
+            raise ValueError(
+                '%s.mode should be one of %s, not %r' %
+                (self.__class__.__name__, self.modes, mode)
+            )
+        self._mode = mode
+
+    mode = property(
+        _mode_getter,
+        _mode_setter,
+        doc="""The propagation mode, "immediate" or "deferred". The default
+        is None which uses the status_propagation setting."""
+    )
+
+    @property
+    def is_deferred(self):
+        """returns True if the propagation is deferred
+        """
+        return self.mode == 'deferred'
+
+    @property
+    def has_pending(self):
+        """returns True if there are collected tasks waiting to be propagated
+        """
+        return bool(self._dependents or self._containers or self._callbacks)
+
+    def add_dependent(self, task):
+        """collects the given task to update its status with the statuses of
+        the tasks that it depends to
+
+        :param task: A :class:`.Task` instance.
+        """
+        if (id(task), 'dependent') not in self._task_ids:
+            self._task_ids.add((id(task), 'dependent'))
+            self._dependents.append(task)
+
+    def add_container(self, task):
+        """collects the given container task to update its status with the
+        statuses of its children
+
+        :param task: A :class:`.Task` instance.
+        """
+        if (id(task), 'container') not in self._task_ids:
+            self._task_ids.add((id(task), 'container'))
+            self._containers.append(task)
+
+    def when_propagated(self, callback, *args):
+        """calls the given callback with the given arguments after the
+        collected statuses are propagated, in "immediate" mode it is called
+        right away
+
+        :param callback: A callable.
+        """
+        if self.is_deferred:
+            self._callbacks.append((callback, args))
+        else:
+            callback(*args)
+
+    @contextlib.contextmanager
+    def deferred(self):
+        """a context manager which defers the propagation in its block and
+        then propagates the collected statuses at once, the autoflush of the
+        session is disabled in the block and the previous mode is restored at
+        the end
+        """
+        mode = self._mode
+        self.mode = 'deferred'
+        try:
+            with self.session.no_autoflush:
+                yield self
+            self.propagate()
+        finally:
+            self._mode = mode
+
+    def clear(self):
+        """discards the collected tasks
+        """
+        self._dependents = []
+        self._containers = []
+        self._callbacks = []
+        self._task_ids = set()
+
+    def propagate(self):
+        """updates the statuses of the collected tasks
+        """
+        while self.has_pending:
+            dependents = self._dependents
+            containers = self._containers
+            callbacks = self._callbacks
+            self.clear()
+
+            with self.session.no_autoflush:
+                for task in self._sort_by_dependencies(dependents):
+                    task._update_status_with_dependent_statuses(use_sql=False)
+                    if task.parent is not None:
+                        containers.append(task.parent)
+
+                self._update_containers(containers)
+
+            for callback, args in callbacks:
+                callback(*args)
+
+    @classmethod
+    def _sort_by_dependencies(cls, tasks):
+        """sorts the given tasks so the tasks are placed after the tasks that
+        they depend to
+
+        :param tasks: A list of :class:`.Task` instances.
+        """
+        task_ids = set(map(id, tasks))
+        visited = set()
+        sorted_tasks = []
+        for task in tasks:
+            if id(task) in visited:
+                continue
+            visited.add(id(task))
+            stack = [(task, iter(task.depends))]
+            while stack:
+                current, depends = stack[-1]
+                for dep in depends:
+                    if id(dep) in task_ids and id(dep) not in visited:
+                        visited.add(id(dep))
+                        stack.append((dep, iter(dep.depends)))
+                        break
+                else:
+                    stack.pop()
+                    sorted_tasks.append(current)
+        return sorted_tasks
+
+    @classmethod
+    def _update_containers(cls, containers):
+        """updates the statuses of the given container tasks and their parents
+        from the deepest one to the root, each only once
+
+        :param containers: A list of :class:`.Task` instances.
+        """
+        heap = []
+        queued = set()
+
+        def push(task):
+            queued.add(id(task))
+            depth = 0
+            parent = task.parent
+            while parent is not None:
+                depth += 1
+                parent = parent.parent
+            heapq.heappush(heap, (-depth, len(queued), task))
+
+        for task in containers:
+            if id(task) not in queued:
+                push(task)
+
+        while heap:
+            task = heapq.heappop(heap)[2]
+            task._update_status_with_children_statuses(use_sql=False)
+            if task.parent is not None and id(task.parent) not in queued:
+                push(task.parent)
+
+
 # Statuslist_Statuses Table
 StatusList_Statuses = Table(
     "StatusList_Statuses", Base.metadata,
@@ -255,3 +581,77 @@ StatusList_Statuses = Table(
     )
 )
 
+
+
+# *****************************************************************************
+# Invalidate the StatusRegistries
+# *****************************************************************************
+@event.listens_for(Session, 'after_transaction_end')
+def invalidate_status_registry_on_transaction_end(session, transaction):
+    """invalidates the StatusRegistry of the session when a transaction or a
+    savepoint ends, the subtransactions of the flushes are skipped, also
+    discards the tasks collected by the StatusPropagator of the session when
+    the transaction ends
+    """
+    if transaction.parent is None or transaction.nested:
+        StatusRegistry.invalidate_session(session)
+
+    if transaction.parent is None:
+        propagator = StatusPropagator._propagators.get(session)
+        if propagator is not None:
+            propagator.clear()
+
+
+@event.listens_for(Session, 'after_attach')
+def invalidate_status_registry_on_attach(session, instance):
+    """invalidates the StatusRegistry of the session when a Status is added
+    """
+    if isinstance(instance, Status):
+        StatusRegistry.invalidate_session(session)
+
+
+@event.listens_for(Status.code, 'set')
+def invalidate_status_registry_on_code_change(status, new_code, old_code,
+                                              initiator):
+    """invalidates the StatusRegistry of the session of the Status when the
+    code of the Status is changed
+    """
+    session = object_session(status)
+    if session is not None:
+        StatusRegistry.invalidate_session(session)
+
+
+@event.listens_for(Status, 'after_insert')
+@event.listens_for(Status, 'after_update')
+@event.listens_for(Status, 'after_delete')
+def invalidate_status_registry_on_flush(mapper, connection, status):
+    """invalidates the StatusRegistry of the session of the Status when the
+    Status row changes
+    """
+    session = object_session(status)
+    if session is not None:
+        StatusRegistry.invalidate_session(session)
+
+
+# *****************************************************************************
+# Propagate the deferred Task statuses
+# *****************************************************************************
+@event.listens_for(Session, 'before_flush')
+def propagate_statuses_before_flush(session, flush_context, instances):
+    """propagates the Task statuses collected by the StatusPropagator of the
+    session before the session is flushed
+    """
+    propagator = StatusPropagator._propagators.get(session)
+    if propagator is not None and propagator.has_pending:
+        propagator.propagate()
+
+
+@event.listens_for(Session, 'before_commit')
+def propagate_statuses_before_commit(session):
+    """propagates the Task statuses collected by the StatusPropagator of the
+    session before the session is committed, so the statuses are propagated
+    even if there is nothing to flush
+    """
+    propagator = StatusPropagator._propagators.get(session)
+    if propagator is not None and propagator.has_pending:
+        propagator.propagate()
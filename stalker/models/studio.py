@@ -25,7 +25,7 @@ import datetime
 from math import ceil
 
 from sqlalchemy import (Column, Integer, ForeignKey, Interval, Boolean,
-                        DateTime, PickleType)
+                        DateTime, PickleType, func)
 from sqlalchemy.orm import validates, relationship, synonym, reconstructor
 
 from stalker import defaults, log
@@ -85,6 +85,19 @@ class Studio(Entity, DateRangeMixin, WorkingHoursMixin):
       :attr:`.last_scheduled_at`
       :attr:`.last_scheduled_by`
       :attr:`.last_schedule_message`
+      :attr:`.schedule_stats`
+      :attr:`.schedule_requests`
+      :attr:`.schedule_requests_served`
+
+    .. versionadded: 0.2.6
+       Schedule Request Queue
+
+    When several users request a scheduling at the same time, use
+    :meth:`.request_schedule` instead of :meth:`.schedule`. The requests are
+    queued in the Studio row of the database, which is locked while the queue
+    is checked, and the requests arriving during a scheduling run are
+    coalesced in to exactly one follow-up run. Every caller gets the result of
+    the run that covered its request.
 
     :param int daily_working_hours: An integer specifying the daily working
       hours for the studio. It is another critical value attribute which
@@ -157,6 +170,24 @@ class Studio(Entity, DateRangeMixin, WorkingHoursMixin):
         doc='Holds the last schedule message, generally coming generated by '
         'TaskJuggler'
     )
+    schedule_stats = Column(
+        PickleType,
+        doc='Holds the timings and counters of the last scheduling runs as a '
+            'list of dictionaries, the oldest is the first one. The number of '
+            'runs stored is controlled with the schedule_stats_count setting'
+    )
+    schedule_requests = Column(
+        Integer,
+        default=0,
+        doc='The serial number of the last schedule request placed with the '
+            'request_schedule() method'
+    )
+    schedule_requests_served = Column(
+        Integer,
+        default=0,
+        doc='The serial number of the last schedule request which is covered '
+            'by a finished scheduling run'
+    )
 
     def __init__(self,
                  daily_working_hours=None,
@@ -334,10 +365,10 @@ class Studio(Entity, DateRangeMixin, WorkingHoursMixin):
     def to_tjp(self):
         """converts the studio to a tjp representation
         """
-        from jinja2 import Template
+        from stalker.models import get_template
 
-        temp = Template(
-            defaults.tjp_studio_template,
+        temp = get_template(
+            'tjp_studio_template',
             trim_blocks=True,
             lstrip_blocks=True
         )
@@ -392,12 +423,27 @@ class Studio(Entity, DateRangeMixin, WorkingHoursMixin):
         """
         return Vacation.query.filter(Vacation.user==None).all()
 
-    def schedule(self, scheduled_by=None):
+    def schedule(self, scheduled_by=None, dry_run=False, projects=None):
         """Schedules all the active projects in the studio. Needs a Scheduler,
         so before calling it set a scheduler by using the :attr:`.scheduler`
         attribute.
 
         :param scheduled_by: A User instance who is doing the scheduling.
+
+        :param bool dry_run: If True the scheduling results are not written
+          to the database, the session is not flushed or committed and the
+          Studio is not marked as scheduling. The results are returned as a
+          :class:`.ScheduleResult` instance which can be compared with the
+          current values with its ``diff()`` method and can be written later
+          with its ``apply()`` method. The default is False.
+
+        :param projects: A list of :class:`.Project` instances to schedule.
+          Only the given projects are scheduled and the load of the resources
+          coming from the other active projects is frozen, it is taken from
+          their stored ``computed_start``, ``computed_end`` and
+          ``computed_resources`` values. The active projects that the tasks
+          of the given projects are depending on are also scheduled. The
+          default is None which schedules all the active projects.
         """
         # check the scheduler first
         if self.scheduler is None or \
@@ -411,36 +457,157 @@ class Studio(Entity, DateRangeMixin, WorkingHoursMixin):
                 }
             )
 
-        # check if the studio is already scheduling
+        self._validate_scheduled_projects(projects)
+
+        if dry_run:
+            return self._dry_run_schedule(projects)
+
+        # check if the studio is already scheduling, the Studio row is locked
+        # so the check and set of is_scheduling is atomic between processes
+        self._lock_schedule_state()
         if self.is_scheduling:
+            user = self.is_scheduling_by
+            # release the lock
+            DBSession.commit()
             raise RuntimeError(
                 'The Studio is being scheduling right now by %(user)s, please '
                 'wait until the current scheduling is done!' % {
-                    'user': self.is_scheduling_by.name
+                    'user': user.name if user else 'another user'
+                }
+            )
+
+        return self._run_schedule(scheduled_by, projects)
+
+    def request_schedule(self, scheduled_by=None, timeout=None):
+        """Places a schedule request for all the active projects in the studio
+        and waits until a scheduling run covers it. Needs a Scheduler, see
+        :meth:`.schedule`.
+
+        If the Studio is not scheduling the caller runs the scheduling, if it
+        is scheduling the request waits in the queue. All the requests
+        arriving during a run are covered by exactly one follow-up run which
+        is started by one of the waiting callers, the others get the result of
+        that run.
+
+        :param scheduled_by: A User instance who is doing the scheduling.
+
+        :param float timeout: The maximum time in seconds to wait for the
+          request to be covered by a run. A RuntimeError is raised if it
+          expires. The default is None which waits forever.
+
+        :returns: The result of the scheduling run which covered the request.
+        """
+        if self.scheduler is None or \
+                not isinstance(self.scheduler, SchedulerBase):
+            raise RuntimeError(
+                'There is no scheduler for this %(class)s, please assign a '
+                'scheduler to the %(class)s.scheduler attribute, before '
+                'calling %(class)s.request_schedule()' %
+                {
+                    'class': self.__class__.__name__
                 }
             )
-        else:
-            # set to self.is_scheduling
-            self.is_scheduling = True
-            self.is_scheudling_by = scheduled_by
+
+        # place the request
+        studios = Studio.__table__
+        self._lock_schedule_state(
+            schedule_requests=func.coalesce(studios.c.schedule_requests, 0) + 1
+        )
+        request = self.schedule_requests
+        DBSession.commit()
+        logger.debug('placed schedule request: %s' % request)
+
+        start = time.time()
+        while True:
+            self._lock_schedule_state()
+            if (self.schedule_requests_served or 0) >= request:
+                # a finished run has covered this request
+                result = self.last_schedule_message
+                DBSession.commit()
+                logger.debug('schedule request %s is served' % request)
+                return result
+
+            if not self.is_scheduling:
+                # run the scheduling for all the queued requests
+                return self._run_schedule(scheduled_by)
+
+            # release the lock and wait for the current run
+            DBSession.commit()
+            if timeout is not None and time.time() - start > timeout:
+                raise RuntimeError(
+                    'The schedule request %s is not served in %s seconds' %
+                    (request, timeout)
+                )
+            time.sleep(defaults.schedule_request_poll_interval)
+
+    def _lock_schedule_state(self, **values):
+        """Locks the row of this Studio until the end of the current
+        transaction and refreshes the scheduling attributes from the database.
+
+        The row is locked by updating it, which locks the row in every
+        database and the whole database in SQLite.
+
+        :param values: The column values to update while locking the row, if
+          skipped the row is updated with its own values.
+        """
+        DBSession.add(self)
+        DBSession.flush()
+
+        studios = Studio.__table__
+        if not values:
+            values = {'schedule_requests': studios.c.schedule_requests}
+        DBSession.execute(
+            studios.update().where(studios.c.id == self.id).values(**values)
+        )
+        DBSession.refresh(
+            self,
+            attribute_names=['is_scheduling', 'schedule_requests',
+                             'schedule_requests_served',
+                             'last_schedule_message']
+        )
+
+    def _run_schedule(self, scheduled_by=None, projects=None):
+        """Runs the scheduler. Should be called while the Studio row is locked
+        with :meth:`._lock_schedule_state` and the Studio is not scheduling.
+        The queued schedule requests are marked as served when the run is
+        finished.
+
+        :param scheduled_by: A User instance who is doing the scheduling.
+
+        :param projects: The projects to schedule, None means all the active
+          projects.
+        """
+        # set to self.is_scheduling
+        self.is_scheduling = True
+        self.is_scheudling_by = scheduled_by
 
         self.scheduling_started_at = datetime.datetime.now()
 
+        # this run covers all the requests placed until now
+        covered_requests = self.schedule_requests or 0
+
         # run the scheduler
         self.scheduler.studio = self
+        self.scheduler.projects = projects
         start = time.time()
 
         # commit before scheduling
         DBSession.commit()
 
         result = None
+        self.scheduler.stats = None
         try:
             result = self.scheduler.schedule()
         finally:
+            self.scheduler.projects = None
+
             # in any case set is_scheduling to False
             self.is_scheduling = False
             self.is_scheduling_by = None
 
+            # and mark the covered requests as served
+            self.schedule_requests_served = covered_requests
+
             # also store the result
             # if result:
             self.last_schedule_message = result
@@ -453,12 +620,103 @@ class Studio(Entity, DateRangeMixin, WorkingHoursMixin):
             if scheduled_by:
                 self.last_scheduled_by = scheduled_by
 
+            commit_start = time.time()
             DBSession.commit()
+            commit_end = time.time()
+
+            # store the stats of this run
+            stats = self.scheduler.stats
+            if stats is not None:
+                stats.commit_seconds = commit_end - commit_start
+                schedule_stats = list(self.schedule_stats or [])
+                schedule_stats.append(stats.to_dict())
+                self.schedule_stats = \
+                    schedule_stats[-defaults.schedule_stats_count:]
+                DBSession.commit()
 
         end = time.time()
         logger.debug('scheduling took %s seconds' % (end - start))
         return result
 
+    def _validate_scheduled_projects(self, projects):
+        """validates the projects argument of the :meth:`.schedule` and
+        :meth:`.schedule_async` methods
+        """
+        if projects is not None:
+            from stalker import Project
+            if not isinstance(projects, list) or \
+                    not all(isinstance(p, Project) for p in projects):
+                raise TypeError(
+                    '%s.schedule() projects argument should be a list of '
+                    'stalker.models.project.Project instances, not %s' %
+                    (self.__class__.__name__, projects.__class__.__name__)
+                )
+
+    def schedule_async(self, scheduled_by=None, projects=None):
+        """Schedules the active projects in the studio in a background thread
+        and returns immediately with a :class:`.ScheduleJob` instance which
+        can be used to follow the progress of the scheduling, to wait it to
+        finish or to cancel it. The session is committed before starting the
+        job, so the background thread sees the current data.
+
+        :param scheduled_by: A User instance who is doing the scheduling.
+
+        :param projects: A list of :class:`.Project` instances to schedule,
+          see :meth:`.schedule`. The default is None which schedules all the
+          active projects.
+
+        :returns: :class:`.ScheduleJob`
+        """
+        from stalker.models.schedulers import ScheduleJob
+
+        if self.scheduler is None or \
+                not isinstance(self.scheduler, SchedulerBase):
+            raise RuntimeError(
+                'There is no scheduler for this %(class)s, please assign a '
+                'scheduler to the %(class)s.scheduler attribute, before '
+                'calling %(class)s.schedule_async()' %
+                {
+                    'class': self.__class__.__name__
+                }
+            )
+        self._validate_scheduled_projects(projects)
+
+        DBSession.add(self)
+        DBSession.commit()
+
+        job = ScheduleJob(
+            self.id,
+            self.scheduler,
+            scheduled_by_id=scheduled_by.id if scheduled_by else None,
+            project_ids=[project.id for project in projects]
+            if projects is not None else None
+        )
+        job.start()
+        return job
+
+    def _dry_run_schedule(self, projects=None):
+        """runs the scheduler in dry run mode and returns the
+        :class:`.ScheduleResult`, the session is not flushed so the pending
+        changes are not seen by the scheduler
+
+        :param projects: The projects to schedule, None means all the active
+          projects
+        """
+        self.scheduler.studio = self
+        self.scheduler.projects = projects
+        self.scheduler.stats = None
+        self.scheduler.dry_run = True
+        start = time.time()
+        try:
+            with DBSession.no_autoflush:
+                self.scheduler.schedule()
+        finally:
+            self.scheduler.dry_run = False
+            self.scheduler.projects = None
+        end = time.time()
+        logger.debug('dry run scheduling took %s seconds' % (end - start))
+        return self.scheduler.result
+
     @property
     def weekly_working_hours(self):
         """returns the WorkingHours.weekly_working_hours
@@ -727,9 +985,9 @@ class WorkingHours(object):
         """returns TaskJuggler representation of this object
         """
         # render the template
-        from jinja2 import Template
+        from stalker.models import get_template
 
-        template = Template(defaults.tjp_working_hours_template)
+        template = get_template('tjp_working_hours_template')
         return template.render({'workinghours': self})
 
     @property
@@ -852,7 +1110,7 @@ class Vacation(SimpleEntity, DateRangeMixin):
     def to_tjp(self):
         """overridden to_tjp method
         """
-        from jinja2 import Template
+        from stalker.models import get_template
 
-        template = Template(defaults.tjp_vacation_template)
+        template = get_template('tjp_vacation_template')
         return template.render({'vacation': self})
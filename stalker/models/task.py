@@ -21,22 +21,26 @@
 import datetime
 import logging
 import os
+import weakref
 
 from sqlalchemy import (Table, Column, Integer, ForeignKey, Boolean, Enum,
-                        DateTime, Float, event)
+                        DateTime, Float, String, event, func, inspect,
+                        literal)
 from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.ext.associationproxy import association_proxy
-from sqlalchemy.orm import relationship, validates, synonym, reconstructor
+from sqlalchemy.orm import (relationship, validates, synonym, reconstructor,
+                            object_session, Session)
+from sqlalchemy.orm.attributes import set_committed_value
 
 from stalker import defaults
 from stalker.db.session import DBSession
 from stalker.db.declarative import Base
-from stalker.models import check_circular_dependency
+from stalker.models import DependencyGraph, get_template
 from stalker.models.entity import Entity
 from stalker.models.auth import User
 from stalker.models.mixins import (DateRangeMixin, StatusMixin, ReferenceMixin,
                                    ScheduleMixin)
-from stalker.models.status import Status
+from stalker.models.status import StatusRegistry, StatusPropagator
 from stalker.exceptions import (OverBookedError, CircularDependencyError,
                                 StatusError)
 from stalker.log import logging_level
@@ -51,6 +55,79 @@ CONSTRAIN_START = 1
 CONSTRAIN_END = 2
 CONSTRAIN_BOTH = 3
 
+# the binary codes of the Task statuses, the statuses of the dependencies or
+# the children of a Task are combined in to one integer by summing the codes
+# of the distinct statuses
+#
+#   +--------- WFD
+#   |+-------- RTS
+#   ||+------- WIP
+#   |||+------ PREV
+#   ||||+----- HREV
+#   |||||+---- DREV
+#   ||||||+--- OH
+#   |||||||+-- STOP
+#   ||||||||+- CMPL
+#   |||||||||
+# 0b000000000
+BINARY_STATUS_CODES = {
+    'WFD':  256,
+    'RTS':  128,
+    'WIP':  64,
+    'PREV': 32,
+    'HREV': 16,
+    'DREV': 8,
+    'OH':   4,
+    'STOP': 2,
+    'CMPL': 1
+}
+
+# the possible statuses of a container Task
+PARENT_STATUS_CODES = ['WFD', 'RTS', 'WIP', 'CMPL']
+
+#
+# I know that the following list seems cryptic but the it shows the
+# final status index in PARENT_STATUS_CODES list.
+#
+# So by using the cumulative statuses of children we got an index from
+# the following table, and use the found element (integer) as the index
+# for the PARENT_STATUS_CODES list, and we find the desired status
+#
+# We are doing it in this way for a couple of reasons:
+#
+#   1. We shouldn't hold the statuses in the following list,
+#   2. Using a dictionary is another alternative, where the keys are
+#      the cumulative binary status codes, but at the end the result of
+#      this cumulative thing is a number between 0-511 so no need to
+#      use a dictionary with integer keys
+#
+CHILDREN_TO_PARENT_STATUSES_LUT = [
+    0, 3, 3, 3, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 1, 2, 1, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 0, 2, 0, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 1, 2, 1, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
+    2, 2, 2, 2, 2, 2
+]
+
 
 class TimeLog(Entity, DateRangeMixin):
     """Holds information about the uninterrupted time spent on a specific
@@ -175,15 +252,16 @@ class TimeLog(Entity, DateRangeMixin):
 
         # check status
         with DBSession.no_autoflush:
-            WFD = Status.query.filter_by(code='WFD').first()
-            RTS = Status.query.filter_by(code='RTS').first()
-            WIP = Status.query.filter_by(code='WIP').first()
-            PREV = Status.query.filter_by(code='PREV').first()
-            HREV = Status.query.filter_by(code='HREV').first()
-            DREV = Status.query.filter_by(code='DREV').first()
-            OH = Status.query.filter_by(code='OH').first()
-            STOP = Status.query.filter_by(code='STOP').first()
-            CMPL = Status.query.filter_by(code='CMPL').first()
+            statuses = StatusRegistry.get_registry()
+            WFD = statuses.get('WFD')
+            RTS = statuses.get('RTS')
+            WIP = statuses.get('WIP')
+            PREV = statuses.get('PREV')
+            HREV = statuses.get('HREV')
+            DREV = statuses.get('DREV')
+            OH = statuses.get('OH')
+            STOP = statuses.get('STOP')
+            CMPL = statuses.get('CMPL')
 
             if task.status in [WFD, PREV, OH, STOP, CMPL]:
                 raise StatusError(
@@ -252,6 +330,247 @@ class TimeLog(Entity, DateRangeMixin):
             self.resource is other.resource and self.start == other.start and \
             self.end == other.end and self.name == other.name
 
+class Booking(object):
+    """A booking interval of a resource on a task, which is created by
+    merging the :class:`.TimeLog` instances that are following each other
+    without a gap (see :meth:`.Task.compacted_time_logs`).
+
+    It has the ``resource``, ``start``, ``end`` and ``duration`` attributes
+    of a TimeLog, so it can be rendered in place of a TimeLog in the
+    ``tjp_task_template``.
+
+    :param resource: The :class:`.User` instance that this booking is for.
+
+    :param start: A datetime.datetime instance showing the start of the
+      booking.
+
+    :param end: A datetime.datetime instance showing the end of the booking.
+    """
+
+    def __init__(self, resource, start, end):
+        self.resource = resource
+        self.start = start
+        self.end = end
+
+    @property
+    def duration(self):
+        """returns the duration of this booking as a datetime.timedelta
+        """
+        return self.end - self.start
+
+    def __repr__(self):
+        return '<Booking %s %s - %s>' % (self.resource, self.start, self.end)
+
+
+class LoggedSecondsAccumulator(object):
+    """Accumulates the changes of the logged seconds of the tasks and updates
+    the cached total_logged_seconds values of their parents at once.
+
+    Adding a :class:`.TimeLog` to a task or changing its start or end values
+    changes the :attr:`.Task.total_logged_seconds` of all the parents of the
+    task. Instead of updating all the parents on every change, the change in
+    seconds is collected per task and when the session is flushed the changes
+    are summed up for each parent and every parent is updated only once. So
+    creating 1000 time logs for the tasks under the same parents updates
+    every parent once per flush.
+
+    The collected changes are also applied before the total_logged_seconds
+    of a container task is read and before the task hierarchy is changed, so
+    the values are always up to date. The autoflush of the session applies
+    them too, so wrap the bulk changes with ``DBSession.no_autoflush``::
+
+      >>> with DBSession.no_autoflush:
+      ...     for data in time_log_data:
+      ...         TimeLog(task=data['task'], resource=data['resource'],
+      ...                 start=data['start'], end=data['end'])
+      >>> DBSession.flush()  # the parents are updated here
+
+    There is one accumulator for each session, :meth:`.get_accumulator`
+    returns the accumulator of the current :class:`.DBSession` by default.
+    The collected changes are discarded when the transaction ends.
+
+    :param session: The session of this accumulator.
+    """
+
+    _accumulators = weakref.WeakKeyDictionary()
+
+    def __init__(self, session):
+        self.session = session
+        self._deltas = {}
+
+    @classmethod
+    def get_accumulator(cls, session=None):
+        """returns the accumulator of the given session
+
+        :param session: A session instance. The default is None which uses the
+          current :class:`.DBSession`.
+        """
+        if session is None:
+            session = DBSession()
+
+        accumulator = cls._accumulators.get(session)
+        if accumulator is None:
+            accumulator = cls(session)
+            cls._accumulators[session] = accumulator
+        return accumulator
+
+    @property
+    def has_pending(self):
+        """returns True if there are collected changes waiting to be applied
+        """
+        return bool(self._deltas)
+
+    def add(self, task, seconds):
+        """collects the change of the logged seconds of the given task
+
+        :param task: A :class:`.Task` instance, the parents of it are updated.
+        :param int seconds: The change in seconds, can be negative.
+        """
+        if not seconds:
+            return
+        delta = self._deltas.get(id(task))
+        if delta is None:
+            self._deltas[id(task)] = [task, seconds]
+        else:
+            delta[1] += seconds
+
+    def clear(self):
+        """discards the collected changes
+        """
+        self._deltas = {}
+
+    def apply(self):
+        """updates the total_logged_seconds of the parents of the collected
+        tasks, the parents which are not calculated yet are skipped, they will
+        be calculated from their children when they are needed
+        """
+        while self._deltas:
+            deltas = self._deltas
+            self.clear()
+
+            parent_deltas = {}
+            with self.session.no_autoflush:
+                for task, seconds in deltas.values():
+                    for parent in task.parents:
+                        delta = parent_deltas.get(id(parent))
+                        if delta is None:
+                            parent_deltas[id(parent)] = [parent, seconds]
+                        else:
+                            delta[1] += seconds
+
+                for parent, seconds in parent_deltas.values():
+                    if parent._total_logged_seconds is not None:
+                        parent._total_logged_seconds += seconds
+
+
+class TaskDependencyGraph(DependencyGraph):
+    """The :class:`.DependencyGraph` of the task dependencies, a task is
+    related to the tasks in its :attr:`.Task.depends` attribute.
+
+    :meth:`.Task._validate_task_depends_to` adds the new dependencies to the
+    graph of the current session and the graph rejects the dependencies that
+    create a cycle. The tasks are added to the graph with all the tasks that
+    they are connected to the first time they are used, which loads the
+    dependencies of the tasks one by one. Before changing a lot of
+    dependencies of the stored tasks, use :meth:`.rebuild` to load all of
+    them from the ``Task_Dependencies`` table at once, after that the tasks
+    without dependencies are added without loading anything::
+
+      >>> graph = TaskDependencyGraph.get_graph()
+      >>> graph.rebuild(project)
+      >>> for task, depends in dependencies:
+      ...     task.depends.append(depends)
+    """
+
+    attr_name = 'depends'
+
+    def clear(self):
+        """removes all the tasks from the graph
+        """
+        super(TaskDependencyGraph, self).clear()
+        # the ids of the tasks which have dependencies in the database, it is
+        # filled by rebuild()
+        self._dependent_task_ids = None
+
+    def _dependencies(self, task, attr_name, column, other_attr_name):
+        """returns the TaskDependency instances in the given relation of the
+        given task.
+
+        The relations are not loaded for the persistent tasks, the
+        TaskDependencies are queried instead, so the relations are loaded
+        later as they would be without the graph. The tasks that had no
+        dependencies in the database when the graph was rebuilt are not
+        queried at all, the dependencies created after that are added by the
+        listeners.
+        """
+        state = inspect(task)
+        if attr_name in task.__dict__ or not state.persistent:
+            return getattr(task, attr_name)
+
+        task_id = state.identity[0]
+        if self._dependent_task_ids is not None \
+                and task_id not in self._dependent_task_ids:
+            return []
+
+        return [task_dependency for task_dependency in
+                self.session.query(TaskDependency).filter(column == task_id)
+                if getattr(task_dependency, other_attr_name) is task]
+
+    def successors(self, task):
+        """returns the tasks that the given task depends to
+        """
+        with self.session.no_autoflush:
+            return [task_depends_to.depends_to
+                    for task_depends_to in self._dependencies(
+                        task, 'task_depends_to', TaskDependency.task_id,
+                        'task'
+                    )
+                    if task_depends_to.depends_to is not None]
+
+    def predecessors(self, task):
+        """returns the tasks that are depending to the given task
+        """
+        with self.session.no_autoflush:
+            return [task_dependent_of.task
+                    for task_dependent_of in self._dependencies(
+                        task, 'task_dependent_of',
+                        TaskDependency.depends_to_id, 'depends_to'
+                    )
+                    if task_dependent_of.task is not None]
+
+    def rebuild(self, project=None):
+        """clears the graph and adds all the tasks that have dependencies by
+        loading them and their dependencies with a couple of queries, the
+        session is flushed first
+
+        :param project: A :class:`.Project` instance. If given only the tasks
+          of the project are loaded, the tasks of the other projects are
+          loaded one by one when they are needed. The default is None which
+          loads the tasks of all projects.
+        """
+        from sqlalchemy import select, union
+        from sqlalchemy.orm import subqueryload
+        self.session.flush()
+        self.clear()
+        dependencies = TaskDependency.__table__
+        task_ids = union(
+            select([dependencies.c.task_id]),
+            select([dependencies.c.depends_to_id])
+        )
+        with self.session.no_autoflush:
+            self._dependent_task_ids = set(
+                row[0] for row in self.session.execute(task_ids)
+            )
+            query = self.session.query(Task)\
+                .filter(Task.id.in_(task_ids))\
+                .options(subqueryload(Task.task_depends_to),
+                         subqueryload(Task.task_dependent_of))
+            if project is not None:
+                query = query.filter(Task.project == project)
+            for task in query.all():
+                self.add(task)
+
+
 # TODO: Consider contracting a Task with TimeLogs, what will happen when the task has logged in time
 # TODO: Check, what happens when a task has TimeLogs and will have child task later on, will it be ok with TJ
 
@@ -482,6 +801,16 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
     Stalker will check if there will be a cycle if one wants to parent a Task
     to a child Task of its own or the dependency relation creates a cycle.
 
+    The ids of the parents of a Task are stored in the :attr:`.hierarchy_path`
+    attribute starting from the root (e.g. ``"12|34|"``) and it is updated
+    when the session is flushed. It is used to load all the parents
+    (:attr:`.parents`) or all the children (:meth:`.walk_hierarchy`) of a
+    persisted Task with one query and the subtree of a Task can be queried
+    with it::
+
+      >>> prefix = '%s%s|' % (task.hierarchy_path, task.id)
+      >>> Task.query.filter(Task.hierarchy_path.like(prefix + '%')).all()
+
     In Gantt Charts the ``computed_start``, ``computed_end`` and
     ``computed_resources`` attributes will be used if the task
     :attr:`.is_scheduled`.
@@ -858,6 +1187,14 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
         """
     )
 
+    _hierarchy_path = Column(
+        'hierarchy_path', String, index=True,
+        doc="""The ids of the parents of this task starting from the root,
+        each one is followed by a "|" character. It is an empty string for
+        root tasks. Updated when the session is flushed.
+        """
+    )
+
     is_milestone = Column(
         Boolean,
         doc="""Specifies if this Task is a milestone.
@@ -1050,6 +1387,12 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
         doc='cache column for total_logged_seconds'
     )
 
+    _child_count = Column(
+        "child_count",
+        Integer, nullable=False, default=0,
+        doc='cache column for the number of children, see is_container'
+    )
+
     reviews = relationship(
         "Review",
         primaryjoin="Reviews.c.task_id==Tasks.c.id",
@@ -1114,7 +1457,7 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
 
         # update the status
         with DBSession.no_autoflush:
-            WFD = Status.query.filter_by(code='WFD').first()
+            WFD = StatusRegistry.get_registry().get('WFD')
         self.status = WFD
 
         if depends is None:
@@ -1185,11 +1528,10 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
                 )
             )
 
-        # TODO: convert this to an event
         # update parents total_logged_second attribute
-        with DBSession.no_autoflush:
-            if self.parent:
-                self.parent.total_logged_seconds += time_log.total_seconds
+        LoggedSecondsAccumulator.get_accumulator().add(
+            self, time_log.total_seconds
+        )
 
         return time_log
 
@@ -1227,15 +1569,16 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
 
         # check the status of the current task
         with DBSession.no_autoflush:
-            WFD = Status.query.filter_by(code='WFD').first()
-            RTS = Status.query.filter_by(code='RTS').first()
-            WIP = Status.query.filter_by(code='WIP').first()
-            PREV = Status.query.filter_by(code='PREV').first()
-            HREV = Status.query.filter_by(code='HREV').first()
-            DREV = Status.query.filter_by(code='DREV').first()
-            OH = Status.query.filter_by(code='OH').first()
-            STOP = Status.query.filter_by(code='STOP').first()
-            CMPL = Status.query.filter_by(code='CMPL').first()
+            statuses = StatusRegistry.get_registry()
+            WFD = statuses.get('WFD')
+            RTS = statuses.get('RTS')
+            WIP = statuses.get('WIP')
+            PREV = statuses.get('PREV')
+            HREV = statuses.get('HREV')
+            DREV = statuses.get('DREV')
+            OH = statuses.get('OH')
+            STOP = statuses.get('STOP')
+            CMPL = statuses.get('CMPL')
 
             if self.status in [WIP, PREV, HREV, DREV, OH, STOP, CMPL]:
                 raise StatusError(
@@ -1260,10 +1603,17 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
                 (self.__class__.__name__, depends.__class__.__name__)
             )
 
-        # check for the circular dependency
+        # check for the circular dependency toward the parents, the task can
+        # not depend to one of its parents
         with DBSession.no_autoflush:
-            check_circular_dependency(depends, self, 'depends')
-            check_circular_dependency(depends, self, 'children')
+            parent = self
+            while parent:
+                if parent is depends:
+                    raise CircularDependencyError(
+                        '%s is one of the parents of %s, a task can not '
+                        'depend to its parents' % (depends, self)
+                    )
+                parent = parent.parent
 
         # check for circular dependency toward the parent, non of the parents
         # should be depending to the given depends_to_task
@@ -1277,6 +1627,11 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
                     )
                 parent = parent.parent
 
+        # check for the circular dependency and add the dependency to the
+        # dependency graph
+        with DBSession.no_autoflush:
+            TaskDependencyGraph.get_graph().add_edge(self, depends)
+
         # update status with the new dependency
         # update towards more constrained situation
         #
@@ -1381,14 +1736,38 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
                     (self.__class__.__name__, parent.__class__.__name__)
                 )
 
-            #with DBSession.no_autoflush:
-            # check for cycle
-            check_circular_dependency(self, parent, 'children')
-            check_circular_dependency(self, parent, 'depends')
+            # check for cycle, the parent can not be one of the children of
+            # this task or one of the tasks that this task depends to
+            with DBSession.no_autoflush:
+                ancestor = parent
+                while ancestor:
+                    if ancestor is self:
+                        raise CircularDependencyError(
+                            '%s is one of the children of %s, it can not be '
+                            'the parent of it' % (parent, self)
+                        )
+                    ancestor = ancestor.parent
+
+                if TaskDependencyGraph.get_graph().has_path(self, parent):
+                    raise CircularDependencyError(
+                        '%s is depending to %s, it can not be the parent of '
+                        'it' % (self, parent)
+                    )
+
+        # the collected logged seconds belong to the current parents
+        LoggedSecondsAccumulator.get_accumulator().apply()
 
         old_parent = self.parent
         new_parent = parent
 
+        # load the children of the parents before they are updated by the
+        # backref, so is_container counts this task in the right parent and
+        # the dates of the old parent can be updated with its other children
+        with DBSession.no_autoflush:
+            for task in [old_parent, new_parent]:
+                if task is not None:
+                    task.children
+
         if old_parent:
             old_parent.schedule_seconds -= self.schedule_seconds
             old_parent.total_logged_seconds -= self.total_logged_seconds
@@ -1489,6 +1868,9 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
         with DBSession.no_autoflush:
             self.resources = []
 
+            # the collected logged seconds belong to the current parents
+            LoggedSecondsAccumulator.get_accumulator().apply()
+
             # if this is the first ever child we receive
             # set total_scheduled_seconds to child's total_logged_seconds
             # and set schedule_seconds to child's schedule_seconds
@@ -1787,9 +2169,13 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
 
     @property
     def is_container(self):
-        """Returns True if the Task has children Tasks
+        """Returns True if the Task has children Tasks. For a persisted Task
+        whose children are not loaded yet the number of children is read from
+        the child_count column, so the children are not loaded.
         """
         with DBSession.no_autoflush:
+            if 'children' not in self.__dict__ and inspect(self).has_identity:
+                return bool(self._child_count)
             return bool(len(self.children))
 
     @property
@@ -1802,6 +2188,7 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
     def parents(self):
         """Returns all of the parents of this Task starting from the root
         """
+        self._load_parents()
         parents = []
         task = self.parent
         while task:
@@ -1814,6 +2201,7 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
     def tjp_abs_id(self):
         """returns the calculated absolute id of this task
         """
+        self._load_parents()
         if self.parent:
             abs_id = self.parent.tjp_abs_id
         else:
@@ -1825,23 +2213,60 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
     def to_tjp(self):
         """TaskJuggler representation of this task
         """
-        from jinja2 import Template
-
-        temp = Template(defaults.tjp_task_template, trim_blocks=True)
+        temp = get_template('tjp_task_template', trim_blocks=True)
         return temp.render({'task': self})
 
+    def generate_tjp(self, compact_bookings=False):
+        """Generates the TaskJuggler representation of this task fragment by
+        fragment. Joining the generated fragments gives the same result with
+        :attr:`.to_tjp`, but the child tasks are rendered one by one instead
+        of being rendered as one big string.
+
+        :param bool compact_bookings: If True the bookings are rendered from
+          the :meth:`.compacted_time_logs` instead of rendering one booking
+          per TimeLog. The default is False.
+        """
+        temp = get_template('tjp_task_template', trim_blocks=True)
+        return temp.generate(
+            {'task': self, 'compact_bookings': compact_bookings}
+        )
+
+    def compacted_time_logs(self):
+        """Returns the time logs of this task as a list of :class:`.Booking`
+        instances by merging the time logs of the same resource that are
+        following each other without a gap in to one booking interval. The
+        bookings are sorted by their start dates.
+
+        Only the time logs that are touching each other are merged, merging
+        the time logs over a gap would also book the gap, so TaskJuggler
+        will schedule the task exactly the same with the bookings and the
+        time logs.
+
+        :returns: list of :class:`.Booking` instances
+        """
+        bookings = []
+        last_bookings = {}
+        time_logs = sorted(self.time_logs, key=lambda x: x.start)
+        for time_log in time_logs:
+            key = id(time_log.resource)
+            booking = last_bookings.get(key)
+            if booking is not None and booking.end == time_log.start:
+                booking.end = time_log.end
+            else:
+                booking = Booking(
+                    time_log.resource, time_log.start, time_log.end
+                )
+                bookings.append(booking)
+                last_bookings[key] = booking
+        return bookings
+
     @property
     def level(self):
         """Returns the level of this task. It is a temporary property and will
         be useless when Stalker has its own implementation of a proper Gantt
         Chart. Write now it is used by the jQueryGantt.
         """
-        i = 0
-        current = self
-        while current:
-            i += 1
-            current = current.parent
-        return i
+        return len(self.parents) + 1
 
     @property
     def is_scheduled(self):
@@ -1863,6 +2288,7 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
                 for time_log in self.time_logs:
                     seconds += time_log.total_seconds
             else:
+                LoggedSecondsAccumulator.get_accumulator().apply()
                 if self._total_logged_seconds is None:
                     self.update_schedule_info()
                 return self._total_logged_seconds
@@ -1876,6 +2302,7 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
         """
         # only set for container tasks
         if self.is_container:
+            LoggedSecondsAccumulator.get_accumulator().apply()
             # update parent
             old_value = 0
             if self._total_logged_seconds:
@@ -1941,6 +2368,7 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
         using the children info and triggers an update on every children
         """
         if self.is_container:
+            LoggedSecondsAccumulator.get_accumulator().apply()
             total_logged_seconds = 0
             schedule_seconds = 0
             logger.debug('updating schedule info for : %s' % self.name)
@@ -2057,9 +2485,114 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
         :param method: The walk method, 0: Depth First, 1: Breadth First
         """
         from stalker.models import walk_hierarchy
+        self._load_descendants()
         for t in walk_hierarchy(self, 'children', method=method):
             yield t
 
+    def _hierarchy_path_getter(self):
+        """returns the hierarchy_path value
+        """
+        return self._hierarchy_path
+
+    hierarchy_path = synonym(
+        '_hierarchy_path',
+        descriptor=property(_hierarchy_path_getter),
+        doc="""The ids of the parents of this task starting from the root,
+        each one is followed by a "|" character, e.g. "12|34|". It is an
+        empty string for root tasks and it is None until the task is
+        flushed. It is a read-only attribute which is updated when the
+        session is flushed."""
+    )
+
+    def _load_parents(self):
+        """loads the parents of this task which are not loaded yet with one
+        query by using the :attr:`.hierarchy_path`, so walking over the
+        :attr:`.parent` attributes does not query the parents one by one
+        """
+        # nothing to do if all the parents are already loaded
+        task = self
+        while 'parent' in task.__dict__:
+            task = task.__dict__['parent']
+            if task is None:
+                return
+
+        session = object_session(self)
+        if session is None or not self._hierarchy_path:
+            return
+
+        mapper = inspect(Task)
+        parents = {}
+        parent_ids = []
+        for parent_id in map(int, self._hierarchy_path.split('|')[:-1]):
+            parent = session.identity_map.get(
+                mapper.identity_key_from_primary_key([parent_id])
+            )
+            if parent is None or 'parent_id' not in parent.__dict__:
+                parent_ids.append(parent_id)
+            else:
+                parents[parent_id] = parent
+
+        if parent_ids:
+            # the hierarchy_path may be stale, it is only used to load the
+            # parents beforehand, so no need to flush
+            with session.no_autoflush:
+                for parent in session.query(Task)\
+                        .filter(Task.id.in_(parent_ids)):
+                    parents[parent.id] = parent
+
+        # SQLAlchemy can not get the parent from the identity map, so set the
+        # parents which are not loaded yet
+        task = self
+        while task is not None:
+            if 'parent' not in task.__dict__:
+                if task.parent_id is not None and \
+                        task.parent_id not in parents:
+                    # stale hierarchy_path, let SQLAlchemy load the rest
+                    break
+                set_committed_value(
+                    task, 'parent', parents.get(task.parent_id)
+                )
+            task = task.parent
+
+    def _load_descendants(self):
+        """loads all the descendants of this task with one query by using the
+        :attr:`.hierarchy_path` and fills the children of the loaded tasks,
+        so walking the hierarchy does not query the children of each task one
+        by one
+        """
+        session = object_session(self)
+        if session is None or not session.autoflush or \
+                inspect(self).key is None:
+            return
+
+        # the children are filled with the data in the database, so it should
+        # be up to date
+        session.flush()
+
+        if self._hierarchy_path is None:
+            return
+
+        prefix = '%s%s|' % (self._hierarchy_path, self.id)
+        descendants = session.query(Task)\
+            .filter(Task._hierarchy_path.like(prefix + '%'))\
+            .order_by(Task.id)\
+            .all()
+
+        tasks = {self.id: self}
+        children = {}
+        for task in descendants:
+            tasks[task.id] = task
+            children.setdefault(task.parent_id, []).append(task)
+
+        for task in [self] + descendants:
+            if 'children' not in task.__dict__:
+                set_committed_value(
+                    task, 'children', children.get(task.id, [])
+                )
+            if task is not self and 'parent' not in task.__dict__ and \
+                    task.parent_id in tasks:
+                set_committed_value(task, 'parent', tasks[task.parent_id])
+
     def walk_dependencies(self, method=1):
         """Walks the dependencies of this task
 
@@ -2091,8 +2624,9 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
         """
         # check task status
         with DBSession.no_autoflush:
-            WIP = Status.query.filter_by(code='WIP').first()
-            PREV = Status.query.filter_by(code='PREV').first()
+            statuses = StatusRegistry.get_registry()
+            WIP = statuses.get('WIP')
+            PREV = statuses.get('PREV')
 
         if self.status != WIP:
             raise StatusError(
@@ -2150,8 +2684,9 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
         """
         # check status
         with DBSession.no_autoflush:
-            PREV = Status.query.filter_by(code='PREV').first()
-            CMPL = Status.query.filter_by(code='CMPL').first()
+            statuses = StatusRegistry.get_registry()
+            PREV = statuses.get('PREV')
+            CMPL = statuses.get('CMPL')
 
         if self.status not in [PREV, CMPL]:
             raise StatusError(
@@ -2201,10 +2736,27 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
         raise a ValueError.
         """
         # check if status is WIP
+        self._validate_hold()
+
         with DBSession.no_autoflush:
-            WIP = Status.query.filter_by(code='WIP').first()
-            DREV = Status.query.filter_by(code='DREV').first()
-            OH = Status.query.filter_by(code='OH').first()
+            OH = StatusRegistry.get_registry().get('OH')
+
+        # update the status to OH
+        self.status = OH
+
+        # set the priority to 0
+        self.priority = 0
+
+        # no need to update the status of dependencies nor parents
+
+    def _validate_hold(self):
+        """raises a StatusError if this task can not be set to On Hold
+        """
+        with DBSession.no_autoflush:
+            statuses = StatusRegistry.get_registry()
+            WIP = statuses.get('WIP')
+            DREV = statuses.get('DREV')
+            OH = statuses.get('OH')
 
         if self.status not in [WIP, DREV, OH]:
             raise StatusError(
@@ -2215,13 +2767,6 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
                     'status': self.status.code
                 }
             )
-        # update the status to OH
-        self.status = OH
-
-        # set the priority to 0
-        self.priority = 0
-
-        # no need to update the status of dependencies nor parents
 
     def stop(self):
         """Stops this task. It is nearly equivalent to deleting this task. But
@@ -2243,20 +2788,10 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
         """
 
         # check the status
-        with DBSession.no_autoflush:
-            WIP = Status.query.filter_by(code='WIP').first()
-            DREV = Status.query.filter_by(code='DREV').first()
-            STOP = Status.query.filter_by(code='STOP').first()
+        self._validate_stop()
 
-        if self.status not in [WIP, DREV, STOP]:
-            raise StatusError(
-                '%(task)s (id:%(id)s)is a %(status)s task and it is not possible'
-                'to stop a %(status)s task.' % {
-                    'task': self.name,
-                    'id': self.id,
-                    'status': self.status.code
-                }
-            )
+        with DBSession.no_autoflush:
+            STOP = StatusRegistry.get_registry().get('STOP')
 
         # set the status
         self.status = STOP
@@ -2272,6 +2807,25 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
         for dep in self.dependent_of:
             dep.update_status_with_dependent_statuses()
 
+    def _validate_stop(self):
+        """raises a StatusError if this task can not be stopped
+        """
+        with DBSession.no_autoflush:
+            statuses = StatusRegistry.get_registry()
+            WIP = statuses.get('WIP')
+            DREV = statuses.get('DREV')
+            STOP = statuses.get('STOP')
+
+        if self.status not in [WIP, DREV, STOP]:
+            raise StatusError(
+                '%(task)s (id:%(id)s)is a %(status)s task and it is not possible'
+                'to stop a %(status)s task.' % {
+                    'task': self.name,
+                    'id': self.id,
+                    'status': self.status.code
+                }
+            )
+
     def resume(self):
         """Resumes the execution of this task by setting its status to RTS or
         WIP depending to its time_logs attribute, so if it has TimeLogs then it
@@ -2279,10 +2833,27 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
         applicable to Tasks with status OH.
         """
         # check status
+        self._validate_resume()
+
+        with DBSession.no_autoflush:
+            WIP = StatusRegistry.get_registry().get('WIP')
+
+        # set to WIP
+        self.status = WIP
+
+        # now update the status with dependencies
+        self.update_status_with_dependent_statuses()
+
+        # and update parents statuses
+        self.update_parent_statuses()
+
+    def _validate_resume(self):
+        """raises a StatusError if this task can not be resumed
+        """
         with DBSession.no_autoflush:
-            WIP = Status.query.filter_by(code='WIP').first()
-            OH = Status.query.filter_by(code='OH').first()
-            STOP = Status.query.filter_by(code='STOP').first()
+            statuses = StatusRegistry.get_registry()
+            OH = statuses.get('OH')
+            STOP = statuses.get('STOP')
 
         if self.status not in [OH, STOP]:
             raise StatusError(
@@ -2294,15 +2865,6 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
                     'status': self.status.code
                 }
             )
-        else:
-            # set to WIP
-            self.status = WIP
-
-        # now update the status with dependencies
-        self.update_status_with_dependent_statuses()
-
-        # and update parents statuses
-        self.update_parent_statuses()
 
     def approve(self):
         """Approves a PREV task and sets its status to CMPL.
@@ -2314,8 +2876,17 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
         # get statuses
         logger.debug('approving task: %s' % self.name)
 
+        self._validate_approve()
+
+        # approve all Reviews
+        for review in self.reviews:
+            review.approve()
+
+    def _validate_approve(self):
+        """raises a StatusError if this task can not be approved
+        """
         with DBSession.no_autoflush:
-            PREV = Status.query.filter_by(code='PREV').first()
+            PREV = StatusRegistry.get_registry().get('PREV')
 
         if self.status != PREV:
             raise StatusError(
@@ -2323,13 +2894,92 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
                 (self.__class__.__name__, self.status.code)
             )
 
-        # approve all Reviews
-        for review in self.reviews:
-            review.approve()
+    @classmethod
+    def bulk_hold(cls, tasks):
+        """Holds all of the given tasks at once, see :meth:`.hold`.
+
+        All the tasks are validated before any of them is changed, so if one
+        of them can not be set to On Hold a StatusError is raised and none of
+        the tasks are changed.
+
+        :param tasks: A list of :class:`.Task` instances.
+        """
+        cls._bulk_action(tasks, cls._validate_hold, cls.hold)
+
+    @classmethod
+    def bulk_stop(cls, tasks):
+        """Stops all of the given tasks at once, see :meth:`.stop`.
+
+        All the tasks are validated before any of them is changed and the
+        statuses of the parents and the dependent tasks are updated in one
+        pass at the end.
+
+        :param tasks: A list of :class:`.Task` instances.
+        """
+        cls._bulk_action(tasks, cls._validate_stop, cls.stop)
+
+    @classmethod
+    def bulk_resume(cls, tasks):
+        """Resumes all of the given tasks at once, see :meth:`.resume`.
+
+        All the tasks are validated before any of them is changed and the
+        statuses of the parents and the dependent tasks are updated in one
+        pass at the end.
+
+        :param tasks: A list of :class:`.Task` instances.
+        """
+        cls._bulk_action(tasks, cls._validate_resume, cls.resume)
+
+    @classmethod
+    def bulk_approve(cls, tasks):
+        """Approves all of the given tasks at once, see :meth:`.approve`.
+
+        All the tasks are validated before any of them is changed and the
+        statuses of the parents and the dependent tasks are updated in one
+        pass at the end.
+
+        :param tasks: A list of :class:`.Task` instances.
+        """
+        cls._bulk_action(tasks, cls._validate_approve, cls.approve)
+
+    @classmethod
+    def _bulk_action(cls, tasks, validator, action):
+        """validates all of the given tasks with the given validator and then
+        calls the given action for each of them with the status propagation
+        deferred to a single pass at the end
+
+        :param tasks: A list of :class:`.Task` instances, the same task is
+          processed only once.
+        :param validator: An unbound validation method of :class:`.Task`.
+        :param action: An unbound workflow method of :class:`.Task`.
+        """
+        unique_tasks = []
+        task_ids = set()
+        for task in tasks:
+            if not isinstance(task, Task):
+                raise TypeError(
+                    'tasks should be a list of stalker.models.task.Task '
+                    'instances, not %s' % task.__class__.__name__
+                )
+            if id(task) not in task_ids:
+                task_ids.add(id(task))
+                unique_tasks.append(task)
+
+        with DBSession.no_autoflush:
+            for task in unique_tasks:
+                validator(task)
+
+        with StatusPropagator.get_propagator().deferred():
+            for task in unique_tasks:
+                action(task)
 
     def update_status_with_dependent_statuses(self, removing=None):
         """updates the status by looking at the dependent tasks
 
+        If the :class:`.StatusPropagator` of the session is in "deferred" mode
+        the task is only collected and its status is updated when the session
+        is flushed.
+
         :param removing: The item that is been removing right now, used for the
           remove event to overcome the update issue.
         """
@@ -2337,16 +2987,34 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
             # do nothing, its status will be decided by its children
             return
 
+        propagator = StatusPropagator.get_propagator()
+        if propagator.is_deferred:
+            propagator.add_dependent(self)
+            return
+
+        if self._update_status_with_dependent_statuses(removing):
+            # also update parent statuses
+            self.update_parent_statuses()
+
+    def _update_status_with_dependent_statuses(self, removing=None,
+                                               use_sql=True):
+        """updates the status by looking at the dependent tasks without
+        updating the parents, returns True if the status is decided by the
+        dependencies
+
+        :param removing: The item that is been removing right now.
+
+        :param bool use_sql: Query the dependency statuses from the database
+          if the task is persisted. If False the dependency statuses are read
+          from the Task instances.
+        """
+        if self.is_container:
+            return False
+
         with DBSession.no_autoflush:
-            WFD = Status.query.filter_by(code='WFD').first()
-            RTS = Status.query.filter_by(code='RTS').first()
-            WIP = Status.query.filter_by(code='WIP').first()
-            PREV = Status.query.filter_by(code='PREV').first()
-            HREV = Status.query.filter_by(code='HREV').first()
-            DREV = Status.query.filter_by(code='DREV').first()
-            OH = Status.query.filter_by(code='OH').first()
-            STOP = Status.query.filter_by(code='STOP').first()
-            CMPL = Status.query.filter_by(code='CMPL').first()
+            statuses = StatusRegistry.get_registry()
+            WFD = statuses.get('WFD')
+            RTS = statuses.get('RTS')
 
         if removing:
             self._previously_removed_dependent_tasks.append(removing)
@@ -2368,33 +3036,9 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
             # convert its status from WFD to RTS if necessary
             if self.status == WFD:
                 self.status = RTS
-            return
-
-        #   +--------- WFD
-        #   |+-------- RTS
-        #   ||+------- WIP
-        #   |||+------ PREV
-        #   ||||+----- HREV
-        #   |||||+---- DREV
-        #   ||||||+--- OH
-        #   |||||||+-- STOP
-        #   ||||||||+- CMPL
-        #   |||||||||
-        # 0b000000000
-
-        binary_status_codes = {
-            'WFD':  256,
-            'RTS':  128,
-            'WIP':  64,
-            'PREV': 32,
-            'HREV': 16,
-            'DREV': 8,
-            'OH':   4,
-            'STOP': 2,
-            'CMPL': 1
-        }
+            return False
 
-        if self.id:
+        if use_sql and self.id:
             # use pure sql
             logger.debug('using pure SQL to query dependency statuses')
             sql_query = """
@@ -2413,7 +3057,7 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
             # convert to a binary value
             binary_status = reduce(
                 lambda x, y: x+y,
-                map(lambda x: binary_status_codes[x[0]], result.fetchall()),
+                map(lambda x: BINARY_STATUS_CODES[x[0]], result.fetchall()),
                 0
             )
 
@@ -2429,37 +3073,42 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
                 # consider every status only once
                 if dep.status not in dep_statuses:
                     dep_statuses.append(dep.status)
-                    binary_status += binary_status_codes[dep.status.code]
+                    binary_status += BINARY_STATUS_CODES[dep.status.code]
 
         logger.debug('status of the task: %s' % self.status.code)
         logger.debug('binary status for dependency statuses: %s' %
                      binary_status)
 
-        work_alone = False
-        if binary_status < 4:
-            work_alone = True
-
-        status = self.status
-        if work_alone:
-            if self.status == WFD:
-                status = RTS
-            elif self.status == DREV:
-                status = WIP
-        else:
-            if self.status == RTS:
-                status = WFD
-            elif self.status == WIP:
-                status = DREV
-            elif self.status == HREV:
-                status = DREV
-            elif self.status == CMPL:
-                status = DREV
+        status = statuses.get(
+            self._dependency_status_code(self.status.code, binary_status)
+        )
 
         logger.debug('setting status from %s to %s: ' % (self.status, status))
         self.status = status
+        return True
 
-        # also update parent statuses
-        self.update_parent_statuses()
+    @classmethod
+    def _dependency_status_code(cls, status_code, binary_status):
+        """returns the status code of a leaf task which has the given status
+        code and dependencies with the given combined binary status (see
+        :data:`.BINARY_STATUS_CODES`)
+
+        :param str status_code: The current status code of the task.
+        :param int binary_status: The sum of the binary codes of the distinct
+          statuses of the dependencies.
+        """
+        if binary_status < 4:
+            # all the dependencies are STOP or CMPL, so it can work alone
+            if status_code == 'WFD':
+                return 'RTS'
+            elif status_code == 'DREV':
+                return 'WIP'
+        else:
+            if status_code == 'RTS':
+                return 'WFD'
+            elif status_code in ['WIP', 'HREV', 'CMPL']:
+                return 'DREV'
+        return status_code
 
     def update_parent_statuses(self):
         """updates the parent statuses of this task if any
@@ -2469,6 +3118,10 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
 
     def update_status_with_children_statuses(self):
         """updates the task status according to its children statuses
+
+        If the :class:`.StatusPropagator` of the session is in "deferred" mode
+        the task is only collected and its status is updated when the session
+        is flushed.
         """
         logger.debug('setting statuses with child statuses for: %s' %
                      self.name)
@@ -2478,41 +3131,37 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
             logger.debug('not a container returning!')
             return
 
-        WFD = Status.query.filter(Status.code == 'WFD').first()
-        RTS = Status.query.filter(Status.code == 'RTS').first()
-        WIP = Status.query.filter(Status.code == 'WIP').first()
-        CMPL = Status.query.filter(Status.code == 'CMPL').first()
-
-        parent_statuses_lut = [WFD, RTS, WIP, CMPL]
-
-        #   +--------- WFD
-        #   |+-------- RTS
-        #   ||+------- WIP
-        #   |||+------ PREV
-        #   ||||+----- HREV
-        #   |||||+---- DREV
-        #   ||||||+--- OH
-        #   |||||||+-- STOP
-        #   ||||||||+- CMPL
-        #   |||||||||
-        # 0b000000000
-
-        binary_status_codes = {
-            'WFD':  256,
-            'RTS':  128,
-            'WIP':  64,
-            'PREV': 32,
-            'HREV': 16,
-            'DREV': 8,
-            'OH':   4,
-            'STOP': 2,
-            'CMPL': 1
-        }
+        propagator = StatusPropagator.get_propagator()
+        if propagator.is_deferred:
+            propagator.add_container(self)
+            return
+
+        self._update_status_with_children_statuses()
 
-        if self.id:
+        # go to parents
+        self.update_parent_statuses()
+
+    def _update_status_with_children_statuses(self, use_sql=True):
+        """updates the task status according to its children statuses without
+        updating the parents
+
+        :param bool use_sql: Query the children statuses from the database if
+          the task is persisted. If False the children statuses are read from
+          the Task instances.
+        """
+        if not self.is_container:
+            return
+
+        statuses = StatusRegistry.get_registry()
+
+        if use_sql and self.id:
             # use pure sql
             logger.debug('using pure SQL to query children statuses')
 
+            # the query needs the pending children statuses in the database
+            if DBSession.autoflush:
+                DBSession.flush()
+
             sql_query = """select
                 "Statuses".code
             from "Tasks"
@@ -2526,7 +3175,7 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
             # convert to a binary value
             binary_status = reduce(
                 lambda x, y: x+y,
-                map(lambda x: binary_status_codes[x[0]], result.fetchall()),
+                map(lambda x: BINARY_STATUS_CODES[x[0]], result.fetchall()),
                 0
             )
         else:
@@ -2538,53 +3187,11 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
                 # consider every status only once
                 if child.status not in children_statuses:
                     children_statuses.append(child.status)
-                    binary_status += binary_status_codes[child.status.code]
+                    binary_status += BINARY_STATUS_CODES[child.status.code]
 
-        #
-        # I know that the following list seems cryptic but the it shows the
-        # final status index in parent_statuses_lut[] list.
-        #
-        # So by using the cumulative statuses of children we got an index from
-        # the following table, and use the found element (integer) as the index
-        # for the parent_statuses_lut[] list, and we find the desired status
-        #
-        # We are doing it in this way for a couple of reasons:
-        #
-        #   1. We shouldn't hold the statuses in the following list,
-        #   2. Using a dictionary is another alternative, where the keys are
-        #      the cumulative binary status codes, but at the end the result of
-        #      this cumulative thing is a number between 0-511 so no need to
-        #      use a dictionary with integer keys
-        #
-        children_to_parent_statuses_lut = [
-            0, 3, 3, 3, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 1, 2, 1, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 0, 2, 0, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 1, 2, 1, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2,
-            2, 2, 2, 2, 2, 2
-        ]
-
-        status_index = children_to_parent_statuses_lut[binary_status]
-        status = parent_statuses_lut[status_index]
+
+        status_index = CHILDREN_TO_PARENT_STATUSES_LUT[binary_status]
+        status = statuses.get(PARENT_STATUS_CODES[status_index])
 
         logger.debug('binary statuses value : %s' % binary_status)
         logger.debug('setting status to : %s' % status.code)
@@ -2595,9 +3202,6 @@ class Task(Entity, StatusMixin, DateRangeMixin, ReferenceMixin, ScheduleMixin):
         # for dep in self.dependent_of:
         #     dep.update_status_with_dependent_statuses()
 
-        # go to parents
-        self.update_parent_statuses()
-
     def _review_number_getter(self):
         """returns the revision number value
         """
@@ -2836,8 +3440,6 @@ class TaskDependency(Base, ScheduleMixin):
     def to_tjp(self):
         """TaskJuggler representation of this TaskDependency
         """
-        from jinja2 import Template
-
         template_variables = {
             'task': self.task,
             'depends_to': self.depends_to,
@@ -2847,10 +3449,7 @@ class TaskDependency(Base, ScheduleMixin):
             'gap_model': self.gap_model
         }
 
-        temp = Template(
-            defaults.tjp_task_dependency_template,
-            trim_blocks=True
-        )
+        temp = get_template('tjp_task_dependency_template', trim_blocks=True)
         return temp.render(template_variables)
 
 
@@ -2934,33 +3533,31 @@ def update_time_log_task_parents_for_end(tlog, new_end, old_end, initiator):
 
 
 def __update_total_logged_seconds__(tlog, new_duration, old_duration):
-    """Updates the given parent tasks total_logged_seconds attribute with the
-    new duration
-
-    :param tlog: A :class:`.Task` instance which is the parent of the
-    :param new_duration:
-    :param old_duration:
-    :return:
+    """Collects the change of the duration of the given TimeLog to update the
+    total_logged_seconds attribute of the parents of its task, the parents are
+    updated by the :class:`.LoggedSecondsAccumulator` when the session is
+    flushed
+
+    :param tlog: A :class:`.TimeLog` instance
+    :param new_duration: The datetime.timedelta instance showing the new
+      duration
+    :param old_duration: The datetime.timedelta instance showing the old
+      duration
+    :return: None
     """
     if tlog.task:
         logger.debug('TimeLog has a task: %s' % tlog.task)
-        parent = tlog.task.parent
-        if parent:
-            logger.debug('TImeLog.task has a parent: %s' % parent)
-
-            logger.debug('old_duration: %s' % old_duration)
-            logger.debug('new_duration: %s' % new_duration)
+        logger.debug('old_duration: %s' % old_duration)
+        logger.debug('new_duration: %s' % new_duration)
 
-            old_total_seconds = old_duration.days * 86400 + \
-                old_duration.seconds
-            new_total_seconds = new_duration.days * 86400 + \
-                new_duration.seconds
+        old_total_seconds = old_duration.days * 86400 + \
+            old_duration.seconds
+        new_total_seconds = new_duration.days * 86400 + \
+            new_duration.seconds
 
-            parent.total_logged_seconds = \
-                parent.total_logged_seconds - old_total_seconds + \
-                new_total_seconds
-        else:
-            logger.debug("TimeLog.task doesn't have a parent:")
+        LoggedSecondsAccumulator.get_accumulator().add(
+            tlog.task, new_total_seconds - old_total_seconds
+        )
     else:
         logger.debug("TimeLog doesn't have a task yet: %s" % tlog)
 
@@ -3085,3 +3682,234 @@ def removed_a_dependency(task, task_dependent, initiator):
     task.update_status_with_dependent_statuses(
         removing=task_dependent.depends_to
     )
+
+
+# *****************************************************************************
+# Update the TaskDependencyGraph
+# *****************************************************************************
+def update_task_dependency_graph(old_edge, new_edge):
+    """replaces the given old dependency with the new one in the
+    TaskDependencyGraph of the current session, the edges are (task,
+    depends_to) tuples and an edge with a missing task is skipped
+    """
+    if any(task is None for task in old_edge):
+        old_edge = None
+    if any(task is None for task in new_edge):
+        new_edge = None
+    if old_edge and new_edge and old_edge[0] is new_edge[0] \
+            and old_edge[1] is new_edge[1]:
+        return
+    if not old_edge and not new_edge:
+        return
+
+    if new_edge:
+        graph = TaskDependencyGraph.get_graph()
+    else:
+        graph = TaskDependencyGraph.find_graph()
+        if graph is None or not any(task in graph for task in old_edge):
+            return
+
+    # add the tasks to the graph before the change, so the old dependency is
+    # read from the relations while they are still the same
+    for edge in [old_edge, new_edge]:
+        if edge:
+            for task in edge:
+                graph.add(task)
+
+    if old_edge:
+        graph.remove_edge(*old_edge)
+    if new_edge:
+        graph.add_edge(*new_edge)
+
+
+@event.listens_for(TaskDependency.task, 'set', active_history=True)
+def task_of_a_dependency_is_set(task_dependency, task, old_task, initiator):
+    """updates the TaskDependencyGraph when the task of a TaskDependency is
+    changed
+    """
+    if not isinstance(old_task, Task):
+        old_task = None
+    if not isinstance(task, Task):
+        # let the validator of the TaskDependency check the value
+        task = None
+    with DBSession.no_autoflush:
+        depends_to = task_dependency.depends_to
+        update_task_dependency_graph(
+            (old_task, depends_to), (task, depends_to)
+        )
+
+
+@event.listens_for(TaskDependency.depends_to, 'set', active_history=True)
+def depends_to_of_a_dependency_is_set(task_dependency, depends_to,
+                                      old_depends_to, initiator):
+    """updates the TaskDependencyGraph when the depends_to of a
+    TaskDependency is changed
+    """
+    if not isinstance(old_depends_to, Task):
+        old_depends_to = None
+    if not isinstance(depends_to, Task):
+        depends_to = None
+    with DBSession.no_autoflush:
+        task = task_dependency.task
+        update_task_dependency_graph(
+            (task, old_depends_to), (task, depends_to)
+        )
+
+
+@event.listens_for(Session, 'after_flush')
+def update_task_hierarchy_paths(session, flush_context):
+    """updates the hierarchy_path of the new Tasks and the Tasks whose parent
+    is changed and also the hierarchy paths of the descendants of the moved
+    tasks
+    """
+    new_tasks = [instance for instance in session.new
+                 if isinstance(instance, Task)]
+    dirty_tasks = [instance for instance in session.dirty
+                   if isinstance(instance, Task)]
+
+    changed_tasks = list(new_tasks)
+    moved_tasks = []
+    for task in dirty_tasks:
+        if task._hierarchy_path is None:
+            changed_tasks.append(task)
+        elif inspect(task).attrs.parent.history.has_changes():
+            changed_tasks.append(task)
+            moved_tasks.append(task)
+
+    if not changed_tasks:
+        return
+
+    changed_task_ids = set(map(id, changed_tasks))
+    moved_ids = set([task.id for task in moved_tasks])
+    paths = {}
+
+    def calculate_path(task):
+        """returns the new hierarchy path of the given task
+        """
+        if id(task) in paths:
+            return paths[id(task)]
+
+        path = task._hierarchy_path
+        if id(task) in changed_task_ids or path is None or \
+                moved_ids.intersection(map(int, path.split('|')[:-1])):
+            parent = task.parent
+            if parent is None:
+                path = ''
+            else:
+                path = '%s%s|' % (calculate_path(parent), parent.id)
+
+        paths[id(task)] = path
+        return path
+
+    for task in changed_tasks:
+        calculate_path(task)
+
+    connection = session.connection()
+    tasks_table = Task.__table__
+
+    # move the descendants of the moved tasks, the shallow ones are moved
+    # first, so the previous moves are applied to the old paths
+    moves = []
+
+    def apply_moves(path):
+        """applies the previous moves to the given path
+        """
+        for old_prefix, new_prefix in moves:
+            if path.startswith(old_prefix):
+                path = new_prefix + path[len(old_prefix):]
+        return path
+
+    for task in sorted(moved_tasks, key=lambda x: paths[id(x)].count('|')):
+        old_prefix = '%s%s|' % (apply_moves(task._hierarchy_path), task.id)
+        new_prefix = '%s%s|' % (paths[id(task)], task.id)
+        if old_prefix == new_prefix:
+            continue
+        connection.execute(
+            tasks_table.update()
+            .where(tasks_table.c.hierarchy_path.like(old_prefix + '%'))
+            .values(
+                hierarchy_path=literal(new_prefix, String) + func.substr(
+                    tasks_table.c.hierarchy_path, len(old_prefix) + 1,
+                    type_=String
+                )
+            )
+        )
+        moves.append((old_prefix, new_prefix))
+
+    # update the changed tasks, one statement for the siblings
+    task_ids_by_path = {}
+    for task in changed_tasks:
+        path = paths[id(task)]
+        if path != task._hierarchy_path:
+            task_ids_by_path.setdefault(path, []).append(task.id)
+        set_committed_value(task, '_hierarchy_path', path)
+
+    for path, task_ids in task_ids_by_path.items():
+        connection.execute(
+            tasks_table.update()
+            .where(tasks_table.c.id.in_(task_ids))
+            .values(hierarchy_path=path)
+        )
+
+    # update the loaded descendants of the moved tasks
+    if moves:
+        for instance in session.identity_map.values():
+            if isinstance(instance, Task) and \
+                    id(instance) not in changed_task_ids:
+                path = instance.__dict__.get('_hierarchy_path')
+                if path:
+                    set_committed_value(
+                        instance, '_hierarchy_path', apply_moves(path)
+                    )
+
+
+# *****************************************************************************
+# Update the Task.child_count
+# *****************************************************************************
+@event.listens_for(Session, 'before_flush')
+def update_task_child_counts(session, flush_context, instances):
+    """Updates the child_count of the new and changed tasks whose children are
+    loaded and of the parents of the deleted tasks
+    """
+    deleted = session.deleted
+    tasks = [instance for instance in list(session.new) + list(session.dirty)
+             if isinstance(instance, Task)]
+    with session.no_autoflush:
+        for instance in deleted:
+            if isinstance(instance, Task) and instance.parent is not None \
+                    and instance.parent not in deleted:
+                # also load the children of the parent
+                instance.parent.children
+                tasks.append(instance.parent)
+
+        for task in tasks:
+            if 'children' in task.__dict__:
+                child_count = len([child for child in task.children
+                                   if child not in deleted])
+                if task._child_count != child_count:
+                    task._child_count = child_count
+
+
+# *****************************************************************************
+# Apply the accumulated logged seconds
+# *****************************************************************************
+@event.listens_for(Session, 'before_flush')
+def apply_logged_seconds_before_flush(session, flush_context, instances):
+    """updates the total_logged_seconds of the parent tasks with the changes
+    collected by the LoggedSecondsAccumulator of the session before the
+    session is flushed
+    """
+    accumulator = LoggedSecondsAccumulator._accumulators.get(session)
+    if accumulator is not None and accumulator.has_pending:
+        accumulator.apply()
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def clear_logged_seconds_on_transaction_end(session, transaction):
+    """discards the changes collected by the LoggedSecondsAccumulator of the
+    session when the transaction ends
+    """
+    if transaction.parent is None:
+        accumulator = LoggedSecondsAccumulator._accumulators.get(session)
+        if accumulator is not None:
+            accumulator.clear()
@@ -27,7 +27,7 @@ from sqlalchemy.exc import UnboundExecutionError
 from sqlalchemy.orm import relationship, validates
 
 from stalker.db.declarative import Base
-from stalker.models import check_circular_dependency
+from stalker.models import DependencyGraph
 from stalker.models.link import Link
 
 from stalker import defaults
@@ -39,6 +39,30 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging_level)
 
 
+class VersionGraph(DependencyGraph):
+    """The :class:`.DependencyGraph` of the version hierarchy, a version is
+    related to the versions in its :attr:`.Version.children` attribute.
+
+    :meth:`.Version._validate_parent` updates the graph of the current session
+    and the graph rejects the parents that create a cycle.
+    """
+
+    attr_name = 'children'
+
+    def successors(self, version):
+        """returns the children of the given version
+        """
+        with self.session.no_autoflush:
+            return list(version.children)
+
+    def predecessors(self, version):
+        """returns the parent of the given version as a list
+        """
+        with self.session.no_autoflush:
+            parent = version.parent
+        return [parent] if parent is not None else []
+
+
 class Version(Link):
     """Holds information about the created versions (files) for a class:`.Task`
 
@@ -369,8 +393,18 @@ class Version(Link):
                     (self.__class__.__name__, parent.__class__.__name__)
                 )
 
-        # check for CircularDependency
-        check_circular_dependency(self, parent, 'children')
+        # check for CircularDependency and update the version graph
+        if parent is not None:
+            graph = VersionGraph.get_graph()
+        else:
+            graph = VersionGraph.find_graph()
+
+        if graph is not None:
+            old_parent = self.parent
+            if parent is not None:
+                graph.add_edge(parent, self)
+            if old_parent is not None and old_parent is not parent:
+                graph.remove_edge(old_parent, self)
 
         return parent
 
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2014 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation;
+# version 2.1 of the License.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+"""Benchmarks for Stalker.
+
+The modules in this package are not collected by the test runner, run them
+directly, for example::
+
+  python -m tests.benchmarks.bench_parse_csv 5000
+
+Each module has a ``main()`` function which prints the timings to stdout.
+"""
+
+import datetime
+import time
+
+from stalker.db.session import DBSession
+
+
+def setup_db():
+    """sets up an in memory sqlite database with the default values
+    """
+    from stalker import db
+    db.setup({
+        'sqlalchemy.url': 'sqlite:///:memory:',
+        'sqlalchemy.echo': False
+    })
+    db.init()
+
+
+def create_project(name, task_count, users, children_per_parent=10):
+    """creates a project with the given number of tasks which are grouped
+    under container tasks and assigned to the given users in a round robin
+    fashion.
+
+    :param str name: The name of the project
+    :param int task_count: The number of leaf tasks
+    :param users: A list of :class:`.User` instances
+    :param int children_per_parent: The number of leaf tasks per container
+    :return: The created :class:`.Project` instance
+    """
+    from stalker import Project, Repository, StatusList, Status, Task
+
+    repo = Repository.query.first()
+    if repo is None:
+        repo = Repository(name='Benchmark Repository')
+
+    project_status_list = StatusList.query\
+        .filter_by(target_entity_type='Project').first()
+    if project_status_list is None:
+        project_status_list = StatusList(
+            name='Project Statuses',
+            statuses=[Status(name='Project Status', code='PS')],
+            target_entity_type='Project'
+        )
+
+    project = Project(
+        name=name,
+        code=name,
+        repository=repo,
+        status_list=project_status_list
+    )
+    DBSession.add(project)
+
+    parent = None
+    for i in range(task_count):
+        if i % children_per_parent == 0:
+            parent = Task(
+                name='%s Container %s' % (name, i // children_per_parent),
+                project=project
+            )
+            DBSession.add(parent)
+        task = Task(
+            name='%s Task %s' % (name, i),
+            parent=parent,
+            resources=[users[i % len(users)]],
+            schedule_timing=10,
+            schedule_unit='h'
+        )
+        DBSession.add(task)
+    DBSession.commit()
+    return project
+
+
+def create_users(count):
+    """creates the given number of users
+
+    :param int count: The number of users
+    :return: A list of :class:`.User` instances
+    """
+    from stalker import User
+    users = []
+    for i in range(count):
+        user = User(
+            name='Bench User %s' % i,
+            login='bench_user_%s' % i,
+            email='bench_user_%s@users.com' % i,
+            password='1234'
+        )
+        DBSession.add(user)
+        users.append(user)
+    DBSession.commit()
+    return users
+
+
+def timeit(func, *args, **kwargs):
+    """calls the given function with the given args and returns the elapsed
+    time in seconds along with the returned value
+    """
+    start = time.time()
+    result = func(*args, **kwargs)
+    end = time.time()
+    return end - start, result
+
+
+def report(title, timings):
+    """prints the given timings
+
+    :param str title: The title of the report
+    :param timings: A list of (name, seconds) tuples, the first one is used as
+      the reference timing
+    """
+    print('%s' % title)
+    print('-' * len(title))
+    reference = timings[0][1]
+    for name, seconds in timings:
+        ratio = reference / seconds if seconds else 0
+        print('%-30s: %10.4f s (x%.2f)' % (name, seconds, ratio))
+    print('')
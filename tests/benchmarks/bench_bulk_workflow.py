@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2014 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation;
+# version 2.1 of the License.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+"""Measures stopping and resuming all the tasks of a project by calling
+``Task.stop()`` and ``Task.resume()`` in a loop and by calling
+``Task.bulk_stop()`` and ``Task.bulk_resume()``.
+
+Each leaf task depends to the previous leaf task under the same container, so
+both the parent and the dependency propagation are measured. The looped and
+the bulk versions run on two identical projects and the resulting statuses
+are compared.
+"""
+
+import sys
+
+from stalker.db.session import DBSession
+from tests.benchmarks import (setup_db, create_users, create_project, timeit,
+                              report)
+
+
+def prepare_tasks(project):
+    """chains the leaf tasks of the given project under the same container
+    and sets them to WIP, returns the leaf tasks
+    """
+    from stalker import Status, Task
+    wip = Status.query.filter_by(code='WIP').first()
+    leaf_tasks = []
+    for container in Task.query.filter_by(project=project, parent=None):
+        previous = None
+        for task in container.children:
+            if previous is not None:
+                task.depends = [previous]
+            previous = task
+            leaf_tasks.append(task)
+    DBSession.flush()
+    for task in leaf_tasks:
+        task.status = wip
+    DBSession.commit()
+    return leaf_tasks
+
+
+def loop(tasks, action):
+    """calls the given action for each of the given tasks and commits
+    """
+    for task in tasks:
+        action(task)
+    DBSession.commit()
+
+
+def bulk(tasks, action):
+    """calls the given bulk action with all of the given tasks and commits
+    """
+    action(tasks)
+    DBSession.commit()
+
+
+def status_codes(project):
+    """returns the status codes of the tasks of the given project in order
+    """
+    from stalker import Task
+    return [
+        task.status.code
+        for task in Task.query.filter_by(project=project).order_by(Task.id)
+    ]
+
+
+def main(task_count=1000):
+    """runs the benchmark
+    """
+    from stalker import Task
+
+    setup_db()
+    users = create_users(20)
+    looped_project = create_project('LOOP', task_count, users)
+    bulk_project = create_project('BULK', task_count, users)
+
+    looped_tasks = prepare_tasks(looped_project)
+    bulk_tasks = prepare_tasks(bulk_project)
+
+    report('Stop %s tasks' % task_count, [
+        ('loop of Task.stop()', timeit(loop, looped_tasks, Task.stop)[0]),
+        ('Task.bulk_stop()', timeit(bulk, bulk_tasks, Task.bulk_stop)[0]),
+    ])
+    assert status_codes(looped_project) == status_codes(bulk_project)
+
+    report('Resume %s tasks' % task_count, [
+        ('loop of Task.resume()',
+         timeit(loop, looped_tasks, Task.resume)[0]),
+        ('Task.bulk_resume()',
+         timeit(bulk, bulk_tasks, Task.bulk_resume)[0]),
+    ])
+    assert status_codes(looped_project) == status_codes(bulk_project)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
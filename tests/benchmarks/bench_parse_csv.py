@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2014 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation;
+# version 2.1 of the License.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+"""Compares the per row and the bulk result application paths of
+:meth:`.TaskJugglerScheduler._parse_csv_file`.
+
+It doesn't need TaskJuggler, a csv file similar to the one TaskJuggler
+generates is created for the generated tasks.
+"""
+
+import datetime
+import sys
+
+from stalker.db.session import DBSession
+from tests.benchmarks import (setup_db, create_users, create_project, timeit,
+                              report)
+
+
+def create_csv_file(scheduler, project, users):
+    """creates a TaskJuggler like csv file for all the tasks of the given
+    project
+    """
+    scheduler._create_tjp_file()
+    start = datetime.datetime(2013, 4, 16, 9, 0)
+    with open(scheduler.csv_file_full_path, 'w') as f:
+        f.write('"Id";"Start";"End";"Resources"\n')
+        f.write(
+            '"%s";"%s";"%s";""\n' % (
+                project.tjp_id,
+                start.strftime('%Y-%m-%d-%H:%M'),
+                (start + datetime.timedelta(days=365))
+                .strftime('%Y-%m-%d-%H:%M')
+            )
+        )
+        for i, task in enumerate(project.tasks):
+            task_start = start + datetime.timedelta(hours=i)
+            task_end = task_start + datetime.timedelta(hours=10)
+            resources = ', '.join(
+                ['%s (%s)' % (u.name, u.tjp_id) for u in task.resources]
+            )
+            f.write(
+                '"%s";"%s";"%s";"%s"\n' % (
+                    task.tjp_abs_id,
+                    task_start.strftime('%Y-%m-%d-%H:%M'),
+                    task_end.strftime('%Y-%m-%d-%H:%M'),
+                    resources
+                )
+            )
+
+
+def main(task_count=1000):
+    """runs the benchmark
+    """
+    from stalker import TaskJugglerScheduler
+
+    setup_db()
+    users = create_users(20)
+    project = create_project('BENCH', task_count, users)
+
+    scheduler = TaskJugglerScheduler()
+    create_csv_file(scheduler, project, users)
+
+    timings = []
+    for name, bulk_apply in [('per row', False), ('bulk', True)]:
+        scheduler.bulk_apply = bulk_apply
+        elapsed, _ = timeit(scheduler._parse_csv_file)
+        commit_elapsed, _ = timeit(DBSession.commit)
+        timings.append((name, elapsed + commit_elapsed))
+
+    scheduler._clean_up()
+    report(
+        'TaskJugglerScheduler._parse_csv_file (%s tasks)' % task_count,
+        timings
+    )
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
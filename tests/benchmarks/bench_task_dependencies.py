@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2014 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation;
+# version 2.1 of the License.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+"""Measures the circular dependency checks of creating a chain of
+dependencies between the leaf tasks of a project, where every task depends to
+the previous one.
+
+The circular dependency check of every new dependency used to walk all the
+dependencies of the task that it depends to, which is the whole chain. The
+walks are measured by running :func:`.check_circular_dependency` before
+creating every dependency of one project, and compared with adding the
+dependencies of another project to the :class:`.TaskDependencyGraph`, which
+is rebuilt from the database first. Only the checks are timed.
+"""
+
+import sys
+
+from stalker.db.session import DBSession
+from tests.benchmarks import (setup_db, create_users, create_project, timeit,
+                              report)
+
+
+def get_leaf_tasks(project):
+    """returns the leaf tasks of the given project ordered by their ids
+    """
+    from stalker import Task
+    return Task.query\
+        .filter(Task.project == project)\
+        .filter(Task.parent != None)\
+        .order_by(Task.id)\
+        .all()
+
+
+def walk_dependencies(tasks):
+    """runs the circular dependency checks of a chain of dependencies by
+    walking the dependencies and creates the chain
+    """
+    from stalker.models import check_circular_dependency
+    elapsed = 0
+    with DBSession.no_autoflush:
+        for previous_task, task in zip(tasks, tasks[1:]):
+            elapsed += timeit(
+                check_circular_dependency, previous_task, task, 'depends'
+            )[0]
+            task.depends.append(previous_task)
+    DBSession.commit()
+    return elapsed
+
+
+def create_dependencies(project, tasks):
+    """runs the circular dependency checks of a chain of dependencies with the
+    TaskDependencyGraph and creates the chain
+    """
+    from stalker.models.task import TaskDependencyGraph
+    graph = TaskDependencyGraph.get_graph()
+    elapsed, _ = timeit(graph.rebuild, project)
+    with DBSession.no_autoflush:
+        for previous_task, task in zip(tasks, tasks[1:]):
+            # the dependency is already in the graph when it is appended
+            elapsed += timeit(graph.add_edge, task, previous_task)[0]
+            task.depends.append(previous_task)
+    DBSession.commit()
+    return elapsed
+
+
+def main(task_count=500):
+    """runs the benchmark
+    """
+    setup_db()
+    users = create_users(20)
+    walked_project = create_project('WALK', task_count, users)
+    graph_project = create_project('GRPH', task_count, users)
+
+    walked_tasks = get_leaf_tasks(walked_project)
+    graph_tasks = get_leaf_tasks(graph_project)
+
+    walk_time = walk_dependencies(walked_tasks)
+    graph_time = create_dependencies(graph_project, graph_tasks)
+    report('Create a chain of %s dependencies' % (task_count - 1), [
+        ('walking the dependencies', walk_time),
+        ('dependency graph', graph_time),
+    ])
+
+    assert [[t.name for t in task.depends] for task in walked_tasks] == \
+        [[t.name.replace('GRPH', 'WALK') for t in task.depends]
+         for task in graph_tasks]
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2014 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation;
+# version 2.1 of the License.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+"""Measures walking the parents and the children of the tasks of a deep
+asset/shot hierarchy by following the ``parent`` and ``children`` attributes
+one row at a time and by using the ``Task.hierarchy_path`` (see
+``Task.parents`` and ``Task.walk_hierarchy()``). Also measures checking if
+the tasks are leaf tasks by loading their children and by using the
+``Task.is_leaf`` attribute, which reads the ``Tasks.child_count`` column.
+
+The session is expired before each measurement, so every walk starts with
+cold instances. The number of executed statements are also printed, they
+are the round trips to the database server on a real setup.
+"""
+
+import sys
+
+from stalker.db.session import DBSession
+from tests.benchmarks import (setup_db, create_users, create_project, timeit,
+                              report)
+
+
+def create_hierarchy(project, count):
+    """creates an asset and a shot hierarchy with the given number of assets
+    and shots under the given project, returns the root tasks
+    """
+    from stalker import Asset, Shot, Task, Type
+
+    def task(name, parent):
+        return Task(name=name, parent=parent, schedule_timing=1,
+                    schedule_unit='h')
+
+    char_type = Type(name='Character', code='Char', target_entity_type='Asset')
+    assets = Task(name='Assets', project=project)
+    characters = task('Characters', assets)
+    shots = Task(name='Shots', project=project)
+    for i in range(count):
+        asset = Asset(name='Char %s' % i, code='Char%s' % i, type=char_type,
+                      project=project, parent=characters)
+        for department in ['Model', 'Rig', 'LookDev']:
+            parent = task(department, asset)
+            task('Body', parent)
+            task('Head', parent)
+
+        episode = task('Ep%s' % (i // 10), shots) if i % 10 == 0 else episode
+        sequence = task('Seq%s' % (i // 5), episode) if i % 5 == 0 \
+            else sequence
+        shot = Shot(code='SH%04i' % i, project=project, parent=sequence)
+        for department in ['Anim', 'Lighting', 'Comp']:
+            parent = task(department, shot)
+            task('Main', parent)
+            task('Fix', parent)
+
+    DBSession.add_all([assets, shots])
+    DBSession.commit()
+    return [assets, shots]
+
+
+def walk_parents(tasks):
+    """walks the parents of the given tasks over the parent attribute
+    """
+    for task in tasks:
+        parent = task.parent
+        while parent:
+            parent = parent.parent
+
+
+def get_parents(tasks):
+    """gets the parents of the given tasks with the parents attribute
+    """
+    for task in tasks:
+        task.parents
+
+
+def walk_children(root_tasks):
+    """walks the given task hierarchies over the children attribute
+    """
+    from stalker.models import walk_hierarchy
+    for root_task in root_tasks:
+        for task in walk_hierarchy(root_task, 'children'):
+            pass
+
+
+def walk_hierarchy(root_tasks):
+    """walks the given task hierarchies with Task.walk_hierarchy()
+    """
+    for root_task in root_tasks:
+        for task in root_task.walk_hierarchy():
+            pass
+
+
+def count_children(tasks):
+    """checks if the given tasks are leaf tasks by loading their children
+    """
+    for task in tasks:
+        len(task.children) == 0
+
+
+def check_is_leaf(tasks):
+    """checks if the given tasks are leaf tasks with Task.is_leaf
+    """
+    for task in tasks:
+        task.is_leaf
+
+
+def cold(func, tasks):
+    """expires the session, loads the given tasks and calls the given
+    function with them, returns the elapsed time and the number of executed
+    statements
+    """
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from stalker import Task
+
+    task_ids = [task.id for task in tasks]
+    DBSession.expire_all()
+    tasks = Task.query.filter(Task.id.in_(task_ids)).all()
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context,
+                        executemany):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', count_statement)
+    try:
+        seconds = timeit(func, tasks)[0]
+    finally:
+        event.remove(Engine, 'before_cursor_execute', count_statement)
+    return seconds, len(statements)
+
+
+def report_with_statements(title, measurements):
+    """reports the given timings and prints the number of statements
+    """
+    report(title, [(name, seconds)
+                   for name, (seconds, count) in measurements])
+    for name, (seconds, count) in measurements:
+        print('%-30s: %10s statements' % (name, count))
+    print('')
+
+
+def main(count=100):
+    """runs the benchmark
+    """
+    from stalker import Task
+
+    setup_db()
+    users = create_users(1)
+    project = create_project('BENCH', 0, users)
+    root_tasks = create_hierarchy(project, count)
+    leaf_tasks = [task for task in Task.query.all() if task.is_leaf]
+
+    report_with_statements('Parents of %s leaf tasks' % len(leaf_tasks), [
+        ('parent by parent', cold(walk_parents, leaf_tasks)),
+        ('Task.parents', cold(get_parents, leaf_tasks)),
+    ])
+
+    report_with_statements(
+        'Walking the hierarchy of %s tasks' % Task.query.count(), [
+            ('child by child', cold(walk_children, root_tasks)),
+            ('Task.walk_hierarchy()', cold(walk_hierarchy, root_tasks)),
+        ]
+    )
+
+    all_tasks = Task.query.all()
+    report_with_statements(
+        'Checking if %s tasks are leaf tasks' % len(all_tasks), [
+            ('loading the children', cold(count_children, all_tasks)),
+            ('Task.is_leaf', cold(check_is_leaf, all_tasks)),
+        ]
+    )
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2014 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation;
+# version 2.1 of the License.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+"""Measures creating one time log for every leaf task of a project by
+flushing the session after every time log and by flushing once at the end.
+
+The containers of the project are grouped under a root task, so every time
+log changes the total_logged_seconds of three parents. Besides the timings
+the number of updates of the cached total_logged_seconds values of the
+parents are reported. The two versions run on two identical projects and
+the resulting values are compared.
+"""
+
+import datetime
+import sys
+
+from sqlalchemy import event
+
+from stalker.db.session import DBSession
+from tests.benchmarks import (setup_db, create_users, create_project, timeit,
+                              report)
+
+
+def prepare_tasks(project, groups=10):
+    """groups the containers of the given project under a root task,
+    calculates the total_logged_seconds of the parents and returns the leaf
+    tasks
+    """
+    from stalker import Task
+    containers = Task.query.filter_by(project=project, parent=None).all()
+    root = Task(name='%s Root' % project.name, project=project)
+    for i, container in enumerate(containers):
+        if i % (len(containers) // groups or 1) == 0:
+            group = Task(name='%s Group %s' % (project.name, i), parent=root)
+        container.parent = group
+    DBSession.commit()
+
+    root.total_logged_seconds
+    leaf_tasks = []
+    for container in containers:
+        container.parent.total_logged_seconds
+        container.total_logged_seconds
+        leaf_tasks.extend(container.children)
+    return root, leaf_tasks
+
+
+def create_time_logs(tasks, flush_every_time_log):
+    """creates one time log for each of the given tasks and commits
+    """
+    from stalker import TimeLog
+    start = datetime.datetime(2014, 1, 1, 0, 0)
+    with DBSession.no_autoflush:
+        for i, task in enumerate(tasks):
+            # the task ids are unique, so the time logs are not overlapping
+            TimeLog(
+                task=task,
+                resource=task.resources[0],
+                start=start + datetime.timedelta(hours=3 * task.id),
+                duration=datetime.timedelta(hours=1 + i % 3)
+            )
+            if flush_every_time_log:
+                DBSession.flush()
+    DBSession.commit()
+
+
+def count_updates(tasks, flush_every_time_log):
+    """creates the time logs and returns the number of the updates of the
+    cached total_logged_seconds values
+    """
+    from stalker import Task
+    updates = []
+
+    def count(task, value, old_value, initiator):
+        updates.append(task)
+
+    event.listen(Task._total_logged_seconds, 'set', count)
+    try:
+        create_time_logs(tasks, flush_every_time_log)
+    finally:
+        event.remove(Task._total_logged_seconds, 'set', count)
+    return len(updates)
+
+
+def main(task_count=1000):
+    """runs the benchmark
+    """
+    setup_db()
+    users = create_users(20)
+    flushed_project = create_project('FLSH', task_count, users)
+    bulk_project = create_project('BULK', task_count, users)
+
+    flushed_root, flushed_tasks = prepare_tasks(flushed_project)
+    bulk_root, bulk_tasks = prepare_tasks(bulk_project)
+
+    flushed_time, flushed_updates = \
+        timeit(count_updates, flushed_tasks, True)
+    bulk_time, bulk_updates = timeit(count_updates, bulk_tasks, False)
+    report('Create the time logs of %s tasks' % task_count, [
+        ('flush every time log', flushed_time),
+        ('flush once', bulk_time),
+    ])
+    print('parent updates: %s vs %s' % (flushed_updates, bulk_updates))
+    print('')
+
+    assert flushed_root.total_logged_seconds == \
+        bulk_root.total_logged_seconds
+    assert [task.total_logged_seconds for task in flushed_tasks] == \
+        [task.total_logged_seconds for task in bulk_tasks]
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2014 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation;
+# version 2.1 of the License.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+"""Measures the tjp export time with and without the compiled template
+registry (see :func:`stalker.models.get_template`).
+
+The "before" timing compiles the task template for every task as the
+``to_tjp`` properties were doing before the registry was introduced.
+
+The export is also measured with and without compacting the hourly time logs
+of the tasks in to bookings (see ``TaskJugglerScheduler.compact_bookings``)
+and the resulting tjp file sizes are printed.
+
+Finally one of the projects is exported alone with the frozen load of the
+other projects (see ``Studio.schedule(projects=[...])``) and compared with
+exporting all the projects.
+"""
+
+import datetime
+import os
+import sys
+
+from jinja2 import Template
+
+from stalker import defaults
+from stalker.db.session import DBSession
+from tests.benchmarks import (setup_db, create_users, create_project, timeit,
+                              report)
+
+
+def render_compiling_every_time(tasks):
+    """renders the given tasks by compiling the template for each of them
+    """
+    for task in tasks:
+        Template(defaults.tjp_task_template, trim_blocks=True)\
+            .render({'task': task})
+
+
+def render_with_registry(tasks):
+    """renders the given tasks by using the compiled template registry
+    """
+    for task in tasks:
+        task.to_tjp
+
+
+def export_studio(scheduler):
+    """streams the whole studio to a tjp file
+    """
+    scheduler._create_tjp_file()
+    scheduler._write_tjp_file()
+    scheduler._clean_up()
+
+
+def create_hourly_time_logs(tasks, hours):
+    """creates the given number of consecutive hourly time logs for the first
+    resource of each of the given tasks
+    """
+    from stalker import TimeLog
+    start = datetime.datetime(2013, 4, 1, 9, 0)
+    for task in tasks:
+        for i in range(hours):
+            DBSession.add(
+                TimeLog(
+                    task=task,
+                    resource=task.resources[0],
+                    start=start + datetime.timedelta(hours=i),
+                    end=start + datetime.timedelta(hours=i + 1)
+                )
+            )
+    DBSession.commit()
+
+
+def export_size(scheduler):
+    """streams the whole studio to a tjp file and returns the file size
+    """
+    scheduler._create_tjp_file()
+    scheduler._write_tjp_file()
+    size = os.path.getsize(scheduler.tjp_file_full_path)
+    scheduler._clean_up()
+    return size
+
+
+def export_scoped(scheduler, projects):
+    """streams the given projects to a tjp file with the frozen load of the
+    other active projects
+    """
+    scheduler.projects = projects
+    scheduler._frozen_load = scheduler._get_frozen_load()
+    try:
+        export_studio(scheduler)
+    finally:
+        scheduler.projects = None
+        scheduler._frozen_load = []
+
+
+def main(task_count=1000, time_log_hours=8, project_count=5):
+    """runs the benchmark
+    """
+    from stalker import (Studio, Project, Task, TaskJugglerScheduler,
+                         TJPFragmentCache)
+    from stalker.models import clear_template_cache
+
+    setup_db()
+    users = create_users(20)
+    create_project('BENCH', task_count, users)
+
+    leaf_tasks = [t for t in Task.query.all() if t.is_leaf]
+
+    # warm up the ORM
+    render_with_registry(leaf_tasks)
+
+    timings = [
+        ('before (compile every time)',
+         timeit(render_compiling_every_time, leaf_tasks)[0]),
+        ('after (compiled registry)',
+         timeit(render_with_registry, leaf_tasks)[0]),
+    ]
+    report('Task.to_tjp for %s leaf tasks' % len(leaf_tasks), timings)
+
+    scheduler = TaskJugglerScheduler(studio=Studio(name='Bench Studio'))
+    clear_template_cache()
+    timings = [
+        ('cold registry', timeit(export_studio, scheduler)[0]),
+        ('warm registry', timeit(export_studio, scheduler)[0]),
+    ]
+    report('Whole studio export (%s tasks)' % task_count, timings)
+
+    scheduler.fragment_cache = TJPFragmentCache()
+    timings = [
+        ('cold fragment cache', timeit(export_studio, scheduler)[0]),
+        ('warm fragment cache', timeit(export_studio, scheduler)[0]),
+    ]
+    report('Whole studio export with TJPFragmentCache', timings)
+
+    # the time logs are created for the tasks of different users, so they
+    # are not overlapping
+    users_count = len(users)
+    create_hourly_time_logs(leaf_tasks[:users_count], time_log_hours)
+    scheduler.fragment_cache = None
+    scheduler.compact_bookings = False
+    export_size(scheduler)  # warm up the ORM
+    seconds, size = timeit(export_size, scheduler)
+    scheduler.compact_bookings = True
+    compact_seconds, compact_size = timeit(export_size, scheduler)
+    report(
+        'Whole studio export with %s hourly time logs' %
+        (users_count * time_log_hours),
+        [('one booking per time log', seconds),
+         ('compacted bookings', compact_seconds)]
+    )
+    print('tjp file size: %s bytes -> %s bytes (%.1f%% smaller)' % (
+        size, compact_size, 100.0 * (size - compact_size) / size
+    ))
+    print('')
+
+    # schedule a couple of projects sharing the same users
+    projects = [Project.query.filter_by(code='BENCH').first()]
+    for i in range(1, project_count):
+        projects.append(create_project('BENCH%s' % i, task_count, users))
+    for task in Task.query.all():
+        if task.is_leaf:
+            task.computed_start = datetime.datetime(2013, 4, 1, 9, 0)
+            task.computed_end = datetime.datetime(2013, 4, 2, 9, 0)
+    DBSession.commit()
+
+    scheduler.compact_bookings = False
+    export_studio(scheduler)  # warm up the ORM
+    timings = [
+        ('all the projects', timeit(export_studio, scheduler)[0]),
+        ('one project, frozen load',
+         timeit(export_scoped, scheduler, projects[-1:])[0]),
+    ]
+    report('Export of %s projects' % project_count, timings)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
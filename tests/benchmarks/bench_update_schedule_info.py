@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2014 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation;
+# version 2.1 of the License.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+"""Measures updating the cached schedule_seconds and total_logged_seconds
+values of all the tasks of a project by calling
+``Task.update_schedule_info()`` for each root task and by calling
+``Project.update_schedule_info()``.
+
+Every leaf task has a time log and the cached values are cleared before the
+measurement, so all of the tasks need to be updated.
+"""
+
+import datetime
+import sys
+
+from stalker.db.session import DBSession
+from tests.benchmarks import (setup_db, create_users, create_project, timeit,
+                              report)
+
+
+def create_time_logs(project):
+    """creates one time log for every leaf task of the given project
+    """
+    from stalker import Task, TimeLog
+    start = datetime.datetime(2014, 1, 1, 0, 0)
+    tasks = Task.query.filter_by(project=project).order_by(Task.id).all()
+    for i, task in enumerate(tasks):
+        if task.is_leaf:
+            # the task ids are unique, so the time logs are not overlapping
+            TimeLog(
+                task=task,
+                resource=task.resources[0],
+                start=start + datetime.timedelta(hours=3 * task.id),
+                duration=datetime.timedelta(hours=1 + i % 3)
+            )
+    DBSession.commit()
+
+
+def clear_schedule_info(project):
+    """clears the cached schedule info of the tasks of the given project
+    """
+    from stalker import Task
+    DBSession.connection().execute(
+        Task.__table__.update()
+        .where(Task.__table__.c.project_id == project.id)
+        .values(schedule_seconds=None, total_logged_seconds=None)
+    )
+    DBSession.commit()
+
+
+def update_task_by_task(project):
+    """updates the schedule info root task by root task
+    """
+    for task in project.root_tasks:
+        task.update_schedule_info()
+    DBSession.commit()
+
+
+def update_project(project):
+    """updates the schedule info of the whole project at once
+    """
+    project.update_schedule_info()
+    DBSession.commit()
+
+
+def schedule_info(project):
+    """returns the cached schedule info of the tasks of the given project in
+    order
+    """
+    from stalker import Task
+    return [
+        (task._schedule_seconds, task._total_logged_seconds)
+        for task in Task.query.filter_by(project=project).order_by(Task.id)
+    ]
+
+
+def main(task_count=1000):
+    """runs the benchmark
+    """
+    setup_db()
+    users = create_users(20)
+    looped_project = create_project('LOOP', task_count, users)
+    bulk_project = create_project('BULK', task_count, users)
+
+    for project in [looped_project, bulk_project]:
+        create_time_logs(project)
+        clear_schedule_info(project)
+
+    report('Update the schedule info of %s tasks' % task_count, [
+        ('task by task',
+         timeit(update_task_by_task, looped_project)[0]),
+        ('Project.update_schedule_info()',
+         timeit(update_project, bulk_project)[0]),
+    ])
+    assert schedule_info(looped_project) == schedule_info(bulk_project)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2014 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation;
+# version 2.1 of the License.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+"""Measures updating the statuses of all the tasks of a project by calling
+``Task.update_status_with_dependent_statuses()`` and
+``Task.update_status_with_children_statuses()`` for each task and by calling
+``Project.update_task_statuses()``.
+
+The leaf tasks under the same container are chained with dependencies and
+their statuses are set to WFD, so all of them need to be updated.
+"""
+
+import sys
+
+from stalker.db.session import DBSession
+from tests.benchmarks import (setup_db, create_users, create_project, timeit,
+                              report)
+
+
+def prepare_tasks(project):
+    """chains the leaf tasks of the given project under the same container,
+    sets all of the tasks to WFD and returns the containers
+    """
+    from stalker import Status, Task
+    wfd = Status.query.filter_by(code='WFD').first()
+    containers = Task.query.filter_by(project=project, parent=None).all()
+    for container in containers:
+        previous = None
+        for task in container.children:
+            if previous is not None:
+                task.depends = [previous]
+            previous = task
+    DBSession.flush()
+    for task in Task.query.filter_by(project=project):
+        task.status = wfd
+    DBSession.commit()
+    return containers
+
+
+def update_task_by_task(containers):
+    """updates the statuses task by task
+    """
+    for container in containers:
+        for task in container.children:
+            task.update_status_with_dependent_statuses()
+        container.update_status_with_children_statuses()
+    DBSession.commit()
+
+
+def update_project(project):
+    """updates the statuses of the whole project at once
+    """
+    project.update_task_statuses()
+    DBSession.commit()
+
+
+def status_codes(project):
+    """returns the status codes of the tasks of the given project in order
+    """
+    from stalker import Task
+    return [
+        task.status.code
+        for task in Task.query.filter_by(project=project).order_by(Task.id)
+    ]
+
+
+def main(task_count=1000):
+    """runs the benchmark
+    """
+    setup_db()
+    users = create_users(20)
+    looped_project = create_project('LOOP', task_count, users)
+    bulk_project = create_project('BULK', task_count, users)
+
+    looped_containers = prepare_tasks(looped_project)
+    prepare_tasks(bulk_project)
+
+    report('Update the statuses of %s tasks' % task_count, [
+        ('task by task',
+         timeit(update_task_by_task, looped_containers)[0]),
+        ('Project.update_task_statuses()',
+         timeit(update_project, bulk_project)[0]),
+    ])
+    assert status_codes(looped_project) == status_codes(bulk_project)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
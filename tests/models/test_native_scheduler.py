@@ -0,0 +1,629 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2014 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation;
+# version 2.1 of the License.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+import datetime
+import unittest2
+
+from stalker import (db, User, Repository, StatusList, Status, Project, Task,
+                     Studio, TimeLog, Vacation, NativeScheduler,
+                     ScheduleStats, ScheduleResult)
+from stalker.db.session import DBSession
+from stalker.models.task import TaskDependency, CONSTRAIN_END
+
+
+class NativeSchedulerTester(unittest2.TestCase):
+    """tests the stalker.models.scheduler.NativeScheduler class
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        db.setup({
+            'sqlalchemy.url': 'sqlite:///:memory:',
+            'sqlalchemy.echo': False
+        })
+        db.init()
+
+        self.test_users = []
+        for i in range(1, 6):
+            user = User(
+                login='user%s' % i,
+                name='User%s' % i,
+                email='user%s@users.com' % i,
+                password='1234'
+            )
+            DBSession.add(user)
+            self.test_users.append(user)
+        self.test_user1, self.test_user2, self.test_user3, \
+            self.test_user4, self.test_user5 = self.test_users
+
+        self.test_repo = Repository(name='Test Repository')
+        DBSession.add(self.test_repo)
+
+        test_status1 = Status(name='Status 1', code='STS1')
+        test_proj_status_list = StatusList(
+            name='Project Status List',
+            statuses=[test_status1],
+            target_entity_type='Project'
+        )
+        DBSession.add(test_proj_status_list)
+
+        self.test_proj1 = Project(
+            name='Test Project 1',
+            code='TP1',
+            repository=self.test_repo,
+            status_list=test_proj_status_list
+        )
+        DBSession.add(self.test_proj1)
+        DBSession.commit()
+
+        # 2013-04-16 is a Tuesday
+        self.test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 0, 0)
+        )
+        self.test_studio.daily_working_hours = 9
+        DBSession.add(self.test_studio)
+        DBSession.commit()
+
+    def tearDown(self):
+        """clean up the test
+        """
+        DBSession.remove()
+
+    def create_task(self, name, resources, schedule_timing, schedule_unit='h',
+                    **kwargs):
+        """creates a task in the test project
+        """
+        kwargs.setdefault('project', self.test_proj1)
+        task = Task(
+            name=name,
+            resources=resources,
+            schedule_timing=schedule_timing,
+            schedule_unit=schedule_unit,
+            **kwargs
+        )
+        DBSession.add(task)
+        DBSession.commit()
+        return task
+
+    def schedule(self, **kwargs):
+        """schedules the test studio with a NativeScheduler and returns the
+        scheduler
+        """
+        scheduler = NativeScheduler(studio=self.test_studio, **kwargs)
+        scheduler.schedule()
+        DBSession.commit()
+        return scheduler
+
+    def create_project(self, name, code):
+        """creates a project with the same status list of the test project
+        """
+        project = Project(
+            name=name,
+            code=code,
+            repository=self.test_repo,
+            status_list=self.test_proj1.status_list
+        )
+        DBSession.add(project)
+        DBSession.commit()
+        return project
+
+    def test_studio_argument_is_skipped(self):
+        """testing if the studio attribute will be None if the studio argument
+        is skipped
+        """
+        scheduler = NativeScheduler()
+        self.assertIsNone(scheduler.studio)
+
+    def test_schedule_will_raise_a_TypeError_if_studio_is_None(self):
+        """testing if a TypeError will be raised when the schedule() method is
+        called without a studio
+        """
+        scheduler = NativeScheduler()
+        with self.assertRaises(TypeError) as cm:
+            scheduler.schedule()
+
+        self.assertEqual(
+            str(cm.exception),
+            'NativeScheduler.studio should be an instance of '
+            'stalker.models.studio.Studio, not NoneType'
+        )
+
+    def test_tasks_are_correctly_scheduled(self):
+        """testing if the tasks are scheduled to the same dates that
+        TaskJuggler schedules them
+        """
+        alternatives = [self.test_user3, self.test_user4, self.test_user5]
+        task1 = self.create_task(
+            'Task1', [self.test_user1, self.test_user2], 50,
+            alternative_resources=alternatives
+        )
+        task2 = self.create_task(
+            'Task2', [self.test_user1, self.test_user2], 60,
+            alternative_resources=alternatives
+        )
+
+        scheduler = self.schedule()
+
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 9, 0),
+            self.test_proj1.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 19, 12, 0),
+            self.test_proj1.computed_end
+        )
+
+        # the longer task is scheduled first with the primary resources
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 9, 0),
+            task2.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 19, 12, 0),
+            task2.computed_end
+        )
+        self.assertItemsEqual(
+            [self.test_user1, self.test_user2],
+            task2.computed_resources
+        )
+
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 9, 0),
+            task1.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 18, 16, 0),
+            task1.computed_end
+        )
+        self.assertEqual(2, len(task1.computed_resources))
+        for resource in task1.computed_resources:
+            self.assertIn(resource, alternatives)
+
+        self.assertEqual(3, len(scheduler.data))
+
+    def test_dependent_tasks_are_scheduled_after_their_dependencies(self):
+        """testing if the tasks are scheduled after the tasks that they depend
+        to
+        """
+        task1 = self.create_task('Task1', [self.test_user1], 10)
+        task2 = self.create_task(
+            'Task2', [self.test_user2], 5, depends=[task1]
+        )
+
+        self.schedule()
+
+        self.assertEqual(
+            datetime.datetime(2013, 4, 17, 10, 0),
+            task1.computed_end
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 17, 10, 0),
+            task2.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 17, 15, 0),
+            task2.computed_end
+        )
+
+    def test_dependency_gaps_are_respected(self):
+        """testing if the length and duration gaps of the dependencies are
+        respected
+        """
+        task1 = self.create_task('Task1', [self.test_user1], 9)
+        task2 = self.create_task('Task2', [self.test_user2], 1)
+        task3 = self.create_task('Task3', [self.test_user3], 1)
+
+        DBSession.add_all([
+            TaskDependency(task=task2, depends_to=task1, gap_timing=2,
+                           gap_unit='h', gap_model='length'),
+            TaskDependency(task=task3, depends_to=task1, gap_timing=2,
+                           gap_unit='d', gap_model='duration'),
+        ])
+        DBSession.commit()
+
+        self.schedule()
+
+        # task1 ends at 2013-04-16 18:00
+        self.assertEqual(
+            datetime.datetime(2013, 4, 17, 11, 0),
+            task2.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 19, 9, 0),
+            task3.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 19, 10, 0),
+            task3.computed_end
+        )
+
+    def test_onstart_dependencies_are_respected(self):
+        """testing if the onstart dependencies are scheduled relative to the
+        start of the dependent task
+        """
+        task1 = self.create_task('Task1', [self.test_user1], 18)
+        task2 = self.create_task('Task2', [self.test_user2], 2)
+        DBSession.add(
+            TaskDependency(task=task2, depends_to=task1,
+                           dependency_target='onstart', gap_timing=3,
+                           gap_unit='h', gap_model='length')
+        )
+        DBSession.commit()
+
+        self.schedule()
+
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 12, 0),
+            task2.computed_start
+        )
+
+    def test_dependencies_of_the_parent_tasks_are_respected(self):
+        """testing if the children of a container task are scheduled after
+        the tasks that the container depends to
+        """
+        task1 = self.create_task('Task1', [self.test_user1], 9)
+        parent = Task(name='Parent', project=self.test_proj1,
+                      depends=[task1])
+        DBSession.add(parent)
+        child = self.create_task(
+            'Child', [self.test_user2], 3, project=None, parent=parent
+        )
+
+        self.schedule()
+
+        self.assertEqual(
+            datetime.datetime(2013, 4, 17, 9, 0),
+            child.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 17, 9, 0),
+            parent.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 17, 12, 0),
+            parent.computed_end
+        )
+        self.assertEqual([self.test_user2], parent.computed_resources)
+
+    def test_length_and_duration_models(self):
+        """testing if the length tasks are scheduled in working time and the
+        duration tasks are scheduled in calendar time
+        """
+        task1 = self.create_task(
+            'Task1', [self.test_user1], 2, schedule_unit='d',
+            schedule_model='length'
+        )
+        task2 = self.create_task(
+            'Task2', [self.test_user2], 2, schedule_unit='d',
+            schedule_model='duration'
+        )
+
+        self.schedule()
+
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 9, 0),
+            task1.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 17, 18, 0),
+            task1.computed_end
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 0, 0),
+            task2.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 18, 0, 0),
+            task2.computed_end
+        )
+
+    def test_higher_priority_tasks_are_scheduled_first(self):
+        """testing if the tasks with higher priority get the shared resources
+        first
+        """
+        task1 = self.create_task('Task1', [self.test_user1], 9)
+        task2 = self.create_task('Task2', [self.test_user1], 9, priority=800)
+
+        self.schedule()
+
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 9, 0),
+            task2.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 17, 9, 0),
+            task1.computed_start
+        )
+
+    def test_vacations_are_skipped(self):
+        """testing if the user and studio vacations are not used for work
+        """
+        DBSession.add_all([
+            Vacation(user=self.test_user1,
+                     start=datetime.datetime(2013, 4, 16),
+                     end=datetime.datetime(2013, 4, 17)),
+            Vacation(start=datetime.datetime(2013, 4, 18),
+                     end=datetime.datetime(2013, 4, 19)),
+        ])
+        DBSession.commit()
+
+        task1 = self.create_task('Task1', [self.test_user1], 18)
+
+        self.schedule()
+
+        self.assertEqual(
+            datetime.datetime(2013, 4, 17, 9, 0),
+            task1.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 19, 18, 0),
+            task1.computed_end
+        )
+
+    def test_end_constrained_tasks_are_scheduled_as_late_as_possible(self):
+        """testing if the tasks which are constrained with an end date are
+        scheduled backwards from that date
+        """
+        task1 = self.create_task(
+            'Task1', [self.test_user1], 9,
+            schedule_constraint=CONSTRAIN_END,
+            end=datetime.datetime(2013, 4, 19, 18, 0)
+        )
+
+        self.schedule()
+
+        self.assertEqual(
+            datetime.datetime(2013, 4, 19, 9, 0),
+            task1.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 19, 18, 0),
+            task1.computed_end
+        )
+
+    def create_allocation_strategy_test_data(self, allocation_strategy):
+        """creates a task which can only be started after User4 has done one
+        hour of work and it can use User3 or User4 as an alternative to the
+        busy User1
+        """
+        task0 = self.create_task('Task0', [self.test_user4], 1, priority=900)
+        self.create_task('Task1', [self.test_user1], 9)
+        return self.create_task(
+            'Task2', [self.test_user1], 9,
+            alternative_resources=[self.test_user3, self.test_user4],
+            allocation_strategy=allocation_strategy,
+            depends=[task0]
+        )
+
+    def test_order_allocation_strategy(self):
+        """testing if the first free alternative resource is picked with the
+        order allocation strategy
+        """
+        task2 = self.create_allocation_strategy_test_data('order')
+
+        self.schedule()
+
+        self.assertEqual([self.test_user3], task2.computed_resources)
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 10, 0),
+            task2.computed_start
+        )
+
+    def test_maxloaded_allocation_strategy(self):
+        """testing if the most loaded free alternative resource is picked with
+        the maxloaded allocation strategy
+        """
+        task2 = self.create_allocation_strategy_test_data('maxloaded')
+
+        self.schedule()
+
+        self.assertEqual([self.test_user4], task2.computed_resources)
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 10, 0),
+            task2.computed_start
+        )
+
+    def test_time_logs_are_deducted_from_the_effort(self):
+        """testing if the time logs are booked and deducted from the effort
+        of the task
+        """
+        task1 = self.create_task('Task1', [self.test_user1], 12)
+        DBSession.add(TimeLog(
+            task=task1,
+            resource=self.test_user1,
+            start=datetime.datetime(2013, 4, 16, 9, 0),
+            end=datetime.datetime(2013, 4, 16, 18, 0)
+        ))
+        DBSession.commit()
+
+        self.schedule()
+
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 9, 0),
+            task1.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 17, 12, 0),
+            task1.computed_end
+        )
+
+    def test_schedule_will_not_use_bulk_apply_if_it_is_False(self):
+        """testing if the results are applied through the ORM when the
+        bulk_apply argument is False
+        """
+        task1 = self.create_task('Task1', [self.test_user1], 10)
+
+        self.schedule(bulk_apply=False)
+
+        self.assertEqual(
+            datetime.datetime(2013, 4, 17, 10, 0),
+            task1.computed_end
+        )
+        self.assertEqual([self.test_user1], task1.computed_resources)
+
+    def test_schedule_will_fill_the_stats(self):
+        """testing if the schedule() method will fill the stats attribute
+        """
+        self.create_task('Task1', [self.test_user1], 10)
+
+        scheduler = self.schedule()
+
+        self.assertIsInstance(scheduler.stats, ScheduleStats)
+        self.assertEqual(0, scheduler.stats.tj3_runs)
+        self.assertEqual(2, scheduler.stats.csv_rows)
+
+    def test_studio_schedule_is_working_with_the_native_scheduler(self):
+        """testing if the Studio.schedule() method can use the NativeScheduler
+        """
+        task1 = self.create_task('Task1', [self.test_user1], 10)
+
+        self.test_studio.scheduler = NativeScheduler()
+        self.test_studio.schedule()
+
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 9, 0),
+            task1.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 17, 10, 0),
+            task1.computed_end
+        )
+
+    def test_dry_run_will_not_change_the_database(self):
+        """testing if the results are stored in the result attribute and the
+        database is not changed in dry run mode
+        """
+        task1 = self.create_task('Task1', [self.test_user1], 10)
+
+        scheduler = NativeScheduler(studio=self.test_studio)
+        scheduler.dry_run = True
+        scheduler.schedule()
+
+        self.assertIsInstance(scheduler.result, ScheduleResult)
+        self.assertEqual(2, len(scheduler.result))
+        self.assertEqual(
+            (datetime.datetime(2013, 4, 16, 9, 0),
+             datetime.datetime(2013, 4, 17, 10, 0),
+             [self.test_user1.id]),
+            scheduler.result[task1.id]
+        )
+        self.assertFalse(DBSession.dirty)
+        self.assertIsNone(task1.computed_start)
+
+    def test_schedule_result_diff_and_apply(self):
+        """testing if the ScheduleResult.diff() method returns the changed
+        values and the ScheduleResult.apply() method writes them to the
+        database
+        """
+        task1 = self.create_task('Task1', [self.test_user1], 10)
+        task2 = self.create_task('Task2', [self.test_user2], 9)
+        self.schedule()
+
+        task1.resources = [self.test_user3]
+        DBSession.commit()
+
+        self.test_studio.scheduler = NativeScheduler()
+        result = self.test_studio.schedule(dry_run=True)
+
+        self.assertEqual(
+            {task1.id: (
+                (datetime.datetime(2013, 4, 16, 9, 0),
+                 datetime.datetime(2013, 4, 17, 10, 0),
+                 [self.test_user1.id]),
+                (datetime.datetime(2013, 4, 16, 9, 0),
+                 datetime.datetime(2013, 4, 17, 10, 0),
+                 [self.test_user3.id])
+            )},
+            result.diff()
+        )
+        self.assertIsNone(self.test_studio.last_scheduled_at)
+
+        result.apply()
+        DBSession.commit()
+
+        self.assertEqual([self.test_user3], task1.computed_resources)
+        self.assertEqual([self.test_user2], task2.computed_resources)
+        self.assertEqual({}, result.diff())
+
+        result.discard()
+        self.assertEqual(0, len(result))
+
+    def test_studio_schedule_will_schedule_only_the_given_projects(self):
+        """testing if the Studio.schedule() method schedules only the given
+        projects and the load of the resources coming from the other projects
+        is frozen
+        """
+        task1 = self.create_task('Task1', [self.test_user1], 10)
+        self.schedule()
+
+        # the first project is changed but it should not be scheduled again
+        task1.schedule_timing = 20
+        test_proj2 = self.create_project('Test Project 2', 'TP2')
+        task2 = self.create_task('Task2', [self.test_user1], 9,
+                                 project=test_proj2)
+        task3 = self.create_task('Task3', [self.test_user2], 9,
+                                 project=test_proj2)
+
+        self.test_studio.scheduler = NativeScheduler()
+        self.test_studio.schedule(projects=[test_proj2])
+        self.assertIsNone(self.test_studio.scheduler.projects)
+
+        self.assertEqual(
+            datetime.datetime(2013, 4, 17, 10, 0),
+            task1.computed_end
+        )
+        # user1 is busy with the frozen task1
+        self.assertEqual(
+            datetime.datetime(2013, 4, 17, 10, 0),
+            task2.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 18, 10, 0),
+            task2.computed_end
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 9, 0),
+            task3.computed_start
+        )
+
+    def test_depended_projects_of_the_given_projects_are_also_scheduled(self):
+        """testing if the projects that the tasks of the given projects are
+        depending on are also scheduled
+        """
+        task1 = self.create_task('Task1', [self.test_user1], 10)
+        test_proj2 = self.create_project('Test Project 2', 'TP2')
+        task2 = self.create_task('Task2', [self.test_user2], 9,
+                                 project=test_proj2, depends=[task1])
+
+        scheduler = NativeScheduler(studio=self.test_studio)
+        scheduler.projects = [test_proj2]
+        scheduler.schedule()
+        self.assertEqual([test_proj2], scheduler.projects)
+
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 9, 0),
+            task1.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 17, 10, 0),
+            task2.computed_start
+        )
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2014 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation;
+# version 2.1 of the License.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+import datetime
+import os
+import random
+import unittest2
+
+from stalker import (db, defaults, User, Repository, StatusList, Status,
+                     Project, Task, Studio, TaskJugglerScheduler,
+                     NativeScheduler)
+from stalker.db.session import DBSession
+
+
+@unittest2.skipUnless(os.path.exists(defaults.tj_command),
+                      'TaskJuggler is not installed')
+class NativeSchedulerConformanceTester(unittest2.TestCase):
+    """compares the results of the stalker.models.scheduler.NativeScheduler
+    with the results of the TaskJugglerScheduler on generated studios
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        db.setup({
+            'sqlalchemy.url': 'sqlite:///:memory:',
+            'sqlalchemy.echo': False
+        })
+        db.init()
+
+        self.test_users = []
+        for i in range(4):
+            user = User(
+                login='user%s' % i,
+                name='User%s' % i,
+                email='user%s@users.com' % i,
+                password='1234'
+            )
+            DBSession.add(user)
+            self.test_users.append(user)
+
+        self.test_repo = Repository(name='Test Repository')
+        DBSession.add(self.test_repo)
+
+        test_status1 = Status(name='Status 1', code='STS1')
+        self.test_proj_status_list = StatusList(
+            name='Project Status List',
+            statuses=[test_status1],
+            target_entity_type='Project'
+        )
+        DBSession.add(self.test_proj_status_list)
+
+        self.test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 0, 0)
+        )
+        self.test_studio.daily_working_hours = 9
+        DBSession.add(self.test_studio)
+        DBSession.commit()
+
+    def tearDown(self):
+        """clean up the test
+        """
+        DBSession.remove()
+
+    def generate_studio(self, seed, task_count=20, schedule_model='effort'):
+        """generates a project with chains of tasks, every user works on its
+        own chain and the chains depend to each other randomly
+        """
+        rand = random.Random(seed)
+        project = Project(
+            name='Project %s' % seed,
+            code='P%s' % seed,
+            repository=self.test_repo,
+            status_list=self.test_proj_status_list
+        )
+        DBSession.add(project)
+
+        chains = dict([(user.id, []) for user in self.test_users])
+        tasks = []
+        for i in range(task_count):
+            user = rand.choice(self.test_users)
+            depends = []
+            if chains[user.id]:
+                depends.append(chains[user.id][-1])
+            if tasks and rand.random() < 0.3:
+                task = rand.choice(tasks)
+                if task not in depends:
+                    depends.append(task)
+            task = Task(
+                name='Task %s' % i,
+                project=project,
+                resources=[user],
+                schedule_timing=rand.randint(1, 20),
+                schedule_unit='h',
+                schedule_model=schedule_model,
+                depends=depends
+            )
+            DBSession.add(task)
+            chains[user.id].append(task)
+            tasks.append(task)
+        DBSession.commit()
+        return tasks
+
+    def schedule_with(self, scheduler, tasks):
+        """schedules the studio with the given scheduler and returns the
+        computed dates of the given tasks
+        """
+        scheduler.studio = self.test_studio
+        scheduler.schedule()
+        DBSession.commit()
+        return [(task.name, task.computed_start, task.computed_end)
+                for task in tasks]
+
+    def assert_conforms(self, tasks):
+        """asserts that both of the schedulers compute the same dates
+        """
+        expected = self.schedule_with(TaskJugglerScheduler(), tasks)
+        result = self.schedule_with(NativeScheduler(), tasks)
+        self.assertEqual(expected, result)
+
+    def test_effort_tasks_are_scheduled_as_in_taskjuggler(self):
+        """testing if the effort tasks are scheduled to the same dates with
+        TaskJuggler
+        """
+        for seed in range(5):
+            tasks = self.generate_studio(seed)
+            self.assert_conforms(tasks)
+            # schedule only one project at a time
+            tasks[0].project.active = False
+            DBSession.commit()
+
+    def test_length_tasks_are_scheduled_as_in_taskjuggler(self):
+        """testing if the length tasks are scheduled to the same dates with
+        TaskJuggler
+        """
+        self.assert_conforms(
+            self.generate_studio(10, schedule_model='length')
+        )
+
+    def test_duration_tasks_are_scheduled_as_in_taskjuggler(self):
+        """testing if the duration tasks are scheduled to the same dates with
+        TaskJuggler
+        """
+        self.assert_conforms(
+            self.generate_studio(20, schedule_model='duration')
+        )
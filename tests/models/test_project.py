@@ -1630,6 +1630,14 @@ task Task_52 "Test Task 3" {
 
         self.assertEqual(self.test_project.to_tjp, expected_tjp)
 
+    def test_generate_tjp_is_working_properly(self):
+        """testing if the generate_tjp() method generates the same content
+        with the to_tjp attribute fragment by fragment
+        """
+        fragments = list(self.test_project.generate_tjp())
+        self.assertTrue(len(fragments) > 1)
+        self.assertEqual(''.join(fragments), self.test_project.to_tjp)
+
     def test_active_attribute_is_True_by_default(self):
         """testing if the active attribute is True by default
         """
@@ -1774,6 +1782,82 @@ task Task_52 "Test Task 3" {
 
         self.assertEqual(self.test_project.schedule_seconds, 44 * 3600)
 
+    def test_update_schedule_info_is_working_properly(self):
+        """testing if the update_schedule_info() method updates the cached
+        schedule_seconds and total_logged_seconds values of all the tasks in
+        the database
+        """
+        from sqlalchemy import select
+        from stalker import TimeLog
+        TimeLog(
+            task=self.test_task1,
+            resource=self.test_task1.resources[0],
+            start=datetime.datetime(2013, 8, 1, 1, 0),
+            duration=datetime.timedelta(hours=1)
+        )
+        TimeLog(
+            task=self.test_task10,
+            resource=self.test_task10.resources[0],
+            start=datetime.datetime(2013, 8, 1, 3, 0),
+            duration=datetime.timedelta(hours=3)
+        )
+        DBSession.commit()
+
+        # clear the cached values
+        DBSession.connection().execute(
+            Task.__table__.update().values(schedule_seconds=None,
+                                           total_logged_seconds=None)
+        )
+        DBSession.expire_all()
+
+        updated_ids = self.test_project.update_schedule_info()
+        self.assertEqual(
+            updated_ids,
+            sorted(task.id for task in self.test_project.tasks)
+        )
+
+        result = DBSession.connection().execute(
+            select([Task.__table__.c.id, Task.__table__.c.schedule_seconds,
+                    Task.__table__.c.total_logged_seconds])
+        )
+        values = dict(
+            (task_id, (schedule_seconds, total_logged_seconds))
+            for task_id, schedule_seconds, total_logged_seconds in result
+        )
+        self.assertEqual(values[self.test_task1.id], (3600, 3600))
+        self.assertEqual(values[self.test_task10.id], (10 * 3600, 3 * 3600))
+        self.assertEqual(values[self.test_seq1.id], (3600, 0))
+        self.assertEqual(values[self.test_shot1.id], (12 * 3600, 3 * 3600))
+        self.assertEqual(values[self.test_seq6.id], (3600, 0))
+
+        # the expired instances return the updated values
+        self.assertEqual(self.test_shot1._schedule_seconds, 12 * 3600)
+        self.assertEqual(self.test_shot1._total_logged_seconds, 3 * 3600)
+
+        # nothing is updated if the values are not changed
+        self.assertEqual(self.test_project.update_schedule_info(), [])
+
+    def test_update_schedule_info_updates_only_the_changed_tasks(self):
+        """testing if the update_schedule_info() method updates only the tasks
+        whose values are changed
+        """
+        self.test_project.update_schedule_info()
+
+        # change the schedule of a leaf task without updating the parents
+        DBSession.connection().execute(
+            Task.__table__.update()
+            .where(Task.__table__.c.id == self.test_task10.id)
+            .values(schedule_timing=2)
+        )
+        DBSession.expire_all()
+
+        self.assertEqual(
+            self.test_project.update_schedule_info(),
+            sorted([self.test_task10.id, self.test_shot1.id])
+        )
+        self.assertEqual(self.test_shot1.schedule_seconds, 4 * 3600)
+        self.assertEqual(self.test_project.schedule_seconds, 36 * 3600)
+
     def test_percent_complete_attribute_is_read_only(self):
         """testing if the percent_complete is a read-only attribute
         """
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2014 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation;
+# version 2.1 of the License.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest2
+
+from stalker import (db, defaults, User, Repository, StatusList, Status,
+                     Project, Task, Studio, SchedulerBase,
+                     TaskJugglerScheduler, NativeScheduler, ScheduleJob)
+from stalker.db.session import DBSession
+from stalker.exceptions import ScheduleCancelledError
+from tests.models.test_taskJuggler_scheduler import create_fake_tj3
+from tests.models.test_taskJuggler_daemon_scheduler import \
+    create_fake_executable
+
+
+fake_slow_tj3_source = """#!%(python)s
+# A fake tj3 which never finishes
+import time
+
+while True:
+    time.sleep(0.1)
+"""
+
+
+class BlockingScheduler(SchedulerBase):
+    """a scheduler which blocks until the given event is set, to be used in
+    concurrency tests
+    """
+
+    def __init__(self, release, runs):
+        SchedulerBase.__init__(self)
+        self.release = release
+        self.runs = runs
+
+    def schedule(self):
+        """appends to the runs list and waits for the release event
+        """
+        self.runs.append(self)
+        run = len(self.runs)
+        self.release.wait(30)
+        return 'run %s' % run
+
+
+class ScheduleJobTester(unittest2.TestCase):
+    """tests the stalker.models.schedulers.ScheduleJob class, the
+    Studio.schedule_async() and the Studio.request_schedule() methods
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        # the scheduling is done in another thread, so use a database file
+        # instead of an in memory database
+        self.temp_path = tempfile.mkdtemp()
+        db.setup({
+            'sqlalchemy.url': 'sqlite:///%s' %
+            os.path.join(self.temp_path, 'stalker.db'),
+            'sqlalchemy.echo': False
+        })
+        db.init()
+
+        self.test_user1 = User(
+            login='user1',
+            name='User1',
+            email='user1@users.com',
+            password='1234'
+        )
+        DBSession.add(self.test_user1)
+
+        self.test_repo = Repository(name='Test Repository')
+        DBSession.add(self.test_repo)
+
+        test_status1 = Status(name='Status 1', code='STS1')
+        test_proj_status_list = StatusList(
+            name='Project Status List',
+            statuses=[test_status1],
+            target_entity_type='Project'
+        )
+        DBSession.add(test_proj_status_list)
+
+        self.test_proj1 = Project(
+            name='Test Project 1',
+            code='TP1',
+            repository=self.test_repo,
+            status_list=test_proj_status_list
+        )
+        DBSession.add(self.test_proj1)
+
+        self.test_task1 = Task(
+            name='Task1',
+            project=self.test_proj1,
+            resources=[self.test_user1],
+            schedule_timing=10,
+            schedule_unit='h'
+        )
+        DBSession.add(self.test_task1)
+
+        self.test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 0, 0)
+        )
+        self.test_studio.daily_working_hours = 9
+        DBSession.add(self.test_studio)
+        DBSession.commit()
+
+        self.original_tj_command = defaults.tj_command
+        defaults.tj_command = create_fake_tj3()
+
+    def tearDown(self):
+        """clean up the test
+        """
+        if os.path.exists(defaults.tj_command):
+            os.remove(defaults.tj_command)
+        defaults.tj_command = self.original_tj_command
+        DBSession.remove()
+        shutil.rmtree(self.temp_path)
+
+    def test_schedule_async_raises_RuntimeError_if_there_is_no_scheduler(self):
+        """testing if a RuntimeError will be raised when there is no
+        scheduler
+        """
+        self.assertRaises(RuntimeError, self.test_studio.schedule_async)
+
+    def test_schedule_async_is_working_properly(self):
+        """testing if the schedule_async() method returns a ScheduleJob which
+        schedules the studio in the background
+        """
+        self.test_studio.scheduler = TaskJugglerScheduler()
+        job = self.test_studio.schedule_async(scheduled_by=self.test_user1)
+        self.assertIsInstance(job, ScheduleJob)
+
+        self.assertEqual(job.result(timeout=60), [])
+        self.assertTrue(job.done())
+        self.assertEqual(job.status, 'finished')
+        self.assertEqual(job.phase, 'done')
+        self.assertEqual(job.progress, 1.0)
+        self.assertIsNone(job.exception())
+        self.assertFalse(job.cancel())
+
+        # the results are committed by the background thread
+        DBSession.expire_all()
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 9, 0),
+            self.test_task1.computed_start
+        )
+        self.assertFalse(self.test_studio.is_scheduling)
+        self.assertEqual(self.test_user1, self.test_studio.last_scheduled_by)
+
+    def test_schedule_async_is_working_with_the_native_scheduler(self):
+        """testing if the schedule_async() method is working with the
+        NativeScheduler
+        """
+        self.test_studio.scheduler = NativeScheduler()
+        job = self.test_studio.schedule_async()
+        self.assertTrue(job.wait(timeout=60))
+        self.assertEqual(job.status, 'finished')
+
+        DBSession.expire_all()
+        self.assertIsNotNone(self.test_task1.computed_start)
+        self.assertIsNotNone(self.test_task1.computed_end)
+
+    def test_cancel_kills_the_TaskJuggler_process(self):
+        """testing if the cancel() method kills the running TaskJuggler
+        process and the job is finished with the cancelled status
+        """
+        os.remove(defaults.tj_command)
+        defaults.tj_command = create_fake_executable(fake_slow_tj3_source)
+
+        self.test_studio.scheduler = TaskJugglerScheduler()
+        job = self.test_studio.schedule_async()
+
+        # wait TaskJuggler to start
+        start = time.time()
+        while job.phase != 'solve' and time.time() - start < 30:
+            time.sleep(0.05)
+        self.assertEqual(job.phase, 'solve')
+        self.assertAlmostEqual(job.progress, 1.0 / 3)
+
+        self.assertTrue(job.cancel())
+        self.assertTrue(job.wait(timeout=30))
+        self.assertEqual(job.status, 'cancelled')
+        self.assertIsInstance(job.exception(), ScheduleCancelledError)
+        self.assertRaises(ScheduleCancelledError, job.result)
+
+        DBSession.expire_all()
+        self.assertIsNone(self.test_task1.computed_start)
+        self.assertFalse(self.test_studio.is_scheduling)
+
+    def test_failed_job(self):
+        """testing if the job is finished with the failed status and the
+        exception is raised by the result() method if the scheduling fails
+        """
+        os.remove(defaults.tj_command)
+        self.test_studio.scheduler = TaskJugglerScheduler()
+        job = self.test_studio.schedule_async()
+
+        self.assertTrue(job.wait(timeout=60))
+        self.assertEqual(job.status, 'failed')
+        self.assertIsInstance(job.exception(), OSError)
+        self.assertRaises(OSError, job.result)
+
+    def test_cancel_before_the_job_is_started(self):
+        """testing if a job which is cancelled before it is started is not
+        running the scheduler
+        """
+        self.test_studio.scheduler = TaskJugglerScheduler()
+        job = ScheduleJob(self.test_studio.id, self.test_studio.scheduler)
+        self.assertEqual(job.status, 'pending')
+        self.assertEqual(job.phase, 'pending')
+        self.assertEqual(job.progress, 0.0)
+
+        self.assertTrue(job.cancel())
+        job.start()
+        self.assertRaises(ScheduleCancelledError, job.result, 30)
+        self.assertEqual(job.status, 'cancelled')
+        self.assertIsNone(self.test_studio.scheduler.phase)
+        self.assertIsNone(self.test_studio.last_scheduled_at)
+
+    def test_result_raises_RuntimeError_on_timeout(self):
+        """testing if the result() method raises a RuntimeError if the job is
+        not finished in the given timeout
+        """
+        self.test_studio.scheduler = TaskJugglerScheduler()
+        job = ScheduleJob(self.test_studio.id, self.test_studio.scheduler)
+        self.assertFalse(job.wait(timeout=0.01))
+        self.assertRaises(RuntimeError, job.result, 0.01)
+
+    def test_concurrent_schedule_requests_are_coalesced(self):
+        """testing if the schedule requests placed while the studio is
+        scheduling are coalesced in to one follow-up run and every caller
+        gets the result of the run which covered its request
+        """
+        poll_interval = defaults.schedule_request_poll_interval
+        defaults.schedule_request_poll_interval = 0.05
+
+        release = threading.Event()
+        runs = []
+        results = {}
+        studio_id = self.test_studio.id
+
+        def request(name):
+            try:
+                studio = Studio.query.get(studio_id)
+                studio.scheduler = BlockingScheduler(release, runs)
+                results[name] = studio.request_schedule(timeout=30)
+            finally:
+                DBSession.remove()
+
+        def wait_for(condition):
+            start = time.time()
+            while not condition() and time.time() - start < 30:
+                time.sleep(0.05)
+
+        threads = []
+        try:
+            threads.append(threading.Thread(target=request, args=('first',)))
+            threads[0].start()
+            wait_for(lambda: len(runs) == 1)
+
+            for name in ['second', 'third', 'fourth']:
+                thread = threading.Thread(target=request, args=(name,))
+                thread.start()
+                threads.append(thread)
+
+            def queued():
+                DBSession.expire_all()
+                return self.test_studio.schedule_requests == 4
+            wait_for(queued)
+            self.assertEqual(self.test_studio.schedule_requests, 4)
+        finally:
+            release.set()
+            for thread in threads:
+                thread.join(30)
+            defaults.schedule_request_poll_interval = poll_interval
+
+        self.assertEqual(len(runs), 2)
+        self.assertEqual(
+            results,
+            {
+                'first': 'run 1',
+                'second': 'run 2',
+                'third': 'run 2',
+                'fourth': 'run 2'
+            }
+        )
+
+        DBSession.expire_all()
+        self.assertFalse(self.test_studio.is_scheduling)
+        self.assertEqual(self.test_studio.schedule_requests_served, 4)
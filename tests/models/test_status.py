@@ -19,7 +19,13 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 
 import unittest2
-from stalker import Entity, Status
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from stalker import db, defaults, Entity, Status
+from stalker.db.session import DBSession
+from stalker.models.status import StatusRegistry, StatusPropagator
 
 
 class StatusTest(unittest2.TestCase):
@@ -131,3 +137,192 @@ class StatusTest(unittest2.TestCase):
         self.assertFalse(a_status != unicode(self.kwargs["code"]))
         self.assertFalse(a_status != unicode(self.kwargs["code"].lower()))
         self.assertFalse(a_status != unicode(self.kwargs["code"].upper()))
+
+
+class StatusRegistryTester(unittest2.TestCase):
+    """tests the stalker.models.status.StatusRegistry class
+    """
+
+    def setUp(self):
+        """setup the test
+        """
+        db.setup({'sqlalchemy.url': 'sqlite:///:memory:'})
+        db.init()
+
+        self.statements = []
+        event.listen(Engine, 'before_cursor_execute', self.count_statement)
+
+    def tearDown(self):
+        """clean up the test
+        """
+        event.remove(Engine, 'before_cursor_execute', self.count_statement)
+        DBSession.remove()
+
+    def count_statement(self, conn, cursor, statement, parameters, context,
+                        executemany):
+        """stores the executed statements
+        """
+        self.statements.append(statement)
+
+    def test_get_registry_returns_the_registry_of_the_current_session(self):
+        """testing if the get_registry() method returns the same registry for
+        the same session
+        """
+        registry = StatusRegistry.get_registry()
+        self.assertIs(registry.session, DBSession())
+        self.assertIs(registry, StatusRegistry.get_registry())
+        self.assertIs(registry, StatusRegistry.get_registry(DBSession()))
+
+    def test_get_is_working_properly(self):
+        """testing if the get() method returns the Status with the given code
+        and None if there is no such Status
+        """
+        registry = StatusRegistry.get_registry()
+        self.assertEqual(
+            registry.get('WIP'),
+            Status.query.filter_by(code='WIP').first()
+        )
+        self.assertIsNone(registry.get('UNKNOWN'))
+
+    def test_get_queries_the_statuses_once_per_transaction(self):
+        """testing if the Statuses are queried only once in a transaction
+        """
+        registry = StatusRegistry.get_registry()
+        codes = ['WFD', 'RTS', 'WIP', 'PREV', 'HREV', 'DREV', 'OH', 'STOP',
+                 'CMPL']
+        statuses = [registry.get(code) for code in codes]
+        self.assertEqual([status.code for status in statuses], codes)
+        self.assertEqual(len(self.statements), 1)
+
+        self.assertEqual([registry.get(code) for code in codes], statuses)
+        self.assertEqual(len(self.statements), 1)
+
+        # a new transaction
+        DBSession.commit()
+        registry.get('WIP')
+        self.assertEqual(len(self.statements), 2)
+
+    def test_registry_is_invalidated_when_a_new_status_is_added(self):
+        """testing if a new Status is resolved without flushing the session
+        """
+        registry = StatusRegistry.get_registry()
+        self.assertIsNone(registry.get('NSTS'))
+
+        new_status = Status(name='New Status', code='NSTS')
+        DBSession.add(new_status)
+        self.assertIs(registry.get('NSTS'), new_status)
+
+    def test_registry_is_invalidated_when_the_status_code_changes(self):
+        """testing if the registry is invalidated when the code of a Status
+        changes
+        """
+        registry = StatusRegistry.get_registry()
+        wip = registry.get('WIP')
+        wip.code = 'WORK'
+        self.assertIsNone(registry.get('WIP'))
+        self.assertIs(registry.get('WORK'), wip)
+
+    def test_registry_is_invalidated_when_a_status_is_deleted(self):
+        """testing if the registry is invalidated when a Status is deleted
+        """
+        new_status = Status(name='New Status', code='NSTS')
+        DBSession.add(new_status)
+        DBSession.commit()
+
+        registry = StatusRegistry.get_registry()
+        self.assertIs(registry.get('NSTS'), new_status)
+
+        DBSession.delete(new_status)
+        DBSession.flush()
+        self.assertIsNone(registry.get('NSTS'))
+
+
+class StatusPropagatorTester(unittest2.TestCase):
+    """tests the stalker.models.status.StatusPropagator class
+    """
+
+    def setUp(self):
+        """setup the test
+        """
+        db.setup({'sqlalchemy.url': 'sqlite:///:memory:'})
+        db.init()
+        self.propagator = StatusPropagator.get_propagator()
+
+    def tearDown(self):
+        """clean up the test
+        """
+        DBSession.remove()
+
+    def test_get_propagator_returns_the_propagator_of_the_current_session(
+            self):
+        """testing if the get_propagator() method returns the same propagator
+        for the same session
+        """
+        self.assertIs(self.propagator.session, DBSession())
+        self.assertIs(self.propagator, StatusPropagator.get_propagator())
+
+    def test_mode_defaults_to_the_status_propagation_setting(self):
+        """testing if the mode attribute defaults to the status_propagation
+        setting
+        """
+        self.assertEqual(defaults.status_propagation, 'immediate')
+        self.assertEqual(self.propagator.mode, 'immediate')
+        self.assertFalse(self.propagator.is_deferred)
+
+        self.propagator.mode = 'deferred'
+        self.assertTrue(self.propagator.is_deferred)
+
+        self.propagator.mode = None
+        self.assertEqual(self.propagator.mode, 'immediate')
+
+    def test_mode_attribute_is_not_a_valid_mode(self):
+        """testing if a ValueError will be raised when the mode attribute is
+        not one of the modes
+        """
+        self.assertRaises(
+            ValueError, setattr, self.propagator, 'mode', 'later'
+        )
+
+    def test_when_propagated_is_working_properly(self):
+        """testing if the when_propagated() method calls the given callback
+        immediately in immediate mode and after the propagation in deferred
+        mode
+        """
+        calls = []
+        self.propagator.when_propagated(calls.append, 1)
+        self.assertEqual(calls, [1])
+
+        self.propagator.mode = 'deferred'
+        self.propagator.when_propagated(calls.append, 2)
+        self.assertEqual(calls, [1])
+        self.assertTrue(self.propagator.has_pending)
+
+        self.propagator.propagate()
+        self.assertEqual(calls, [1, 2])
+        self.assertFalse(self.propagator.has_pending)
+
+    def test_collected_tasks_are_discarded_when_the_transaction_ends(self):
+        """testing if the collected tasks are discarded on rollback
+        """
+        calls = []
+        self.propagator.mode = 'deferred'
+        self.propagator.when_propagated(calls.append, 1)
+        DBSession.rollback()
+        self.assertFalse(self.propagator.has_pending)
+        self.assertEqual(calls, [])
+
+    def test_deferred_is_working_properly(self):
+        """testing if the deferred() context manager defers the propagation in
+        its block, propagates at the end and restores the previous mode
+        """
+        calls = []
+        with self.propagator.deferred() as propagator:
+            self.assertTrue(propagator is self.propagator)
+            self.assertTrue(self.propagator.is_deferred)
+            self.propagator.when_propagated(calls.append, 1)
+            self.assertEqual(calls, [])
+
+        self.assertEqual(calls, [1])
+        self.assertFalse(self.propagator.has_pending)
+        self.assertTrue(self.propagator._mode is None)
+        self.assertEqual(self.propagator.mode, 'immediate')
@@ -18,6 +18,7 @@
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 
+import os
 import unittest2
 import datetime
 
@@ -1487,6 +1488,191 @@ project Studio_{{ studio.id }} "Studio" 2013-04-15 - 2013-06-30 {
         self.assertEqual(studio.last_scheduled_by, self.test_user1)
         self.assertEqual(studio.last_scheduled_by_id, self.test_user1.id)
 
+    def test_schedule_will_store_schedule_stats_in_database(self):
+        """testing if the schedule method will store the stats of the last
+        scheduling runs in database
+        """
+        from tests.models.test_taskJuggler_scheduler import create_fake_tj3
+
+        tj_scheduler = TaskJugglerScheduler()
+        self.test_studio.now = datetime.datetime(2013, 4, 15, 22, 56)
+        self.test_studio.scheduler = tj_scheduler
+
+        tj_command = defaults.tj_command
+        schedule_stats_count = defaults.schedule_stats_count
+        defaults.tj_command = create_fake_tj3()
+        defaults.schedule_stats_count = 2
+        try:
+            self.test_studio.schedule(scheduled_by=self.test_user1)
+            self.assertEqual(len(self.test_studio.schedule_stats), 1)
+            self.test_studio.schedule(scheduled_by=self.test_user1)
+            self.test_studio.schedule(scheduled_by=self.test_user1)
+        finally:
+            os.remove(defaults.tj_command)
+            defaults.tj_command = tj_command
+            defaults.schedule_stats_count = schedule_stats_count
+
+        del self.test_studio
+        studio = Studio.query.first()
+
+        self.assertEqual(len(studio.schedule_stats), 2)
+        stats = studio.schedule_stats[-1]
+        self.assertEqual(stats['tj3_runs'], 1)
+        self.assertTrue(stats['bytes_written'] > 0)
+        self.assertTrue(stats['csv_rows'] > 0)
+        self.assertTrue(stats['db_rows_updated'] > 0)
+        self.assertTrue(stats['sql_statement_count'] > 0)
+        self.assertTrue(stats['commit_seconds'] > 0)
+        self.assertTrue(stats['total_seconds'] >= stats['tj3_wall_seconds'])
+
+    def test_schedule_in_dry_run_mode_will_not_change_the_database(self):
+        """testing if the schedule method will return a ScheduleResult and
+        will not change the database when the dry_run argument is True
+        """
+        from stalker import ScheduleResult
+        from tests.models.test_taskJuggler_scheduler import create_fake_tj3
+
+        tj_scheduler = TaskJugglerScheduler()
+        self.test_studio.now = datetime.datetime(2013, 4, 15, 22, 56)
+        self.test_studio.scheduler = tj_scheduler
+        DBSession.commit()
+        studio_start = self.test_studio.start
+        studio_end = self.test_studio.end
+        computed_start = self.test_task1.computed_start
+
+        tj_command = defaults.tj_command
+        defaults.tj_command = create_fake_tj3()
+        try:
+            result = self.test_studio.schedule(
+                scheduled_by=self.test_user1, dry_run=True
+            )
+        finally:
+            os.remove(defaults.tj_command)
+            defaults.tj_command = tj_command
+
+        self.assertIsInstance(result, ScheduleResult)
+        self.assertEqual(
+            (datetime.datetime(2013, 4, 16, 9, 0),
+             datetime.datetime(2013, 4, 17, 18, 0), []),
+            result[self.test_task1.id]
+        )
+        self.assertFalse(tj_scheduler.dry_run)
+        self.assertFalse(self.test_studio.is_scheduling)
+        self.assertIsNone(self.test_studio.last_scheduled_at)
+        self.assertEqual(studio_start, self.test_studio.start)
+        self.assertEqual(studio_end, self.test_studio.end)
+        self.assertFalse(DBSession.is_modified(self.test_studio))
+        self.assertEqual(computed_start, self.test_task1.computed_start)
+        self.assertIn(self.test_task1.id, result.diff())
+
+    def test_schedule_projects_argument_is_not_a_list_of_projects(self):
+        """testing if a TypeError will be raised when the projects argument
+        is not a list of Project instances
+        """
+        self.test_studio.scheduler = TaskJugglerScheduler()
+        with self.assertRaises(TypeError) as cm:
+            self.test_studio.schedule(projects=self.test_project1)
+
+        self.assertEqual(
+            str(cm.exception),
+            'Studio.schedule() projects argument should be a list of '
+            'stalker.models.project.Project instances, not Project'
+        )
+
+    def test_schedule_will_schedule_only_the_given_projects(self):
+        """testing if the schedule method will schedule only the given
+        projects when the projects argument is given
+        """
+        from tests.models.test_taskJuggler_scheduler import create_fake_tj3
+
+        tj_scheduler = TaskJugglerScheduler()
+        self.test_studio.now = datetime.datetime(2013, 4, 15, 22, 56)
+        self.test_studio.scheduler = tj_scheduler
+
+        tj_command = defaults.tj_command
+        defaults.tj_command = create_fake_tj3()
+        try:
+            self.test_studio.schedule(
+                scheduled_by=self.test_user1,
+                projects=[self.test_project2]
+            )
+        finally:
+            os.remove(defaults.tj_command)
+            defaults.tj_command = tj_command
+
+        self.assertIsNone(tj_scheduler.projects)
+        self.assertIsNone(self.test_task1.computed_start)
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 9, 0),
+            self.test_task2.computed_start
+        )
+
+    def test_request_schedule_will_not_work_without_a_scheduler(self):
+        """testing if a RuntimeError will be raised when there is no
+        scheduler
+        """
+        self.test_studio.scheduler = None
+        self.assertRaises(RuntimeError, self.test_studio.request_schedule)
+
+    def test_request_schedule_will_run_the_scheduler(self):
+        """testing if the request_schedule method will run the scheduler and
+        mark the request as served if the studio is not scheduling
+        """
+        def callback():
+            self.assertTrue(self.test_studio.is_scheduling)
+
+        self.test_studio.scheduler = DummyScheduler(callback=callback)
+        self.test_studio.request_schedule(scheduled_by=self.test_user1)
+
+        self.assertFalse(self.test_studio.is_scheduling)
+        self.assertEqual(self.test_studio.schedule_requests, 1)
+        self.assertEqual(self.test_studio.schedule_requests_served, 1)
+        self.assertEqual(self.test_studio.last_scheduled_by, self.test_user1)
+
+    def test_request_schedule_will_not_run_the_scheduler_for_served_request(
+            self):
+        """testing if the request_schedule method will not run the scheduler
+        and return the result of the run which covered the request
+        """
+        calls = []
+
+        def callback():
+            calls.append(1)
+
+        self.test_studio.scheduler = DummyScheduler(callback=callback)
+        self.test_studio.schedule_requests = 2
+        self.test_studio.schedule_requests_served = 2
+        self.test_studio.request_schedule()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.test_studio.schedule_requests_served, 3)
+
+        # pretend that the next request is covered by a run in another
+        # process
+        self.test_studio.schedule_requests_served = 4
+        self.test_studio.last_schedule_message = 'the other run'
+        DBSession.commit()
+        self.assertEqual(
+            self.test_studio.request_schedule(),
+            'the other run'
+        )
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.test_studio.schedule_requests, 4)
+
+    def test_request_schedule_timeout_argument_is_working_properly(self):
+        """testing if a RuntimeError will be raised when the request is not
+        served in the given timeout
+        """
+        self.test_studio.scheduler = DummyScheduler()
+        self.test_studio.is_scheduling = True
+        self.test_studio.is_scheduling_by = self.test_user1
+        DBSession.commit()
+
+        self.assertRaises(
+            RuntimeError, self.test_studio.request_schedule, timeout=0
+        )
+        self.assertEqual(self.test_studio.schedule_requests, 1)
+        self.assertEqual(self.test_studio.schedule_requests_served, 0)
+
     def test_vacation_attribute_is_read_only(self):
         """testing if the vacation attribute is a read-only attribute
         """
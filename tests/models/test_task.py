@@ -2089,6 +2089,84 @@ class TaskTester(unittest2.TestCase):
             parent_task.total_logged_seconds, 16 * 60 * 60
         )
 
+    def test_total_logged_seconds_of_the_parents_are_updated_on_flush(self):
+        """testing if the changes in the time logs of the children are
+        collected and the total_logged_seconds of the parents are updated once
+        when the session is flushed
+        """
+        from stalker.models.task import LoggedSecondsAccumulator
+        self.kwargs['depends'] = []
+        self.test_task.depends = []
+
+        dt = datetime.datetime
+        td = datetime.timedelta
+        now = dt.now()
+
+        root_task = Task(**self.kwargs)
+        parent_task = Task(**self.kwargs)
+        child_task1 = Task(**self.kwargs)
+        child_task2 = Task(**self.kwargs)
+        parent_task.parent = root_task
+        parent_task.children = [child_task1, child_task2]
+        DBSession.add(root_task)
+        DBSession.flush()
+        self.assertEqual(root_task.total_logged_seconds, 0)
+        self.assertEqual(parent_task.total_logged_seconds, 0)
+
+        accumulator = LoggedSecondsAccumulator.get_accumulator()
+        with DBSession.no_autoflush:
+            tlog1 = TimeLog(
+                task=child_task1,
+                resource=child_task1.resources[0],
+                start=now,
+                end=now + td(hours=8)
+            )
+            TimeLog(
+                task=child_task2,
+                resource=child_task2.resources[1],
+                start=now,
+                end=now + td(hours=2)
+            )
+            tlog1.end = now + td(hours=4)
+
+        # nothing is updated yet
+        self.assertTrue(accumulator.has_pending)
+        self.assertEqual(root_task._total_logged_seconds, 0)
+        self.assertEqual(parent_task._total_logged_seconds, 0)
+
+        DBSession.flush()
+        self.assertFalse(accumulator.has_pending)
+        self.assertEqual(root_task._total_logged_seconds, 6 * 3600)
+        self.assertEqual(parent_task._total_logged_seconds, 6 * 3600)
+
+    def test_collected_logged_seconds_are_applied_when_they_are_read(self):
+        """testing if the collected changes of the logged seconds are applied
+        before the total_logged_seconds of a container task is read
+        """
+        from stalker.models.task import LoggedSecondsAccumulator
+        self.kwargs['depends'] = []
+        self.test_task.depends = []
+
+        dt = datetime.datetime
+        td = datetime.timedelta
+        now = dt.now()
+
+        parent_task = Task(**self.kwargs)
+        child_task = Task(**self.kwargs)
+        parent_task.children.append(child_task)
+        self.assertEqual(parent_task.total_logged_seconds, 0)
+
+        TimeLog(
+            task=child_task,
+            resource=child_task.resources[0],
+            start=now,
+            end=now + td(hours=8)
+        )
+        accumulator = LoggedSecondsAccumulator.get_accumulator()
+        self.assertTrue(accumulator.has_pending)
+        self.assertEqual(parent_task.total_logged_seconds, 8 * 3600)
+        self.assertFalse(accumulator.has_pending)
+
     def test_schedule_seconds_is_working_properly_for_an_effort_based_task_no_studio(self):
         """testing if schedule_seconds attribute is working properly for a
         effort based task on an environment where there are no studio
@@ -2975,6 +3053,62 @@ class TaskTester(unittest2.TestCase):
         self.assertFalse(task3.is_container)
         self.assertTrue(task1.is_container)
 
+    def test_is_container_attribute_does_not_load_the_children(self):
+        """testing if the is_container attribute uses the child_count column
+        and doesn't load the children of a persisted Task
+        """
+        self.kwargs['parent'] = self.test_task
+        self.kwargs['name'] = 'Task 1'
+        task1 = Task(**self.kwargs)
+
+        self.kwargs['parent'] = task1
+        self.kwargs['name'] = 'Task 2'
+        task2 = Task(**self.kwargs)
+
+        DBSession.add_all([task1, task2])
+        DBSession.commit()
+
+        self.assertTrue(task1.is_container)
+        self.assertTrue(task2.is_leaf)
+        self.assertNotIn('children', task1.__dict__)
+        self.assertNotIn('children', task2.__dict__)
+
+    def test_child_count_is_updated_when_the_children_are_changed(self):
+        """testing if the child_count column is updated when the children of a
+        Task are changed, moved or deleted
+        """
+        self.kwargs['parent'] = self.test_task
+        self.kwargs['name'] = 'Task 1'
+        task1 = Task(**self.kwargs)
+
+        self.kwargs['name'] = 'Task 2'
+        task2 = Task(**self.kwargs)
+
+        self.kwargs['parent'] = task1
+        self.kwargs['name'] = 'Task 3'
+        task3 = Task(**self.kwargs)
+
+        self.kwargs['name'] = 'Task 4'
+        task4 = Task(**self.kwargs)
+
+        DBSession.add_all([task1, task2, task3, task4])
+        DBSession.commit()
+        self.assertEqual(task1._child_count, 2)
+        self.assertEqual(task2._child_count, 0)
+
+        # move a child
+        task3.parent = task2
+        DBSession.commit()
+        self.assertEqual(task1._child_count, 1)
+        self.assertEqual(task2._child_count, 1)
+        self.assertTrue(task2.is_container)
+
+        # delete a child
+        DBSession.delete(task4)
+        DBSession.commit()
+        self.assertEqual(task1._child_count, 0)
+        self.assertTrue(task1.is_leaf)
+
     def test_project_and_parent_args_are_skipped(self):
         """testing if a TypeError will be raised when there is no project nor a
         parent task is given with the project and parent arguments respectively
@@ -3839,6 +3973,30 @@ task Task_5679 "Modeling" {
         # print expected_tjp
         self.assertMultiLineEqual(t1.to_tjp, expected_tjp)
 
+    def test_generate_tjp_is_working_properly_for_a_container_task(self):
+        """testing if the generate_tjp() method generates the same content
+        with the to_tjp attribute for a container task
+        """
+        self.kwargs['project'].id = 87987
+        self.kwargs['parent'] = None
+        self.kwargs['depends'] = []
+
+        t1 = Task(**self.kwargs)
+        t1.id = 5648
+
+        self.kwargs['parent'] = t1
+
+        t2 = Task(**self.kwargs)
+        t2.id = 5649
+
+        t3 = Task(**self.kwargs)
+        t3.id = 5650
+        t3.depends = [t2]
+
+        fragments = list(t1.generate_tjp())
+        self.assertTrue(len(fragments) > 1)
+        self.assertMultiLineEqual(''.join(fragments), t1.to_tjp)
+
     def test_to_tjp_attribute_is_working_properly_for_a_container_task_with_dependency(self):
         """testing if the to_tjp attribute is working properly for a container
         task which has dependency
@@ -4052,6 +4210,68 @@ task Task_5679 "Modeling" {
         print '-----------------------'
         self.assertMultiLineEqual(t1.to_tjp, expected_tjp)
 
+    def test_compacted_time_logs_is_working_properly(self):
+        """testing if the compacted_time_logs() method merges the time logs of
+        the same resource which are following each other without a gap
+        """
+        self.test_task.depends = []
+        dt = datetime.datetime
+        user1 = self.test_task.resources[0]
+        user2 = self.test_task.resources[1]
+
+        # added in reverse order to check the sorting
+        TimeLog(task=self.test_task, resource=user1,
+                start=dt(2013, 4, 9, 14, 0), end=dt(2013, 4, 9, 16, 0))
+        TimeLog(task=self.test_task, resource=user1,
+                start=dt(2013, 4, 8, 10, 0), end=dt(2013, 4, 8, 12, 0))
+        TimeLog(task=self.test_task, resource=user1,
+                start=dt(2013, 4, 8, 9, 0), end=dt(2013, 4, 8, 10, 0))
+        TimeLog(task=self.test_task, resource=user2,
+                start=dt(2013, 4, 8, 12, 0), end=dt(2013, 4, 8, 13, 0))
+        TimeLog(task=self.test_task, resource=user1,
+                start=dt(2013, 4, 8, 12, 0), end=dt(2013, 4, 8, 13, 0))
+        self.assertEqual(len(self.test_task.time_logs), 5)
+
+        bookings = self.test_task.compacted_time_logs()
+        self.assertEqual(
+            [(b.resource, b.start, b.end) for b in bookings],
+            [(user1, dt(2013, 4, 8, 9, 0), dt(2013, 4, 8, 13, 0)),
+             (user2, dt(2013, 4, 8, 12, 0), dt(2013, 4, 8, 13, 0)),
+             (user1, dt(2013, 4, 9, 14, 0), dt(2013, 4, 9, 16, 0))]
+        )
+        self.assertEqual(bookings[0].duration, datetime.timedelta(hours=4))
+
+    def test_generate_tjp_with_compact_bookings_is_working_properly(self):
+        """testing if the generate_tjp() method renders the compacted time
+        logs when the compact_bookings argument is True
+        """
+        self.test_task.depends = []
+        self.test_task.id = 35466
+        self.test_task.project.id = 8898
+        self.test_user1.id = 1231
+        dt = datetime.datetime
+        user1 = self.test_task.resources[0]
+
+        TimeLog(task=self.test_task, resource=user1,
+                start=dt(2013, 4, 8, 9, 0), end=dt(2013, 4, 8, 10, 0))
+        TimeLog(task=self.test_task, resource=user1,
+                start=dt(2013, 4, 8, 10, 0), end=dt(2013, 4, 8, 12, 0))
+
+        tjp = ''.join(self.test_task.generate_tjp())
+        self.assertEqual(tjp, self.test_task.to_tjp)
+        self.assertIn(
+            'booking User_1231 2013-04-08-09:00:00 +1h { overtime 2 }', tjp
+        )
+        self.assertIn(
+            'booking User_1231 2013-04-08-10:00:00 +2h { overtime 2 }', tjp
+        )
+
+        tjp = ''.join(self.test_task.generate_tjp(compact_bookings=True))
+        self.assertEqual(tjp.count('booking'), 1)
+        self.assertIn(
+            'booking User_1231 2013-04-08-09:00:00 +3h { overtime 2 }', tjp
+        )
+
     def test_is_scheduled_is_a_read_only_attribute(self):
         """testing if the is_scheduled is a read-only attribute
         """
@@ -4107,6 +4327,134 @@ task Task_5679 "Modeling" {
             [t1, t2]
         )
 
+    def test_hierarchy_path_attribute_is_read_only(self):
+        """testing if the hierarchy_path attribute is read only
+        """
+        self.assertRaises(
+            AttributeError, setattr, self.test_task, 'hierarchy_path', '1|'
+        )
+
+    def test_hierarchy_path_attribute_is_updated_on_flush(self):
+        """testing if the hierarchy_path attribute is set to the ids of the
+        parents when the session is flushed
+        """
+        self.kwargs['parent'] = None
+        t1 = Task(**self.kwargs)
+        t2 = Task(**self.kwargs)
+        t3 = Task(**self.kwargs)
+        t2.parent = t1
+        t3.parent = t2
+        DBSession.add_all([t1, t2, t3])
+        self.assertTrue(t3.hierarchy_path is None)
+
+        DBSession.commit()
+        self.assertEqual(t1.hierarchy_path, '')
+        self.assertEqual(t2.hierarchy_path, '%s|' % t1.id)
+        self.assertEqual(t3.hierarchy_path, '%s|%s|' % (t1.id, t2.id))
+
+    def test_hierarchy_path_of_the_descendants_are_updated_on_move(self):
+        """testing if the hierarchy_path of the moved task and its
+        descendants are updated in the database and in the session when a
+        task is moved under another task
+        """
+        self.kwargs['parent'] = None
+        t1 = Task(**self.kwargs)
+        t2 = Task(**self.kwargs)
+        t3 = Task(**self.kwargs)
+        t4 = Task(**self.kwargs)
+        t2.parent = t1
+        t3.parent = t2
+        DBSession.add_all([t1, t2, t3, t4])
+        DBSession.commit()
+
+        t2.parent = t4
+        DBSession.commit()
+
+        self.assertEqual(t2.hierarchy_path, '%s|' % t4.id)
+        self.assertEqual(t3.hierarchy_path, '%s|%s|' % (t4.id, t2.id))
+
+        DBSession.expire_all()
+        self.assertEqual(t3.hierarchy_path, '%s|%s|' % (t4.id, t2.id))
+        self.assertEqual(
+            Task.query
+            .filter(Task.hierarchy_path.like('%s|%%' % t4.id))
+            .order_by(Task.id)
+            .all(),
+            [t2, t3]
+        )
+
+    def test_parents_attribute_loads_the_parents_at_once(self):
+        """testing if the parents attribute loads all the parents of a
+        persisted task with one query
+        """
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        self.kwargs['parent'] = None
+        tasks = [Task(**self.kwargs) for i in range(5)]
+        for parent, task in zip(tasks[:-1], tasks[1:]):
+            task.parent = parent
+        DBSession.add_all(tasks)
+        DBSession.commit()
+
+        DBSession.expire_all()
+        leaf_task = Task.query.get(tasks[-1].id)
+
+        statements = []
+
+        def count_statement(conn, cursor, statement, parameters, context,
+                            executemany):
+            statements.append(statement)
+
+        event.listen(Engine, 'before_cursor_execute', count_statement)
+        try:
+            self.assertEqual(leaf_task.parents, tasks[:-1])
+            self.assertEqual(leaf_task.level, 5)
+        finally:
+            event.remove(Engine, 'before_cursor_execute', count_statement)
+
+        self.assertEqual(len(statements), 1)
+
+    def test_walk_hierarchy_loads_the_descendants_at_once(self):
+        """testing if the walk_hierarchy() method loads all the descendants of
+        a persisted task with one query
+        """
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        self.kwargs['parent'] = None
+        t1 = Task(**self.kwargs)
+        t2 = Task(**self.kwargs)
+        t3 = Task(**self.kwargs)
+        t4 = Task(**self.kwargs)
+        t2.parent = t1
+        t3.parent = t2
+        t4.parent = t1
+        DBSession.add_all([t1, t2, t3, t4])
+        DBSession.commit()
+
+        statements = []
+
+        def count_statement(conn, cursor, statement, parameters, context,
+                            executemany):
+            statements.append(statement)
+
+        DBSession.expire_all()
+        root_task = Task.query.get(t1.id)
+        event.listen(Engine, 'before_cursor_execute', count_statement)
+        try:
+            self.assertEqual(
+                list(root_task.walk_hierarchy(method=0)), [t1, t2, t3, t4]
+            )
+            self.assertEqual(
+                list(root_task.walk_hierarchy(method=1)), [t1, t2, t4, t3]
+            )
+        finally:
+            event.remove(Engine, 'before_cursor_execute', count_statement)
+
+        # one query per walk
+        self.assertEqual(len(statements), 2)
+
     def test_responsible_argument_is_skipped(self):
         """testing if the responsible argument can be skipped, then it will use
         the parents responsible or project.lead
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2014 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation;
+# version 2.1 of the License.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+import datetime
+import os
+import stat
+import sys
+import tempfile
+import unittest2
+
+from stalker import (db, defaults, User, Repository, StatusList, Status,
+                     Project, Task, Studio, TaskJugglerScheduler,
+                     TaskJugglerDaemonScheduler)
+from stalker.db.session import DBSession
+from tests.models.test_taskJuggler_scheduler import create_fake_tj3
+
+
+fake_tj3d_source = """#!%(python)s
+# A fake tj3d which does nothing but waiting to be killed
+import os
+import sys
+import time
+
+config_file_full_path = sys.argv[2]
+with open(config_file_full_path + '.pid', 'w') as f:
+    f.write(str(os.getpid()))
+
+while True:
+    time.sleep(0.1)
+"""
+
+fake_tj3client_source = """#!%(python)s
+# A fake tj3client which schedules all the tasks to the same dates
+import os
+import re
+import signal
+import sys
+
+config_file_full_path = sys.argv[2]
+command = sys.argv[3]
+state_file_full_path = config_file_full_path + '.state'
+
+if command == 'add':
+    with open(state_file_full_path, 'w') as f:
+        f.write(sys.argv[4])
+elif command == 'report':
+    with open(state_file_full_path) as f:
+        tjp_file_full_path = f.read()
+    with open(tjp_file_full_path) as f:
+        content = f.read()
+    sys.stdout.write('"Id";"Start";"End";"Resources"\\n')
+    for tjp_id in re.findall('task ([\\w]+) "', content):
+        sys.stdout.write(
+            '"%%s";"2013-04-16-09:00";"2013-04-17-18:00";""\\n' %% tjp_id
+        )
+elif command == 'terminate':
+    with open(config_file_full_path + '.pid') as f:
+        os.kill(int(f.read()), signal.SIGTERM)
+    os.remove(config_file_full_path + '.pid')
+    if os.path.exists(state_file_full_path):
+        os.remove(state_file_full_path)
+"""
+
+
+def create_fake_executable(source):
+    """creates an executable python script with the given source and returns
+    its path
+    """
+    fd, path = tempfile.mkstemp(prefix='fake_tj_')
+    with os.fdopen(fd, 'w') as f:
+        f.write(source % {'python': sys.executable})
+    os.chmod(path, stat.S_IRWXU)
+    return path
+
+
+class TaskJugglerDaemonSchedulerTester(unittest2.TestCase):
+    """tests the stalker.models.scheduler.TaskJugglerDaemonScheduler class
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        db.setup({
+            'sqlalchemy.url': 'sqlite:///:memory:',
+            'sqlalchemy.echo': False
+        })
+        db.init()
+
+        self.test_user1 = User(
+            login='user1',
+            name='User1',
+            email='user1@users.com',
+            password='1234'
+        )
+        DBSession.add(self.test_user1)
+
+        self.test_repo = Repository(name='Test Repository')
+        DBSession.add(self.test_repo)
+
+        test_status1 = Status(name='Status 1', code='STS1')
+        test_proj_status_list = StatusList(
+            name='Project Status List',
+            statuses=[test_status1],
+            target_entity_type='Project'
+        )
+        DBSession.add(test_proj_status_list)
+
+        self.test_proj1 = Project(
+            name='Test Project 1',
+            code='TP1',
+            repository=self.test_repo,
+            status_list=test_proj_status_list
+        )
+        DBSession.add(self.test_proj1)
+
+        self.test_task1 = Task(
+            name='Task1',
+            project=self.test_proj1,
+            resources=[self.test_user1],
+            schedule_timing=10,
+            schedule_unit='h'
+        )
+        DBSession.add(self.test_task1)
+
+        self.test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 0, 0)
+        )
+        DBSession.add(self.test_studio)
+        DBSession.commit()
+
+        # replace the TaskJuggler commands
+        self.original_commands = (
+            defaults.tj_command,
+            defaults.tj_daemon_command,
+            defaults.tj_client_command
+        )
+        defaults.tj_command = create_fake_tj3()
+        defaults.tj_daemon_command = create_fake_executable(fake_tj3d_source)
+        defaults.tj_client_command = \
+            create_fake_executable(fake_tj3client_source)
+
+        self.tj_sched = TaskJugglerDaemonScheduler(
+            studio=self.test_studio,
+            startup_timeout=10
+        )
+
+    def tearDown(self):
+        """clean up the test
+        """
+        self.tj_sched.stop_daemon()
+        for path in [defaults.tj_command, defaults.tj_daemon_command,
+                     defaults.tj_client_command]:
+            if os.path.exists(path):
+                os.remove(path)
+        defaults.tj_command, defaults.tj_daemon_command, \
+            defaults.tj_client_command = self.original_commands
+        DBSession.remove()
+
+    def test_is_a_TaskJugglerScheduler(self):
+        """testing if the TaskJugglerDaemonScheduler is a
+        TaskJugglerScheduler, so it can be used as a Studio.scheduler
+        """
+        self.assertIsInstance(self.tj_sched, TaskJugglerScheduler)
+
+    def test_start_daemon_is_working_properly(self):
+        """testing if the start_daemon() method starts the daemon and
+        stop_daemon() stops it
+        """
+        self.assertFalse(self.tj_sched.is_daemon_alive())
+        self.tj_sched.start_daemon()
+        self.assertTrue(self.tj_sched.is_daemon_alive())
+        process = self.tj_sched.daemon_process
+        config_file_full_path = self.tj_sched.config_file_full_path
+        self.assertTrue(os.path.exists(config_file_full_path))
+
+        self.tj_sched.stop_daemon()
+        self.assertFalse(self.tj_sched.is_daemon_alive())
+        self.assertIsNotNone(process.poll())
+        self.assertFalse(os.path.exists(config_file_full_path))
+
+    def test_start_daemon_raises_RuntimeError_for_unresponsive_daemon(self):
+        """testing if the start_daemon() method raises a RuntimeError if the
+        daemon is not responding
+        """
+        os.remove(defaults.tj_client_command)
+        self.tj_sched.startup_timeout = 0.5
+        self.assertRaises(RuntimeError, self.tj_sched.start_daemon)
+        self.assertIsNone(self.tj_sched.daemon_process)
+
+    def test_schedule_uses_the_daemon(self):
+        """testing if the schedule() method schedules the projects with the
+        daemon and keeps it running between the runs
+        """
+        os.remove(defaults.tj_command)
+        self.tj_sched.schedule()
+        process = self.tj_sched.daemon_process
+        self.assertTrue(self.tj_sched.is_daemon_alive())
+        self.assertEqual(self.tj_sched.fallback_count, 0)
+        self.assertEqual(
+            self.test_task1.computed_start,
+            datetime.datetime(2013, 4, 16, 9, 0)
+        )
+
+        # schedule again
+        self.tj_sched.schedule()
+        self.assertIs(self.tj_sched.daemon_process, process)
+
+    def test_schedule_restarts_a_dead_daemon(self):
+        """testing if the schedule() method restarts the daemon if it is
+        dead
+        """
+        self.tj_sched.start_daemon()
+        process = self.tj_sched.daemon_process
+        process.kill()
+        process.wait()
+
+        self.tj_sched.schedule()
+        self.assertIsNot(self.tj_sched.daemon_process, process)
+        self.assertEqual(self.tj_sched.fallback_count, 0)
+
+    def test_schedule_falls_back_to_tj3(self):
+        """testing if the schedule() method uses the one shot tj3 process if
+        the daemon can not be started
+        """
+        os.remove(defaults.tj_daemon_command)
+        self.tj_sched.schedule()
+        self.assertEqual(self.tj_sched.fallback_count, 1)
+        self.assertEqual(
+            self.test_task1.computed_start,
+            datetime.datetime(2013, 4, 16, 9, 0)
+        )
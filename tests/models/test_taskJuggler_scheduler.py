@@ -21,11 +21,59 @@
 import datetime
 import unittest2
 import os
+import sys
+import stat
+import tempfile
 
 import stalker
 from stalker.db import DBSession
 from stalker import (db, Department, User, Repository, Status, StatusList,
-                     Project, Task, TaskJugglerScheduler, Studio)
+                     Project, Task, TaskJugglerScheduler, Studio,
+                     TimeLog, TJPFragmentCache, TJPResultCache,
+                     ScheduleStats)
+
+
+fake_tj3_source = """#!%(python)s
+# A fake tj3 which schedules all the tasks to the same dates
+import re
+import sys
+
+tjp_file_full_path = sys.argv[1]
+with open(tjp_file_full_path) as f:
+    content = f.read()
+
+# complain if the project ends before min_end
+min_end = %(min_end)r
+project_end = re.findall('project [\\w]+ "[^"]*" [\\d-]+ - ([\\d-]+)', content)[0]
+if min_end and project_end < min_end:
+    sys.stderr.write('Error: Task Task_1 has not been scheduled\\n')
+    sys.exit(1)
+
+csv_file_full_path = \\
+    re.findall('taskreport breakdown "([^"]+)"', content)[0] + '.csv'
+with open(csv_file_full_path, 'w') as f:
+    f.write('"Id";"Start";"End";"Resources"\\n')
+    for tjp_id in re.findall('task ([\\w]+) "', content):
+        f.write(
+            '"%%s";"2013-04-16-09:00";"2013-04-17-18:00";""\\n' %% tjp_id
+        )
+"""
+
+
+def create_fake_tj3(min_end=None):
+    """creates a fake tj3 executable which schedules all the tasks to the
+    same dates and returns its path
+
+    :param str min_end: If given, in "YYYY-MM-DD" format, the fake tj3 will
+      fail with an unscheduled task error if the project ends before it
+    """
+    fd, path = tempfile.mkstemp(prefix='fake_tj3_')
+    with os.fdopen(fd, 'w') as f:
+        f.write(
+            fake_tj3_source % {'python': sys.executable, 'min_end': min_end}
+        )
+    os.chmod(path, stat.S_IRWXU)
+    return path
 
 
 class TaskJugglerSchedulerTester(unittest2.TestCase):
@@ -315,6 +363,506 @@ task Task_45 "Task2" {
         tjp_sched._clean_up()
         self.assertEqual(tjp_content, expected_tjp_content)
 
+    def test_write_tjp_file_is_working_properly(self):
+        """testing if the _write_tjp_file() method streams the same content
+        with the _create_tjp_file_content() method to the tjp file
+        """
+        tjp_sched = TaskJugglerScheduler()
+        test_studio = Studio(
+            name='Test Studio',
+            timing_resolution=datetime.timedelta(minutes=30)
+        )
+        test_studio.start = datetime.datetime(2013, 4, 16, 0, 7)
+        test_studio.end = datetime.datetime(2013, 6, 30, 0, 0)
+        test_studio.now = datetime.datetime(2013, 4, 16, 0, 0)
+        tjp_sched.studio = test_studio
+
+        tjp_sched._create_tjp_file()
+        tjp_sched._create_tjp_file_content()
+        written = tjp_sched._write_tjp_file()
+
+        with open(tjp_sched.tjp_file_full_path) as f:
+            streamed_content = f.read()
+        tjp_sched._clean_up()
+
+        self.assertEqual(streamed_content, tjp_sched.tjp_content)
+        self.assertEqual(written, len(tjp_sched.tjp_content))
+
+    def _read_streamed_tjp_content(self, tjp_sched):
+        """streams the tjp file of the given scheduler and returns its content
+        without the temp file path
+        """
+        tjp_sched._create_tjp_file()
+        tjp_sched._write_tjp_file()
+        with open(tjp_sched.tjp_file_full_path) as f:
+            content = f.read()
+        tjp_sched._clean_up()
+        return content.replace(tjp_sched.temp_file_full_path, '')
+
+    def test_fragment_cache_argument_is_skipped(self):
+        """testing if the fragment_cache attribute will be None if the
+        fragment_cache argument is skipped
+        """
+        tjp_sched = TaskJugglerScheduler()
+        self.assertIsNone(tjp_sched.fragment_cache)
+
+    def test_fragment_cache_is_reused_for_unchanged_projects(self):
+        """testing if the project fragments are spliced in from the
+        fragment_cache for unchanged projects and the content is the same
+        with the uncached one
+        """
+        test_studio = Studio(
+            name='Test Studio',
+            timing_resolution=datetime.timedelta(minutes=30)
+        )
+        test_studio.now = datetime.datetime(2013, 4, 16, 0, 0)
+
+        uncached_sched = TaskJugglerScheduler(studio=test_studio)
+        expected_content = self._read_streamed_tjp_content(uncached_sched)
+
+        cache = TJPFragmentCache()
+        tjp_sched = TaskJugglerScheduler(
+            studio=test_studio,
+            fragment_cache=cache
+        )
+        self.assertEqual(
+            self._read_streamed_tjp_content(tjp_sched),
+            expected_content
+        )
+        self.assertEqual(cache.hits, 0)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(len(cache), 1)
+
+        self.assertEqual(
+            self._read_streamed_tjp_content(tjp_sched),
+            expected_content
+        )
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_fragment_cache_is_invalidated_when_a_task_is_changed(self):
+        """testing if the project fragment is rendered again when one of its
+        tasks is updated
+        """
+        test_studio = Studio(
+            name='Test Studio',
+            timing_resolution=datetime.timedelta(minutes=30)
+        )
+        test_studio.now = datetime.datetime(2013, 4, 16, 0, 0)
+
+        cache = TJPFragmentCache()
+        tjp_sched = TaskJugglerScheduler(
+            studio=test_studio,
+            fragment_cache=cache
+        )
+        self._read_streamed_tjp_content(tjp_sched)
+
+        self.test_task1.schedule_timing = 10
+        self.test_task1.date_updated = \
+            self.test_task1.date_updated + datetime.timedelta(seconds=1)
+        DBSession.commit()
+
+        content = self._read_streamed_tjp_content(tjp_sched)
+        self.assertEqual(cache.hits, 0)
+        self.assertEqual(cache.misses, 2)
+        self.assertIn('effort 10.0h', content)
+
+        # adding a new task
+        new_task = Task(
+            name='Task3',
+            project=self.test_proj1,
+            resources=[self.test_user1],
+            schedule_timing=5,
+            schedule_unit='h',
+            status_list=self.test_task_status_list
+        )
+        DBSession.add(new_task)
+        DBSession.commit()
+
+        content = self._read_streamed_tjp_content(tjp_sched)
+        self.assertEqual(cache.misses, 3)
+        self.assertIn(new_task.tjp_id, content)
+
+    def test_fragment_cache_invalidate_is_working_properly(self):
+        """testing if the TJPFragmentCache.invalidate() method removes the
+        cached fragments
+        """
+        test_studio = Studio(name='Test Studio')
+        cache = TJPFragmentCache()
+        tjp_sched = TaskJugglerScheduler(
+            studio=test_studio,
+            fragment_cache=cache
+        )
+        self._read_streamed_tjp_content(tjp_sched)
+        self.assertEqual(len(cache), 1)
+        cache.invalidate(self.test_proj1)
+        self.assertEqual(len(cache), 0)
+
+        self._read_streamed_tjp_content(tjp_sched)
+        self.assertEqual(cache.misses, 2)
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+
+    def test_parallel_argument_is_skipped(self):
+        """testing if the parallel attribute will be False if the parallel
+        argument is skipped
+        """
+        tjp_sched = TaskJugglerScheduler()
+        self.assertFalse(tjp_sched.parallel)
+
+    def test_partition_projects_is_working_properly(self):
+        """testing if the _partition_projects() method returns the projects
+        which are not sharing any resources in separate clusters
+        """
+        test_proj2 = Project(
+            name='Test Project 2',
+            code='TP2',
+            repository=self.test_repo,
+            status_list=self.test_proj_status_list
+        )
+        test_proj3 = Project(
+            name='Test Project 3',
+            code='TP3',
+            repository=self.test_repo,
+            status_list=self.test_proj_status_list
+        )
+        # test_proj2 is sharing user1 with test_proj1
+        task3 = Task(
+            name='Task3',
+            project=test_proj2,
+            resources=[self.test_user1],
+            status_list=self.test_task_status_list
+        )
+        # test_proj3 is using user6 only
+        task4 = Task(
+            name='Task4',
+            project=test_proj3,
+            resources=[self.test_user6],
+            status_list=self.test_task_status_list
+        )
+        DBSession.add_all([test_proj2, test_proj3, task3, task4])
+        DBSession.commit()
+
+        tjp_sched = TaskJugglerScheduler()
+        clusters = tjp_sched._partition_projects(
+            [self.test_proj1, test_proj2, test_proj3]
+        )
+        self.assertEqual(
+            sorted([sorted([p.name for p in c]) for c in clusters]),
+            [['Test Project 1', 'Test Project 2'], ['Test Project 3']]
+        )
+
+        # now connect them with a task dependency
+        task4.depends = [task3]
+        DBSession.commit()
+        clusters = tjp_sched._partition_projects(
+            [self.test_proj1, test_proj2, test_proj3]
+        )
+        self.assertEqual(len(clusters), 1)
+
+    def test_partition_projects_uses_departments(self):
+        """testing if the _partition_projects() method puts the projects
+        using the users of the same department in to the same cluster
+        """
+        test_proj2 = Project(
+            name='Test Project 2',
+            code='TP2',
+            repository=self.test_repo,
+            status_list=self.test_proj_status_list
+        )
+        task3 = Task(
+            name='Task3',
+            project=test_proj2,
+            resources=[self.test_user6],
+            status_list=self.test_task_status_list
+        )
+        DBSession.add_all([test_proj2, task3])
+        DBSession.commit()
+
+        tjp_sched = TaskJugglerScheduler()
+        self.assertEqual(
+            len(tjp_sched._partition_projects([self.test_proj1, test_proj2])),
+            2
+        )
+
+        self.test_user6.departments.append(self.test_dep1)
+        DBSession.commit()
+        self.assertEqual(
+            len(tjp_sched._partition_projects([self.test_proj1, test_proj2])),
+            1
+        )
+
+    def test_schedule_in_parallel_is_working_properly(self):
+        """testing if the independent projects are scheduled with separate
+        tjp files and the results are applied for all of them
+        """
+        test_proj2 = Project(
+            name='Test Project 2',
+            code='TP2',
+            repository=self.test_repo,
+            status_list=self.test_proj_status_list
+        )
+        task3 = Task(
+            name='Task3',
+            project=test_proj2,
+            resources=[self.test_user6],
+            schedule_timing=10,
+            schedule_unit='h',
+            status_list=self.test_task_status_list
+        )
+        DBSession.add_all([test_proj2, task3])
+        test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 0, 0)
+        )
+        DBSession.add(test_studio)
+        DBSession.commit()
+
+        tj_command = stalker.defaults.tj_command
+        stalker.defaults.tj_command = create_fake_tj3()
+        try:
+            tjp_sched = TaskJugglerScheduler(
+                studio=test_studio,
+                parallel=True,
+                processes=2
+            )
+            tjp_sched.schedule()
+        finally:
+            os.remove(stalker.defaults.tj_command)
+            stalker.defaults.tj_command = tj_command
+
+        expected_start = datetime.datetime(2013, 4, 16, 9, 0)
+        expected_end = datetime.datetime(2013, 4, 17, 18, 0)
+        for entity in [self.test_proj1, test_proj2, self.test_task1,
+                       self.test_task2, task3]:
+            self.assertEqual(entity.computed_start, expected_start)
+            self.assertEqual(entity.computed_end, expected_end)
+
+    def test_result_cache_argument_is_skipped(self):
+        """testing if the result_cache attribute will be None if the
+        result_cache argument is skipped
+        """
+        tjp_sched = TaskJugglerScheduler()
+        self.assertIsNone(tjp_sched.result_cache)
+
+    def test_schedule_uses_the_result_cache(self):
+        """testing if the schedule() method skips running TaskJuggler when
+        the same tjp file is scheduled before
+        """
+        test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 0, 0)
+        )
+        DBSession.add(test_studio)
+        DBSession.commit()
+
+        cache_path = tempfile.mkdtemp()
+        result_cache = TJPResultCache(path=cache_path)
+        tjp_sched = TaskJugglerScheduler(
+            studio=test_studio,
+            result_cache=result_cache
+        )
+
+        tj_command = stalker.defaults.tj_command
+        stalker.defaults.tj_command = create_fake_tj3()
+        try:
+            tjp_sched.schedule()
+            self.assertEqual(result_cache.misses, 1)
+            self.assertEqual(len(result_cache), 1)
+
+            # remove the computed dates and the fake tj3
+            self.test_task1.computed_start = None
+            self.test_task1.computed_end = None
+            DBSession.commit()
+            os.remove(stalker.defaults.tj_command)
+
+            # it should not need tj3 anymore
+            tjp_sched.schedule()
+            self.assertEqual(result_cache.hits, 1)
+        finally:
+            if os.path.exists(stalker.defaults.tj_command):
+                os.remove(stalker.defaults.tj_command)
+            stalker.defaults.tj_command = tj_command
+            result_cache.clear()
+            os.rmdir(cache_path)
+
+        self.assertEqual(
+            self.test_task1.computed_start,
+            datetime.datetime(2013, 4, 16, 9, 0)
+        )
+        self.assertEqual(
+            self.test_task1.computed_end,
+            datetime.datetime(2013, 4, 17, 18, 0)
+        )
+
+    def test_get_schedule_start_without_time_logs(self):
+        """testing if the _get_schedule_start() method returns the start of
+        the day of Studio.now if there are no TimeLogs
+        """
+        test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 13, 0)
+        )
+        tjp_sched = TaskJugglerScheduler(studio=test_studio)
+        self.assertEqual(
+            tjp_sched._get_schedule_start(),
+            datetime.datetime(2013, 4, 16, 0, 0)
+        )
+
+    def test_get_schedule_start_with_time_logs(self):
+        """testing if the _get_schedule_start() method returns the start of
+        the earliest TimeLog of the active projects
+        """
+        time_log = TimeLog(
+            task=self.test_task1,
+            resource=self.test_user1,
+            start=datetime.datetime(2013, 4, 1, 10, 0),
+            end=datetime.datetime(2013, 4, 1, 12, 0)
+        )
+        DBSession.add(time_log)
+        DBSession.commit()
+
+        test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 13, 0)
+        )
+        tjp_sched = TaskJugglerScheduler(studio=test_studio)
+        self.assertEqual(
+            tjp_sched._get_schedule_start(),
+            datetime.datetime(2013, 4, 1, 10, 0)
+        )
+
+        # deactivate the project
+        self.test_proj1.active = False
+        DBSession.commit()
+        self.assertEqual(
+            tjp_sched._get_schedule_start(),
+            datetime.datetime(2013, 4, 16, 0, 0)
+        )
+
+    def test_update_schedule_horizon_is_working_properly(self):
+        """testing if the _update_schedule_horizon() method sets the end to at
+        least one month after the start and keeps the recorded end otherwise
+        """
+        test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 13, 0)
+        )
+        tjp_sched = TaskJugglerScheduler(studio=test_studio)
+        tjp_sched._update_schedule_horizon()
+        self.assertEqual(test_studio.start, datetime.datetime(2013, 4, 16))
+        self.assertEqual(test_studio.end, datetime.datetime(2013, 5, 16))
+
+        # not scheduled before, so the end is not used
+        test_studio._end = datetime.datetime(2013, 10, 1)
+        tjp_sched._update_schedule_horizon()
+        self.assertEqual(test_studio.end, datetime.datetime(2013, 5, 16))
+
+        # scheduled before
+        test_studio.last_scheduled_at = datetime.datetime(2013, 4, 15)
+        test_studio._end = datetime.datetime(2013, 10, 1)
+        tjp_sched._update_schedule_horizon()
+        self.assertEqual(test_studio.start, datetime.datetime(2013, 4, 16))
+        self.assertEqual(test_studio.end, datetime.datetime(2013, 10, 1))
+
+    def test_schedule_extends_the_horizon_with_fibonacci_series(self):
+        """testing if the schedule() method extends the Studio.end by 2, 3, 5
+        ... months as long as TaskJuggler complains about unscheduled tasks
+        and records the final horizon on the Studio
+        """
+        test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 0, 0)
+        )
+        DBSession.add(test_studio)
+        DBSession.commit()
+        tjp_sched = TaskJugglerScheduler(studio=test_studio)
+
+        tj_command = stalker.defaults.tj_command
+        stalker.defaults.tj_command = create_fake_tj3(min_end='2013-12-01')
+        try:
+            tjp_sched.schedule()
+        finally:
+            os.remove(stalker.defaults.tj_command)
+            stalker.defaults.tj_command = tj_command
+
+        # 1 month + 2 + 3 + 5 months
+        self.assertEqual(test_studio.start, datetime.datetime(2013, 4, 16))
+        self.assertEqual(
+            test_studio.end,
+            datetime.datetime(2013, 4, 16) + datetime.timedelta(days=330)
+        )
+        self.assertEqual(
+            self.test_task1.computed_start,
+            datetime.datetime(2013, 4, 16, 9, 0)
+        )
+
+    def test_schedule_raises_other_errors_without_extending(self):
+        """testing if the schedule() method raises a RuntimeError without
+        extending the horizon for errors other than unscheduled tasks
+        """
+        test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 0, 0)
+        )
+        DBSession.add(test_studio)
+        DBSession.commit()
+        tjp_sched = TaskJugglerScheduler(studio=test_studio)
+        tjp_sched.horizon_error_messages = []
+
+        tj_command = stalker.defaults.tj_command
+        stalker.defaults.tj_command = create_fake_tj3(min_end='2013-12-01')
+        try:
+            self.assertRaises(RuntimeError, tjp_sched.schedule)
+        finally:
+            os.remove(stalker.defaults.tj_command)
+            stalker.defaults.tj_command = tj_command
+
+        self.assertEqual(test_studio.end, datetime.datetime(2013, 5, 16))
+
+    def test_stats_attribute_is_None_by_default(self):
+        """testing if the stats attribute is None before scheduling
+        """
+        tjp_sched = TaskJugglerScheduler()
+        self.assertIsNone(tjp_sched.stats)
+
+    def test_schedule_fills_the_stats_attribute(self):
+        """testing if the schedule() method fills the stats attribute with a
+        ScheduleStats instance
+        """
+        test_studio = Studio(
+            name='Test Studio',
+            now=datetime.datetime(2013, 4, 16, 0, 0)
+        )
+        DBSession.add(test_studio)
+        DBSession.commit()
+        tjp_sched = TaskJugglerScheduler(studio=test_studio)
+
+        tj_command = stalker.defaults.tj_command
+        stalker.defaults.tj_command = create_fake_tj3()
+        try:
+            tjp_sched.schedule()
+        finally:
+            os.remove(stalker.defaults.tj_command)
+            stalker.defaults.tj_command = tj_command
+
+        stats = tjp_sched.stats
+        self.assertIsInstance(stats, ScheduleStats)
+        self.assertEqual(stats.tj3_runs, 1)
+        self.assertEqual(
+            stats.bytes_written,
+            os.path.getsize(tjp_sched.tjp_file_full_path)
+        )
+        # one project and two tasks
+        self.assertEqual(stats.csv_rows, 3)
+        self.assertEqual(stats.db_rows_updated, 3)
+        self.assertTrue(stats.sql_statement_count > 0)
+        self.assertTrue(stats.total_seconds > 0)
+        self.assertEqual(
+            sorted(stats.to_dict().keys()),
+            sorted(ScheduleStats.fields)
+        )
+
     def test_schedule_will_not_work_when_the_studio_attribute_is_None(self):
         """testing if a TypeError will be raised when the studio attribute is
         None
@@ -371,3 +919,350 @@ task Task_45 "Task2" {
             self.test_task2.computed_resources
         )
 
+
+    def _create_csv_file(self, tjp_sched):
+        """creates a csv file for the test tasks like the one TaskJuggler
+        creates
+        """
+        tjp_sched._create_tjp_file()
+        with open(tjp_sched.csv_file_full_path, 'w') as f:
+            f.write(
+                '"Id";"Start";"End";"Resources"\n'
+                '"%(proj)s";"2013-04-16-09:00";"2013-04-19-12:00";""\n'
+                '"%(proj)s.%(t1)s";"2013-04-16-09:00";"2013-04-18-16:00";'
+                '"User4 (%(u4)s), User5 (%(u5)s)"\n'
+                '"%(proj)s.%(t2)s";"2013-04-16-09:00";"2013-04-19-12:00";'
+                '"User1 (%(u1)s), User2 (%(u2)s)"\n' % {
+                    'proj': self.test_proj1.tjp_id,
+                    't1': self.test_task1.tjp_id,
+                    't2': self.test_task2.tjp_id,
+                    'u1': self.test_user1.tjp_id,
+                    'u2': self.test_user2.tjp_id,
+                    'u4': self.test_user4.tjp_id,
+                    'u5': self.test_user5.tjp_id,
+                }
+            )
+
+    def test_preload_argument_is_skipped(self):
+        """testing if the preload attribute will be True by default
+        """
+        tjp_sched = TaskJugglerScheduler()
+        self.assertTrue(tjp_sched.preload)
+
+    def test_tjp_file_is_rendered_with_a_fixed_number_of_queries(self):
+        """testing if the number of the queries used for rendering the tjp
+        file doesn't depend on the number of the tasks when the projects are
+        preloaded
+        """
+        tjp_sched = TaskJugglerScheduler()
+        test_studio = Studio(name='Test Studio',
+                             now=datetime.datetime(2013, 4, 16, 0, 0))
+        DBSession.add(test_studio)
+        tjp_sched.studio = test_studio
+
+        def count_queries():
+            DBSession.commit()
+            stats = ScheduleStats()
+            stats.start()
+            try:
+                tjp_sched._preload(test_studio.active_projects)
+                tjp_sched._create_tjp_file()
+                tjp_sched._write_tjp_file()
+            finally:
+                stats.stop()
+                tjp_sched._clean_up()
+            return stats.sql_statement_count
+
+        def create_tasks(count, hour):
+            """creates count number of tasks with dependencies, resources
+            and time logs under a new parent task
+            """
+            parent = Task(name='Parent %s' % hour, project=self.test_proj1)
+            DBSession.add(parent)
+            for i in range(count):
+                task1 = Task(
+                    name='Task A%s' % i,
+                    parent=parent,
+                    resources=[self.test_user1],
+                    alternative_resources=[self.test_user2, self.test_user3],
+                    schedule_timing=1,
+                    schedule_unit='d'
+                )
+                task2 = Task(
+                    name='Task B%s' % i,
+                    parent=parent,
+                    resources=[self.test_user2],
+                    depends=[task1],
+                    schedule_timing=1,
+                    schedule_unit='d'
+                )
+                time_log = TimeLog(
+                    task=task1,
+                    resource=self.test_user1,
+                    start=datetime.datetime(2013, 4, 1, hour + i),
+                    end=datetime.datetime(2013, 4, 1, hour + i + 1)
+                )
+                DBSession.add_all([task1, task2, time_log])
+
+        create_tasks(1, 0)
+        query_count = count_queries()
+
+        create_tasks(10, 1)
+        self.assertEqual(query_count, count_queries())
+
+        # without preloading every relation is queried one by one
+        tjp_sched.preload = False
+        self.assertTrue(count_queries() > query_count + 50)
+
+    def _create_hourly_time_logs(self):
+        """creates consecutive hourly time logs for the resources of the
+        test_task1
+        """
+        for resource in self.test_task1.resources:
+            for i in range(8):
+                DBSession.add(
+                    TimeLog(
+                        task=self.test_task1,
+                        resource=resource,
+                        start=datetime.datetime(2013, 4, 15, 9 + i),
+                        end=datetime.datetime(2013, 4, 15, 10 + i)
+                    )
+                )
+        DBSession.commit()
+
+    def test_compact_bookings_argument_is_skipped(self):
+        """testing if the compact_bookings attribute will be False by default
+        """
+        tjp_sched = TaskJugglerScheduler()
+        self.assertFalse(tjp_sched.compact_bookings)
+
+    def test_compact_bookings_argument_is_working_properly(self):
+        """testing if the touching time logs are exported as one booking and
+        the tjp file gets smaller when the compact_bookings argument is True
+        """
+        self._create_hourly_time_logs()
+        test_studio = Studio(name='Test Studio',
+                             now=datetime.datetime(2013, 4, 16, 0, 0))
+        DBSession.add(test_studio)
+        DBSession.commit()
+
+        def export(compact_bookings, fragment_cache=None):
+            tjp_sched = TaskJugglerScheduler(
+                studio=test_studio,
+                compact_bookings=compact_bookings,
+                fragment_cache=fragment_cache
+            )
+            tjp_sched._create_tjp_file()
+            tjp_sched._write_tjp_file()
+            with open(tjp_sched.tjp_file_full_path) as f:
+                content = f.read()
+            tjp_sched._clean_up()
+            return content
+
+        content = export(False)
+        compacted_content = export(True)
+
+        self.assertEqual(content.count('booking '), 16)
+        self.assertEqual(compacted_content.count('booking '), 2)
+        self.assertLess(len(compacted_content), len(content))
+        for resource in self.test_task1.resources:
+            self.assertIn(
+                'booking %s 2013-04-15-09:00:00 +8h { overtime 2 }' %
+                resource.tjp_id,
+                compacted_content
+            )
+
+        # the fragment cache should not mix the fragments of the two modes
+        fragment_cache = TJPFragmentCache()
+        self.assertEqual(
+            compacted_content.count('booking '),
+            export(True, fragment_cache).count('booking ')
+        )
+        self.assertEqual(
+            content.count('booking '),
+            export(False, fragment_cache).count('booking ')
+        )
+
+    def test_tasks_are_correctly_scheduled_with_compact_bookings(self):
+        """testing if the tasks are scheduled exactly the same with and
+        without compacting the bookings
+        """
+        self._create_hourly_time_logs()
+        test_studio = Studio(name='Test Studio',
+                             now=datetime.datetime(2013, 4, 16, 0, 0))
+        test_studio.daily_working_hours = 9
+        DBSession.add(test_studio)
+
+        def schedule(compact_bookings):
+            tjp_sched = TaskJugglerScheduler(
+                studio=test_studio,
+                compact_bookings=compact_bookings
+            )
+            tjp_sched.schedule()
+            DBSession.commit()
+            return [
+                (entity.computed_start, entity.computed_end,
+                 sorted(r.id for r in entity.computed_resources))
+                for entity in [self.test_task1, self.test_task2]
+            ] + [(self.test_proj1.computed_start,
+                  self.test_proj1.computed_end)]
+
+        self.assertEqual(schedule(False), schedule(True))
+
+    def test_projects_attribute_freezes_the_load_of_the_other_projects(self):
+        """testing if only the projects in the projects attribute are placed
+        in to the tjp file and the load of the resources coming from the
+        other active projects are placed as vacations of the resources
+        """
+        dt = datetime.datetime
+        self.test_task1.computed_start = dt(2013, 4, 16, 9, 0)
+        self.test_task1.computed_end = dt(2013, 4, 18, 16, 0)
+        self.test_task1.computed_resources = [self.test_user4, self.test_user5]
+
+        # no computed resources, so the resources are frozen
+        self.test_task2.computed_start = dt(2013, 4, 17, 9, 0)
+        self.test_task2.computed_end = dt(2013, 4, 19, 12, 0)
+        self.test_task2.computed_resources = []
+
+        test_proj2 = Project(
+            name='Test Project 2',
+            code='TP2',
+            repository=self.test_repo,
+            status_list=self.test_proj_status_list
+        )
+        test_task3 = Task(
+            name='Task3',
+            project=test_proj2,
+            resources=[self.test_user1],
+            schedule_timing=10,
+            schedule_unit='h'
+        )
+        test_studio = Studio(name='Test Studio',
+                             now=dt(2013, 4, 16, 0, 0))
+        DBSession.add_all([test_proj2, test_task3, test_studio])
+        DBSession.commit()
+
+        tjp_sched = TaskJugglerScheduler(studio=test_studio)
+        tjp_sched.projects = [test_proj2]
+        tjp_sched._frozen_load = tjp_sched._get_frozen_load()
+        self.assertEqual(
+            [(self.test_user1, [(dt(2013, 4, 17, 9, 0),
+                                 dt(2013, 4, 19, 12, 0))]),
+             (self.test_user2, [(dt(2013, 4, 17, 9, 0),
+                                 dt(2013, 4, 19, 12, 0))]),
+             (self.test_user4, [(dt(2013, 4, 16, 9, 0),
+                                 dt(2013, 4, 18, 16, 0))]),
+             (self.test_user5, [(dt(2013, 4, 16, 9, 0),
+                                 dt(2013, 4, 18, 16, 0))])],
+            tjp_sched._frozen_load
+        )
+
+        tjp_sched._create_tjp_file()
+        tjp_sched._write_tjp_file()
+        with open(tjp_sched.tjp_file_full_path) as f:
+            content = f.read()
+        tjp_sched._clean_up()
+
+        self.assertIn('task %s ' % test_proj2.tjp_id, content)
+        self.assertNotIn('task %s ' % self.test_proj1.tjp_id, content)
+        self.assertIn(
+            'supplement resource %s {' % self.test_user1.tjp_id, content
+        )
+        self.assertIn(
+            'vacation 2013-04-17-09:00:00 - 2013-04-19-12:00:00', content
+        )
+        self.assertIn(
+            'vacation 2013-04-16-09:00:00 - 2013-04-18-16:00:00', content
+        )
+
+        # nothing is frozen when all the projects are scheduled
+        tjp_sched.projects = None
+        self.assertEqual([], tjp_sched._get_frozen_load())
+
+    def test_bulk_apply_argument_is_skipped(self):
+        """testing if the bulk_apply attribute will be True by default
+        """
+        tjp_sched = TaskJugglerScheduler()
+        self.assertTrue(tjp_sched.bulk_apply)
+
+    def test_parse_csv_file_is_working_properly_in_bulk_mode(self):
+        """testing if the _parse_csv_file() method will fill the computed
+        values of the tasks with set based statements when the bulk_apply
+        attribute is True
+        """
+        tjp_sched = TaskJugglerScheduler(bulk_apply=True)
+        self._create_csv_file(tjp_sched)
+        tjp_sched._parse_csv_file()
+        tjp_sched._clean_up()
+
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 9, 0),
+            self.test_proj1.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 19, 12, 0),
+            self.test_proj1.computed_end
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 9, 0),
+            self.test_task1.computed_start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 18, 16, 0),
+            self.test_task1.computed_end
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 16, 9, 0),
+            self.test_task1.start
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 18, 16, 0),
+            self.test_task1.end
+        )
+        self.assertItemsEqual(
+            [self.test_user4, self.test_user5],
+            self.test_task1.computed_resources
+        )
+        self.assertEqual(
+            datetime.datetime(2013, 4, 19, 12, 0),
+            self.test_task2.computed_end
+        )
+        self.assertItemsEqual(
+            [self.test_user1, self.test_user2],
+            self.test_task2.computed_resources
+        )
+
+    def test_parse_csv_file_bulk_and_per_row_results_are_the_same(self):
+        """testing if the _parse_csv_file() method will give the same results
+        in bulk and per row modes
+        """
+        tjp_sched = TaskJugglerScheduler(bulk_apply=False)
+        self._create_csv_file(tjp_sched)
+        tjp_sched._parse_csv_file()
+        DBSession.commit()
+
+        tasks = [self.test_task1, self.test_task2]
+        per_row_results = [
+            (t.computed_start, t.computed_end, t.start, t.end, t.duration,
+             sorted([r.id for r in t.computed_resources]))
+            for t in tasks
+        ]
+
+        # reset the values
+        for t in tasks:
+            t.computed_start = None
+            t.computed_end = None
+            t.computed_resources = []
+        DBSession.commit()
+
+        tjp_sched.bulk_apply = True
+        tjp_sched._parse_csv_file()
+        tjp_sched._clean_up()
+        DBSession.commit()
+
+        bulk_results = [
+            (t.computed_start, t.computed_end, t.start, t.end, t.duration,
+             sorted([r.id for r in t.computed_resources]))
+            for t in tasks
+        ]
+        self.assertEqual(per_row_results, bulk_results)
@@ -24,6 +24,8 @@ import unittest2
 from stalker.db import DBSession
 from stalker import (db, Status, User, Repository, Structure, StatusList,
                      Project, Task, TaskDependency, defaults)
+from stalker.exceptions import CircularDependencyError
+from stalker.models.task import TaskDependencyGraph
 
 
 class TaskDependencyTestCase(unittest2.TestCase):
@@ -480,3 +482,62 @@ class TaskDependencyTestCase(unittest2.TestCase):
         onstart = 'onstart'
         tdep.dependency_target = onstart
         self.assertEqual(onstart, tdep.dependency_target)
+
+    def test_creating_a_circular_dependency_raises_circular_dependency_error(
+            self):
+        """testing if a CircularDependencyError will be raised when a
+        TaskDependency which creates a circular dependency is created
+        """
+        TaskDependency(**self.kwargs)
+        self.kwargs['task'] = self.test_task2
+        self.kwargs['depends_to'] = self.test_task1
+        self.assertRaises(CircularDependencyError, TaskDependency,
+                          **self.kwargs)
+
+    def test_dependency_graph_is_updated_when_a_dependency_is_removed(self):
+        """testing if the TaskDependencyGraph is updated when a dependency is
+        removed and the reverse dependency can be created
+        """
+        self.test_task2.depends = [self.test_task3]
+        self.test_task1.depends = [self.test_task2]
+        DBSession.commit()
+
+        graph = TaskDependencyGraph.get_graph()
+        self.assertTrue(graph.has_path(self.test_task1, self.test_task3))
+
+        self.test_task2.depends.remove(self.test_task3)
+        self.assertFalse(graph.has_path(self.test_task1, self.test_task3))
+        self.test_task3.depends = [self.test_task1]
+        self.assertTrue(graph.has_path(self.test_task3, self.test_task2))
+
+    def test_dependency_graph_reorders_the_tasks_when_needed(self):
+        """testing if the TaskDependencyGraph updates the order of the tasks
+        when a dependency connects two groups of dependent tasks
+        """
+        test_task4 = Task(name='Test Task 4', project=self.test_project1)
+        self.test_task1.depends = [self.test_task2]
+        self.test_task3.depends = [test_task4]
+        test_task4.depends = [self.test_task1]
+
+        graph = TaskDependencyGraph.get_graph()
+        self.assertTrue(graph.has_path(self.test_task3, self.test_task2))
+        self.assertFalse(graph.has_path(self.test_task2, self.test_task3))
+        self.assertRaises(CircularDependencyError, setattr, self.test_task2,
+                          'depends', [self.test_task3])
+
+    def test_dependency_graph_rebuild_is_working_properly(self):
+        """testing if the TaskDependencyGraph.rebuild() loads the dependencies
+        from the database
+        """
+        self.test_task1.depends = [self.test_task2]
+        self.test_task2.depends = [self.test_task3]
+        DBSession.commit()
+
+        graph = TaskDependencyGraph.get_graph()
+        graph.rebuild()
+        self.assertIn(self.test_task1, graph)
+        self.assertIn(self.test_task3, graph)
+        self.assertTrue(graph.has_path(self.test_task1, self.test_task3))
+        self.assertFalse(graph.has_path(self.test_task3, self.test_task1))
+        self.assertRaises(CircularDependencyError, setattr, self.test_task3,
+                          'depends', [self.test_task1])
@@ -3413,3 +3413,390 @@ class TaskStatusWorkflowTestCase(unittest2.TestCase):
         """
         self.test_task9.status = self.status_cmpl
         self.assertRaises(StatusError, self.test_task9.approve)
+
+    def test_status_propagation_does_not_query_the_statuses_one_by_one(self):
+        """testing if the Statuses are resolved with the StatusRegistry and
+        not queried one by one by their codes while the statuses are
+        propagated
+        """
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        self.test_task9.depends = []
+        self.test_task6.depends = [self.test_task9]
+        DBSession.commit()
+
+        statements = []
+
+        def count_statement(conn, cursor, statement, parameters, context,
+                            executemany):
+            statements.append(statement)
+
+        event.listen(Engine, 'before_cursor_execute', count_statement)
+        try:
+            now = datetime.datetime.now()
+            self.test_task9.create_time_log(
+                resource=self.test_task9.resources[0],
+                start=now,
+                end=now + datetime.timedelta(hours=1)
+            )
+            self.test_task9.request_review()
+            self.test_task9.approve()
+        finally:
+            event.remove(Engine, 'before_cursor_execute', count_statement)
+
+        self.assertEqual(self.test_task9.status, self.status_cmpl)
+        self.assertEqual(self.test_task6.status, self.status_rts)
+        self.assertEqual(
+            [statement for statement in statements
+             if '"Statuses".code = ' in statement],
+            []
+        )
+
+    def test_deferred_status_propagation_updates_the_statuses_on_flush(self):
+        """testing if the statuses are propagated when the session is flushed
+        in deferred mode and the results are the same with the immediate mode
+        """
+        from stalker.models.status import StatusPropagator
+
+        self.test_task9.depends = []
+        self.test_task6.depends = [self.test_task9]
+        self.test_task9.status = self.status_wip
+        self.test_task7.status = self.status_wip
+        self.test_task8.status = self.status_wip
+        self.test_task2.status = self.status_wip
+        self.test_task4.status = self.status_wfd
+        self.test_task5.status = self.status_wfd
+        self.test_task6.status = self.status_wfd
+        self.test_asset1.status = self.status_wfd
+        DBSession.commit()
+
+        propagator = StatusPropagator.get_propagator()
+        propagator.mode = 'deferred'
+
+        # the autoflush also propagates the statuses
+        with DBSession.no_autoflush:
+            now = datetime.datetime.now()
+            self.test_task9.create_time_log(
+                resource=self.test_task9.resources[0],
+                start=now,
+                end=now + datetime.timedelta(hours=1)
+            )
+            self.test_task9.request_review()
+            self.test_task9.approve()
+            self.assertEqual(self.test_task9.status, self.status_cmpl)
+
+            # not propagated yet
+            self.assertTrue(propagator.has_pending)
+            self.assertEqual(self.test_asset1.status, self.status_wfd)
+            self.assertEqual(self.test_task6.status, self.status_wfd)
+
+        DBSession.flush()
+        self.assertFalse(propagator.has_pending)
+        self.assertEqual(self.test_asset1.status, self.status_cmpl)
+        self.assertEqual(self.test_task7.status, self.status_cmpl)
+        self.assertEqual(self.test_task2.status, self.status_wip)
+        self.assertEqual(self.test_task6.status, self.status_rts)
+        self.assertEqual(self.test_task1.status, self.status_rts)
+
+    def test_deferred_status_propagation_updates_the_containers_once(self):
+        """testing if each container is updated only once in deferred mode
+        when the statuses of many children are changed
+        """
+        from stalker.models.status import StatusPropagator
+
+        children = []
+        for i in range(20):
+            child = Task(
+                name='Child Task %s' % i,
+                parent=self.test_task6,
+                status_list=self.test_task_statuses,
+                resources=[self.test_user1],
+                schedule_timing=10,
+                schedule_unit='h'
+            )
+            children.append(child)
+        DBSession.add_all(children)
+        DBSession.commit()
+
+        updated_tasks = []
+        original_method = Task._update_status_with_children_statuses
+
+        def update_status_with_children_statuses(task, use_sql=True):
+            updated_tasks.append(task)
+            return original_method(task, use_sql=use_sql)
+
+        Task._update_status_with_children_statuses = \
+            update_status_with_children_statuses
+        try:
+            StatusPropagator.get_propagator().mode = 'deferred'
+            with DBSession.no_autoflush:
+                for child in children:
+                    child.status = self.status_wip
+                    child.update_parent_statuses()
+            DBSession.commit()
+        finally:
+            Task._update_status_with_children_statuses = original_method
+
+        self.assertEqual(updated_tasks, [self.test_task6, self.test_task1])
+        self.assertEqual(self.test_task6.status, self.status_wip)
+        self.assertEqual(self.test_task1.status, self.status_wip)
+
+    def test_bulk_hold_in_WIP_and_DREV_leaf_tasks(self):
+        """testing if the bulk_hold() method will set the given tasks to OH
+        """
+        self.test_task3.status = self.status_wip
+        self.test_task8.status = self.status_drev
+        self.test_task9.status = self.status_wip
+        self.test_task9.priority = 500
+
+        Task.bulk_hold([self.test_task3, self.test_task8, self.test_task9])
+
+        self.assertEqual(self.test_task3.status, self.status_oh)
+        self.assertEqual(self.test_task8.status, self.status_oh)
+        self.assertEqual(self.test_task9.status, self.status_oh)
+        self.assertEqual(self.test_task9.priority, 0)
+
+    def test_bulk_hold_validates_all_tasks_before_changing_them(self):
+        """testing if a StatusError will be raised and none of the tasks will
+        be changed if one of the tasks given to bulk_hold() can not be set to
+        OH
+        """
+        self.test_task3.status = self.status_wip
+        self.test_task8.status = self.status_wip
+        self.test_task9.status = self.status_cmpl
+
+        self.assertRaises(
+            StatusError, Task.bulk_hold,
+            [self.test_task3, self.test_task8, self.test_task9]
+        )
+
+        self.assertEqual(self.test_task3.status, self.status_wip)
+        self.assertEqual(self.test_task8.status, self.status_wip)
+        self.assertEqual(self.test_task9.status, self.status_cmpl)
+
+    def test_bulk_hold_tasks_argument_is_not_a_list_of_tasks(self):
+        """testing if a TypeError will be raised when the tasks argument of
+        bulk_hold() contains other objects than Tasks
+        """
+        self.test_task3.status = self.status_wip
+        self.assertRaises(
+            TypeError, Task.bulk_hold, [self.test_task3, 'not a task']
+        )
+        self.assertEqual(self.test_task3.status, self.status_wip)
+
+    def test_bulk_stop_updates_parents_and_dependencies(self):
+        """testing if the bulk_stop() method will stop the given tasks and
+        update the statuses of their parents and dependent tasks the same way
+        that stop() does
+        """
+        self.test_task3.status = self.status_wip
+        self.test_task4.status = self.status_wfd
+        self.test_task8.status = self.status_wip
+        self.test_task9.status = self.status_drev
+        DBSession.commit()
+
+        Task.bulk_stop([self.test_task3, self.test_task8, self.test_task9])
+
+        self.assertEqual(self.test_task3.status, self.status_stop)
+        self.assertEqual(self.test_task8.status, self.status_stop)
+        self.assertEqual(self.test_task9.status, self.status_stop)
+        # the dependent task is now free to start
+        self.assertEqual(self.test_task4.status, self.status_rts)
+        self.assertEqual(self.test_asset1.status, self.status_cmpl)
+        self.assertEqual(self.test_task7.status, self.status_cmpl)
+        self.assertEqual(self.test_task2.status, self.status_cmpl)
+
+    def test_bulk_stop_updates_the_containers_once(self):
+        """testing if the bulk_stop() method will update each container only
+        once
+        """
+        children = []
+        for i in range(20):
+            child = Task(
+                name='Child Task %s' % i,
+                parent=self.test_task6,
+                status_list=self.test_task_statuses,
+                resources=[self.test_user1],
+                schedule_timing=10,
+                schedule_unit='h'
+            )
+            child.status = self.status_wip
+            children.append(child)
+        DBSession.add_all(children)
+        DBSession.commit()
+
+        updated_tasks = []
+        original_method = Task._update_status_with_children_statuses
+
+        def update_status_with_children_statuses(task, use_sql=True):
+            updated_tasks.append(task)
+            return original_method(task, use_sql=use_sql)
+
+        Task._update_status_with_children_statuses = \
+            update_status_with_children_statuses
+        try:
+            Task.bulk_stop(children)
+        finally:
+            Task._update_status_with_children_statuses = original_method
+
+        self.assertEqual(updated_tasks, [self.test_task6, self.test_task1])
+        self.assertEqual(self.test_task6.status, self.status_cmpl)
+
+    def test_bulk_resume_updates_parents_and_dependencies(self):
+        """testing if the bulk_resume() method will resume the given tasks and
+        update the statuses of their parents
+        """
+        self.test_task8.status = self.status_oh
+        self.test_task9.status = self.status_stop
+        self.test_task7.status = self.status_cmpl
+        self.test_task2.status = self.status_cmpl
+        self.test_asset1.status = self.status_cmpl
+        DBSession.commit()
+
+        Task.bulk_resume([self.test_task8, self.test_task9])
+
+        self.assertEqual(self.test_task8.status, self.status_wip)
+        self.assertEqual(self.test_task9.status, self.status_wip)
+        self.assertEqual(self.test_asset1.status, self.status_wip)
+        self.assertEqual(self.test_task7.status, self.status_wip)
+        self.assertEqual(self.test_task2.status, self.status_wip)
+
+    def test_bulk_approve_in_PREV_leaf_tasks(self):
+        """testing if the bulk_approve() method will approve the given tasks
+        and update the statuses of their parents and dependent tasks
+        """
+        self.test_task3.status = self.status_wip
+        self.test_task4.status = self.status_wfd
+        self.test_task8.status = self.status_wip
+        self.test_task9.status = self.status_wip
+        self.test_task3.request_review()
+        self.test_task8.request_review()
+        self.test_task9.request_review()
+        DBSession.commit()
+
+        Task.bulk_approve([self.test_task3, self.test_task8, self.test_task9])
+
+        self.assertEqual(self.test_task3.status, self.status_cmpl)
+        self.assertEqual(self.test_task8.status, self.status_cmpl)
+        self.assertEqual(self.test_task9.status, self.status_cmpl)
+        for review in self.test_task9.reviews:
+            self.assertEqual(review.status.code, 'APP')
+        self.assertEqual(self.test_task4.status, self.status_rts)
+        self.assertEqual(self.test_task2.status, self.status_cmpl)
+
+    def test_bulk_approve_processes_the_same_task_once(self):
+        """testing if the bulk_approve() method will approve a task only once
+        even if it is given more than once
+        """
+        self.test_task9.status = self.status_wip
+        self.test_task9.request_review()
+        DBSession.commit()
+        review_number = self.test_task9.review_number
+
+        Task.bulk_approve([self.test_task9, self.test_task9])
+
+        self.assertEqual(self.test_task9.status, self.status_cmpl)
+        self.assertEqual(self.test_task9.review_number, review_number + 1)
+
+    def test_bulk_actions_restore_the_propagation_mode(self):
+        """testing if the propagation mode is restored after a bulk action
+        """
+        from stalker.models.status import StatusPropagator
+        self.test_task8.status = self.status_oh
+        Task.bulk_resume([self.test_task8])
+
+        propagator = StatusPropagator.get_propagator()
+        self.assertEqual(propagator.mode, 'immediate')
+        self.assertFalse(propagator.has_pending)
+
+    def test_update_task_statuses_of_project_repairs_the_statuses(self):
+        """testing if the Project.update_task_statuses() method will update
+        the statuses of all the tasks of the project by looking at their
+        dependencies and children, the changes are propagated to the dependent
+        tasks and parents in one pass
+        """
+        self.test_task3.status = self.status_wip
+        # depends to task3 which is WIP
+        self.test_task4.status = self.status_cmpl
+        # depends to task4 which will be DREV
+        self.test_task5.status = self.status_rts
+        self.test_task6.status = self.status_wip
+        self.test_task1.status = self.status_cmpl
+        self.test_task8.status = self.status_cmpl
+        self.test_task9.status = self.status_drev
+        self.test_asset1.status = self.status_wfd
+        self.test_task7.status = self.status_rts
+        self.test_task2.status = self.status_rts
+        DBSession.commit()
+
+        updated_task_ids = self.test_project1.update_task_statuses()
+
+        self.assertEqual(
+            sorted(updated_task_ids),
+            sorted([self.test_task1.id, self.test_task2.id,
+                    self.test_task4.id, self.test_task5.id,
+                    self.test_task7.id, self.test_asset1.id])
+        )
+        self.assertEqual(self.test_task3.status, self.status_wip)
+        self.assertEqual(self.test_task4.status, self.status_drev)
+        self.assertEqual(self.test_task5.status, self.status_wfd)
+        self.assertEqual(self.test_task6.status, self.status_wip)
+        self.assertEqual(self.test_task1.status, self.status_wip)
+        self.assertEqual(self.test_task8.status, self.status_cmpl)
+        self.assertEqual(self.test_task9.status, self.status_drev)
+        self.assertEqual(self.test_asset1.status, self.status_wip)
+        self.assertEqual(self.test_task7.status, self.status_wip)
+        self.assertEqual(self.test_task2.status, self.status_wip)
+
+        # the statuses are consistent with the per task methods
+        DBSession.commit()
+        for task in [self.test_task3, self.test_task4, self.test_task5,
+                     self.test_task6, self.test_task8, self.test_task9]:
+            status = task.status
+            task.update_status_with_dependent_statuses()
+            self.assertEqual(task.status, status)
+        for task in [self.test_asset1, self.test_task7, self.test_task1,
+                     self.test_task2]:
+            status = task.status
+            task.update_status_with_children_statuses()
+            self.assertEqual(task.status, status)
+
+    def test_update_task_statuses_of_project_updates_changed_rows_only(self):
+        """testing if the Project.update_task_statuses() method will only
+        update the tasks whose status is changed with one UPDATE statement
+        per status
+        """
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        self.test_task3.status = self.status_cmpl
+        self.test_task4.status = self.status_wfd
+        DBSession.commit()
+
+        statements = []
+
+        def count_statement(conn, cursor, statement, parameters, context,
+                            executemany):
+            if statement.startswith('UPDATE'):
+                statements.append(statement)
+
+        event.listen(Engine, 'before_cursor_execute', count_statement)
+        try:
+            updated_task_ids = self.test_project1.update_task_statuses()
+            DBSession.commit()
+            updated_tasks = Task.query\
+                .filter(Task.id.in_(updated_task_ids)).all()
+            self.assertTrue(self.test_task4 in updated_tasks)
+            self.assertEqual(self.test_task4.status, self.status_rts)
+            self.assertEqual(
+                len(statements),
+                len(set([task.status.code for task in updated_tasks]))
+            )
+
+            # nothing to update anymore
+            statements = []
+            self.assertEqual(self.test_project1.update_task_statuses(), [])
+            self.assertEqual(statements, [])
+        finally:
+            event.remove(Engine, 'before_cursor_execute', count_statement)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2014 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation;
+# version 2.1 of the License.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+import unittest2
+
+from stalker import defaults
+from stalker.models import get_template, clear_template_cache
+
+
+class TemplateRegistryTester(unittest2.TestCase):
+    """tests the stalker.models.get_template() function
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        clear_template_cache()
+
+    def tearDown(self):
+        """clean up the test
+        """
+        if 'tjp_vacation_template' in defaults.__dict__:
+            del defaults.tjp_vacation_template
+        clear_template_cache()
+
+    def test_get_template_returns_a_jinja2_template(self):
+        """testing if get_template() returns a jinja2.Template instance
+        """
+        from jinja2 import Template
+        self.assertIsInstance(
+            get_template('tjp_vacation_template'),
+            Template
+        )
+
+    def test_get_template_is_compiling_the_template_only_once(self):
+        """testing if get_template() returns the same template instance for
+        the same key
+        """
+        template1 = get_template('tjp_task_template', trim_blocks=True)
+        template2 = get_template('tjp_task_template', trim_blocks=True)
+        self.assertIs(template1, template2)
+
+    def test_get_template_environment_options_are_respected(self):
+        """testing if get_template() returns different templates for different
+        environment options
+        """
+        template1 = get_template('tjp_task_template', trim_blocks=True)
+        template2 = get_template('tjp_task_template')
+        self.assertIsNot(template1, template2)
+        self.assertTrue(template1.environment.trim_blocks)
+        self.assertFalse(template2.environment.trim_blocks)
+
+    def test_get_template_is_invalidated_when_defaults_is_changed(self):
+        """testing if get_template() compiles the template again when the
+        template source in defaults is changed
+        """
+        template1 = get_template('tjp_vacation_template')
+        defaults.tjp_vacation_template = 'vacation {{vacation.name}}'
+        template2 = get_template('tjp_vacation_template')
+        self.assertIsNot(template1, template2)
+        self.assertEqual(
+            template2.render({'vacation': {'name': 'test'}}),
+            'vacation test'
+        )
+
+    def test_clear_template_cache_is_working_properly(self):
+        """testing if clear_template_cache() clears the registry
+        """
+        template1 = get_template('tjp_vacation_template')
+        clear_template_cache()
+        template2 = get_template('tjp_vacation_template')
+        self.assertIsNot(template1, template2)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# Stalker a Production Asset Management System
+# Copyright (C) 2009-2014 Erkan Ozgur Yilmaz
+#
+# This file is part of Stalker.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation;
+# version 2.1 of the License.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+import os
+import shutil
+import tempfile
+import unittest2
+
+from stalker import TJPResultCache
+
+
+class TJPResultCacheTester(unittest2.TestCase):
+    """tests the stalker.models.schedulers.TJPResultCache class
+    """
+
+    def setUp(self):
+        """set up the test
+        """
+        self.temp_path = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.temp_path, 'cache')
+        self.cache = TJPResultCache(path=self.cache_path)
+
+    def tearDown(self):
+        """clean up the test
+        """
+        shutil.rmtree(self.temp_path)
+
+    def _write_file(self, file_name, content):
+        """writes the given content to a file in the temp folder and returns
+        its path
+        """
+        path = os.path.join(self.temp_path, file_name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def _write_tjp_file(self, temp_file_full_path, now, tracking=True):
+        """writes a tjp file like file and returns its path
+        """
+        content = 'project Studio_1 "Studio" 2013-04-16 - 2013-06-30 {\n' \
+                  '    now %s\n' % now
+        if tracking:
+            content += '    trackingscenario plan\n'
+        content += '}\ntaskreport breakdown "%s"{\n}\n' % temp_file_full_path
+        return self._write_file(
+            os.path.basename(temp_file_full_path) + '.tjp', content
+        )
+
+    def test_path_argument_is_skipped(self):
+        """testing if the path attribute will be in the temp folder if the
+        path argument is skipped
+        """
+        cache = TJPResultCache()
+        self.assertEqual(
+            cache.path,
+            os.path.join(tempfile.gettempdir(), 'stalker_tjp_result_cache')
+        )
+
+    def test_create_key_skips_the_temp_file_path(self):
+        """testing if the create_key() method returns the same key for the
+        same content with different temp file paths
+        """
+        path1 = os.path.join(self.temp_path, 'Stalker_1')
+        path2 = os.path.join(self.temp_path, 'Stalker_2')
+        self.assertEqual(
+            self.cache.create_key(
+                self._write_tjp_file(path1, '2013-04-16-00:00'), path1
+            ),
+            self.cache.create_key(
+                self._write_tjp_file(path2, '2013-04-16-00:00'), path2
+            )
+        )
+
+    def test_create_key_uses_now_with_tracking_scenario(self):
+        """testing if the create_key() method uses the now line if there is a
+        trackingscenario in the tjp file
+        """
+        path1 = os.path.join(self.temp_path, 'Stalker_1')
+        path2 = os.path.join(self.temp_path, 'Stalker_2')
+        self.assertNotEqual(
+            self.cache.create_key(
+                self._write_tjp_file(path1, '2013-04-16-00:00'), path1
+            ),
+            self.cache.create_key(
+                self._write_tjp_file(path2, '2013-04-17-00:00'), path2
+            )
+        )
+
+    def test_create_key_skips_now_without_tracking_scenario(self):
+        """testing if the create_key() method skips the now line if there is
+        no trackingscenario in the tjp file
+        """
+        path1 = os.path.join(self.temp_path, 'Stalker_1')
+        path2 = os.path.join(self.temp_path, 'Stalker_2')
+        self.assertEqual(
+            self.cache.create_key(
+                self._write_tjp_file(path1, '2013-04-16-00:00', False), path1
+            ),
+            self.cache.create_key(
+                self._write_tjp_file(path2, '2013-04-17-00:00', False), path2
+            )
+        )
+
+    def test_get_and_put_is_working_properly(self):
+        """testing if the get() and put() methods are working properly and
+        the hits and misses are counted
+        """
+        csv_path = self._write_file('result.csv', 'csv content')
+        restored_path = os.path.join(self.temp_path, 'restored.csv')
+
+        self.assertFalse(self.cache.get('key1', restored_path))
+        self.assertEqual(self.cache.misses, 1)
+        self.assertEqual(self.cache.hits, 0)
+
+        self.cache.put('key1', csv_path)
+        self.assertEqual(len(self.cache), 1)
+        self.assertTrue(self.cache.get('key1', restored_path))
+        self.assertEqual(self.cache.hits, 1)
+        with open(restored_path) as f:
+            self.assertEqual(f.read(), 'csv content')
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """testing if the least recently used entries are removed when the
+        cache exceeds the max_size
+        """
+        self.cache.max_size = 25
+        csv_path = self._write_file('result.csv', '0123456789')
+        restored_path = os.path.join(self.temp_path, 'restored.csv')
+
+        self.cache.put('key1', csv_path)
+        self.cache.put('key2', csv_path)
+        # make key1 the most recently used one
+        os.utime(self.cache._entry_path('key2'), (0, 0))
+        self.assertTrue(self.cache.get('key1', restored_path))
+
+        self.cache.put('key3', csv_path)
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.size, 20)
+        self.assertFalse(self.cache.get('key2', restored_path))
+        self.assertTrue(self.cache.get('key1', restored_path))
+        self.assertTrue(self.cache.get('key3', restored_path))
+
+    def test_clear_is_working_properly(self):
+        """testing if the clear() method removes all the entries
+        """
+        csv_path = self._write_file('result.csv', 'csv content')
+        self.cache.put('key1', csv_path)
+        self.cache.put('key2', csv_path)
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)